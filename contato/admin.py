@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Lead, Financiamento
+from .models import BuscaSalva, Lead, Financiamento, NotificacaoBusca
 
 
 @admin.register(Lead)
@@ -25,11 +25,12 @@ class LeadAdmin(admin.ModelAdmin):
 
 @admin.register(Financiamento)
 class FinanciamentoAdmin(admin.ModelAdmin):
-    list_display = ['nome', 'email', 'renda_mensal', 'carro_interesse', 'data_solicitacao', 'aprovado', 'respondido']
+    list_display = ['nome', 'email', 'renda_mensal', 'carro', 'data_solicitacao', 'aprovado', 'respondido']
     list_filter = ['aprovado', 'respondido', 'data_solicitacao']
     search_fields = ['nome', 'email', 'cpf']
     list_editable = ['aprovado', 'respondido']
-    readonly_fields = ['data_solicitacao']
+    list_select_related = ['carro_interesse']
+    readonly_fields = ['data_solicitacao', 'carro']
     
     fieldsets = (
         ('Dados Pessoais', {
@@ -39,7 +40,7 @@ class FinanciamentoAdmin(admin.ModelAdmin):
             'fields': ('renda_mensal', 'profissao', 'entrada')
         }),
         ('Carro de Interesse', {
-            'fields': ('carro_interesse', 'carro_texto')
+            'fields': ('carro_interesse', 'carro', 'carro_texto')
         }),
         ('Observações', {
             'fields': ('observacoes',)
@@ -48,3 +49,25 @@ class FinanciamentoAdmin(admin.ModelAdmin):
             'fields': ('aprovado', 'respondido', 'data_solicitacao')
         }),
     )
+    
+    @admin.display(description='Carro')
+    def carro(self, obj):
+        """Resolve também carros vendidos que já foram para o arquivo"""
+        return obj.get_carro_interesse() or obj.carro_texto or '-'
+
+
+@admin.register(BuscaSalva)
+class BuscaSalvaAdmin(admin.ModelAdmin):
+    list_display = ['email', 'fabricante', 'condicao', 'preco_min', 'preco_max', 'ativa', 'confirmada_em', 'criado_em']
+    list_filter = ['ativa', 'condicao', 'combustivel', 'cambio', 'criado_em']
+    search_fields = ['email', 'fabricante']
+    readonly_fields = ['token', 'confirmada_em', 'criado_em']
+
+
+@admin.register(NotificacaoBusca)
+class NotificacaoBuscaAdmin(admin.ModelAdmin):
+    list_display = ['busca', 'carro', 'motivo', 'criada_em', 'enviada_em']
+    list_filter = ['motivo', 'enviada_em']
+    search_fields = ['busca__email']
+    list_select_related = ['busca', 'carro']
+    raw_id_fields = ['busca', 'carro']
@@ -0,0 +1,180 @@
+"""
+Alertas de buscas salvas - Regional Veículos
+Casa carros novos ou com preço reduzido com as buscas salvas pelo índice
+invertido (faixa de preço, fabricante, condição, combustível, câmbio) e enfileira as notificações,
+enviadas pelo comando enviar_alertas. Uma busca só recebe alertas depois
+de confirmada pelo link enviado ao e-mail (double opt-in)
+"""
+
+import logging
+import smtplib
+from collections import defaultdict
+from datetime import timedelta
+from itertools import product
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection, send_mail
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from core.autocompletar import normalizar
+from core.models import Carro, formatar_preco
+from .models import BuscaSalva, BuscaSalvaIndice, NotificacaoBusca, faixa_preco
+
+TAMANHO_LOTE_ENVIO = 200
+
+# Pedidos de confirmação ainda não atendidos por e-mail dentro da janela
+MAX_CONFIRMACOES_PENDENTES = 3
+JANELA_CONFIRMACOES = timedelta(days=1)
+
+# Colunas do índice depois da faixa de preço (vazio = qualquer)
+CAMPOS_INDICE = ('fabricante', 'condicao', 'combustivel', 'cambio')
+# Conferidos na busca depois da consulta ao índice (BuscaSalva.aceita)
+FAIXAS_BUSCA = ('preco_min', 'preco_max', 'ano_min', 'ano_max', 'km_min', 'km_max')
+CAMPOS_CARRO = ('id', 'preco', 'ano', 'quilometragem', *CAMPOS_INDICE)
+
+logger = logging.getLogger(__name__)
+
+
+def buscas_para_carros(carros):
+    """
+    {carro_id: [busca_id, ...]} para `carros` (dicts com CAMPOS_CARRO)
+    Uma consulta ao índice para todos os carros; preço exato, ano e km são conferidos depois
+    """
+    if not carros:
+        return {}
+    chaves = {
+        carro['id']: (
+            faixa_preco(carro['preco']),
+            *(normalizar(carro[campo]).strip() for campo in ('fabricante', 'condicao', 'combustivel', 'cambio')),
+        )
+        for carro in carros
+    }
+    linhas = BuscaSalvaIndice.objects.filter(
+        faixa__in={chave[0] for chave in chaves.values()},
+        **{
+            f'{campo}__in': {chave[posicao] for chave in chaves.values()} | {''}
+            for posicao, campo in enumerate(CAMPOS_INDICE, start=1)
+        },
+    ).select_related('busca').only('faixa', *CAMPOS_INDICE, *(f'busca__{campo}' for campo in FAIXAS_BUSCA))
+
+    indice = defaultdict(list)
+    for linha in linhas:
+        indice[(linha.faixa, *(getattr(linha, campo) for campo in CAMPOS_INDICE))].append(linha.busca)
+
+    resultado = {}
+    for carro in carros:
+        faixa, *valores = chaves[carro['id']]
+        # Campos vazios na busca valem para qualquer carro
+        resultado[carro['id']] = [
+            busca.pk
+            for chave in product((faixa,), *((valor, '') for valor in valores))
+            for busca in indice.get(chave, ())
+            if busca.aceita(carro['preco'], carro['ano'], carro['quilometragem'])
+        ]
+    return resultado
+
+
+def enfileirar_notificacoes(motivos):
+    """`motivos`: {carro_id: 'novo' | 'preco'}; só carros disponíveis geram notificação"""
+    carros = list(
+        Carro.objects.filter(pk__in=list(motivos), condicao__in=['novo', 'seminovo'])
+        .order_by().values(*CAMPOS_CARRO)
+    )
+    notificacoes = [
+        NotificacaoBusca(busca_id=busca_id, carro_id=carro_id, motivo=motivos[carro_id])
+        for carro_id, buscas in buscas_para_carros(carros).items()
+        for busca_id in buscas
+    ]
+    # A restrição de pendência única descarta o que já está na fila
+    NotificacaoBusca.objects.bulk_create(notificacoes, batch_size=500, ignore_conflicts=True)
+    return len(notificacoes)
+
+
+def _url(nome, busca):
+    return f"https://{settings.SITE_DOMAIN}{reverse(nome, args=[busca.token])}"
+
+
+def pode_enviar_confirmacao(email):
+    """Limita os pedidos de confirmação por endereço (o formulário é público)"""
+    recentes = BuscaSalva.objects.filter(
+        email__iexact=email, confirmada_em__isnull=True,
+        criado_em__gte=timezone.now() - JANELA_CONFIRMACOES,
+    )
+    return recentes.count() < MAX_CONFIRMACOES_PENDENTES
+
+
+def enviar_confirmacao(busca):
+    """E-mail do double opt-in: a busca só fica ativa pelo link de confirmação"""
+    corpo = '\n'.join([
+        f'Recebemos um pedido de alerta de estoque para este e-mail ({busca.descricao()}).',
+        '',
+        f"Para confirmar: {_url('contato:confirmar_busca', busca)}",
+        '',
+        'Se não foi você, ignore esta mensagem: nenhum alerta será enviado.',
+    ])
+    send_mail(
+        'Regional Veículos: confirme o seu alerta de estoque', corpo,
+        settings.EMAIL_HOST_USER, [busca.email], fail_silently=True,
+    )
+
+
+def _mensagem(busca, notificacoes):
+    base = f'https://{settings.SITE_DOMAIN}'
+    linhas = [
+        f"- {n.carro} por {formatar_preco(n.carro.preco)} ({n.get_motivo_display().lower()}): "
+        f"{base}{n.carro.get_absolute_url()}"
+        for n in notificacoes
+    ]
+    corpo = '\n'.join([
+        f'Encontramos carros para a sua busca ({busca.descricao()}):',
+        '',
+        *linhas,
+        '',
+        f"Para não receber mais estes avisos: {_url('contato:cancelar_busca', busca)}",
+    ])
+    return ('Regional Veículos: novos carros para a sua busca', corpo, settings.EMAIL_HOST_USER, [busca.email])
+
+
+def enviar_notificacoes(tamanho_lote=TAMANHO_LOTE_ENVIO):
+    """
+    Envia as notificações pendentes, um e-mail por busca; retorna quantos e-mails saíram
+    Cada e-mail tem a sua transação: as linhas são marcadas como enviadas logo após
+    o envio, então uma falha de SMTP no meio do lote não reenvia os anteriores
+    """
+    enviados = 0
+    ultima_busca = 0
+    with get_connection() as conexao:
+        while True:
+            buscas = list(
+                NotificacaoBusca.objects
+                .filter(enviada_em__isnull=True, busca__ativa=True, busca_id__gt=ultima_busca)
+                .order_by('busca_id').values_list('busca_id', flat=True).distinct()[:tamanho_lote]
+            )
+            if not buscas:
+                return enviados
+            ultima_busca = buscas[-1]
+            for busca_id in buscas:
+                enviados += _enviar_busca(busca_id, conexao)
+
+
+def _enviar_busca(busca_id, conexao):
+    with transaction.atomic():
+        # skip_locked: outro processo já está enviando esta busca
+        pendentes = list(
+            NotificacaoBusca.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(busca_id=busca_id, enviada_em__isnull=True, busca__ativa=True)
+            .select_related('busca', 'carro')
+            .order_by('criada_em')
+        )
+        if not pendentes:
+            return 0
+        try:
+            EmailMessage(*_mensagem(pendentes[0].busca, pendentes), connection=conexao).send()
+        except (smtplib.SMTPException, OSError):
+            # Fica pendente para a próxima execução; as demais buscas seguem
+            logger.exception('Falha ao enviar o alerta da busca %s', busca_id)
+            return 0
+        NotificacaoBusca.objects.filter(pk__in=[n.pk for n in pendentes]).update(enviada_em=timezone.now())
+    return 1
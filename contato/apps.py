@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ContatoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'contato'
+
+    def ready(self):
+        from . import signals  # noqa: F401
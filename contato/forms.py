@@ -2,7 +2,7 @@ from django import forms
 from decimal import Decimal, InvalidOperation
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Row, Column, Submit
-from .models import Lead, Financiamento
+from .models import BuscaSalva, Lead, Financiamento
 from core.models import Carro
 
 
@@ -223,3 +223,33 @@ class FinanciamentoForm(forms.ModelForm):
             raise forms.ValidationError('CPF deve ter 11 dígitos.')
             
         return cpf
+
+
+# Filtros do estoque que um alerta guarda (os mesmos nomes de parâmetro da página)
+FILTROS_ALERTA = [
+    'fabricante', 'condicao', 'combustivel', 'cambio',
+    'preco_min', 'preco_max', 'ano_min', 'ano_max', 'km_min', 'km_max',
+]
+
+
+class BuscaSalvaForm(forms.ModelForm):
+    """Alerta do estoque: os filtros chegam ocultos da página de estoque"""
+    class Meta:
+        model = BuscaSalva
+        fields = ['email', *FILTROS_ALERTA]
+        widgets = {
+            'email': forms.EmailInput(attrs={
+                'class': 'form-control',
+                'placeholder': 'seu.email@exemplo.com'
+            }),
+            **{campo: forms.HiddenInput() for campo in FILTROS_ALERTA},
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for minimo, maximo, nome in (('preco_min', 'preco_max', 'preço'), ('ano_min', 'ano_max', 'ano'),
+                                     ('km_min', 'km_max', 'km')):
+            inicio, fim = cleaned_data.get(minimo), cleaned_data.get(maximo)
+            if inicio is not None and fim is not None and inicio > fim:
+                raise forms.ValidationError(f'O {nome} mínimo deve ser menor que o máximo.')
+        return cleaned_data
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from contato.alertas import TAMANHO_LOTE_ENVIO, enviar_notificacoes
+
+
+class Command(BaseCommand):
+    help = 'Envia os alertas pendentes das buscas salvas (um e-mail por busca)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE_ENVIO, help='Buscas por lote')
+
+    def handle(self, *args, **options):
+        enviados = enviar_notificacoes(options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{enviados} e-mails de alerta enviados'))
@@ -0,0 +1,20 @@
+# Generated by Django 4.2 on 2026-10-19 13:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_arquivo_vendidos'),
+        ('contato', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='financiamento',
+            name='carro_interesse',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='core.carro', verbose_name='Carro de Interesse'),
+        ),
+    ]
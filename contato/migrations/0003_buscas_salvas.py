@@ -0,0 +1,69 @@
+# Generated by Django 4.2 on 2026-10-19 13:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_busca_trigramas'),
+        ('contato', '0002_financiamento_carro_interesse'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BuscaSalva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, verbose_name='E-mail')),
+                ('fabricante', models.CharField(blank=True, max_length=50, verbose_name='Fabricante')),
+                ('condicao', models.CharField(blank=True, choices=[('novo', 'Novo'), ('seminovo', 'Seminovo')], max_length=10, verbose_name='Condição')),
+                ('preco_min', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Preço Mínimo')),
+                ('preco_max', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Preço Máximo')),
+                ('ativa', models.BooleanField(default=True, verbose_name='Ativa')),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Busca Salva',
+                'verbose_name_plural': 'Buscas Salvas',
+                'ordering': ['-criado_em'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificacaoBusca',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('motivo', models.CharField(choices=[('novo', 'Chegou ao estoque'), ('preco', 'Preço reduzido')], max_length=10)),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('enviada_em', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('busca', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificacoes', to='contato.buscasalva')),
+                ('carro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.carro')),
+            ],
+            options={
+                'verbose_name': 'Notificação de Busca',
+                'verbose_name_plural': 'Notificações de Busca',
+                'ordering': ['criada_em'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BuscaSalvaIndice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fabricante', models.CharField(blank=True, max_length=50)),
+                ('condicao', models.CharField(blank=True, max_length=10)),
+                ('faixa', models.PositiveSmallIntegerField()),
+                ('busca', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='indices', to='contato.buscasalva')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='notificacaobusca',
+            constraint=models.UniqueConstraint(condition=models.Q(('enviada_em__isnull', True)), fields=('busca', 'carro'), name='notificacao_busca_pendente_unica'),
+        ),
+        migrations.AddIndex(
+            model_name='buscasalvaindice',
+            index=models.Index(fields=['faixa', 'fabricante', 'condicao'], name='busca_salva_indice_idx'),
+        ),
+    ]
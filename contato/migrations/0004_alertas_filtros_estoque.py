@@ -0,0 +1,61 @@
+# Generated by Django 4.2 on 2026-10-19 13:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contato', '0003_buscas_salvas'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='buscasalvaindice',
+            name='busca_salva_indice_idx',
+        ),
+        migrations.AddField(
+            model_name='buscasalva',
+            name='ano_max',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Ano Máximo'),
+        ),
+        migrations.AddField(
+            model_name='buscasalva',
+            name='ano_min',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Ano Mínimo'),
+        ),
+        migrations.AddField(
+            model_name='buscasalva',
+            name='cambio',
+            field=models.CharField(blank=True, max_length=20, verbose_name='Câmbio'),
+        ),
+        migrations.AddField(
+            model_name='buscasalva',
+            name='combustivel',
+            field=models.CharField(blank=True, max_length=20, verbose_name='Combustível'),
+        ),
+        migrations.AddField(
+            model_name='buscasalva',
+            name='km_max',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Km Máximo'),
+        ),
+        migrations.AddField(
+            model_name='buscasalva',
+            name='km_min',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Km Mínimo'),
+        ),
+        migrations.AddField(
+            model_name='buscasalvaindice',
+            name='cambio',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='buscasalvaindice',
+            name='combustivel',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='buscasalvaindice',
+            index=models.Index(fields=['faixa', 'fabricante', 'condicao', 'combustivel', 'cambio'], name='busca_salva_chave_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-19 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contato', '0004_alertas_filtros_estoque'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='buscasalva',
+            name='confirmada_em',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Confirmada em'),
+        ),
+        migrations.AlterField(
+            model_name='buscasalva',
+            name='ativa',
+            field=models.BooleanField(default=False, verbose_name='Ativa'),
+        ),
+    ]
@@ -1,5 +1,18 @@
-from django.db import models
-from core.models import Carro
+import uuid
+from decimal import Decimal
+
+from django.db import models, transaction
+from core.autocompletar import normalizar
+from core.models import Carro, CarroArquivado
+
+# Faixas de preço do índice de buscas salvas (R$ 0-24.999 = 0, 25.000-49.999 = 1, ...)
+LARGURA_FAIXA = Decimal(25000)
+# Última faixa: concentra tudo acima de R$ 1.000.000
+ULTIMA_FAIXA = 40
+
+
+def faixa_preco(preco):
+    return min(int(Decimal(preco) // LARGURA_FAIXA), ULTIMA_FAIXA)
 
 
 class Lead(models.Model):
@@ -33,7 +46,11 @@ class Financiamento(models.Model):
     entrada = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, verbose_name='Valor de Entrada')
     
     # Carro de interesse
-    carro_interesse = models.ForeignKey(Carro, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Carro de Interesse')
+    # Sem constraint no banco: o id continua válido quando o carro vai para o arquivo
+    carro_interesse = models.ForeignKey(
+        Carro, on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, verbose_name='Carro de Interesse'
+    )
     carro_texto = models.CharField(max_length=200, blank=True, verbose_name='Carro (se não listado)')
     
     # Observações
@@ -50,5 +67,151 @@ class Financiamento(models.Model):
         ordering = ['-data_solicitacao']
     
     def __str__(self):
-        carro = self.carro_interesse or self.carro_texto
+        carro = self.get_carro_interesse() or self.carro_texto
         return f"{self.nome} - {carro}"
+    
+    def get_carro_interesse(self):
+        """Carro de interesse no inventário ou, se já vendido e arquivado, no arquivo"""
+        if self.carro_interesse_id is None:
+            return None
+        try:
+            carro = self.carro_interesse
+        except Carro.DoesNotExist:
+            carro = None
+        # Com select_related a linha ausente vem como None em vez de DoesNotExist
+        if carro is None:
+            carro = CarroArquivado.objects.filter(pk=self.carro_interesse_id).first()
+        return carro
+
+
+class BuscaSalva(models.Model):
+    """
+    Filtros do estoque que o cliente quer acompanhar, em forma normalizada:
+    fabricante, combustível e câmbio sem acentos e em minúsculas, vazio = qualquer
+    """
+    email = models.EmailField(verbose_name='E-mail')
+    fabricante = models.CharField(max_length=50, blank=True, verbose_name='Fabricante')
+    condicao = models.CharField(max_length=10, blank=True, choices=Carro.CONDICAO_CHOICES[:2], verbose_name='Condição')
+    preco_min = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name='Preço Mínimo')
+    preco_max = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name='Preço Máximo')
+    combustivel = models.CharField(max_length=20, blank=True, verbose_name='Combustível')
+    cambio = models.CharField(max_length=20, blank=True, verbose_name='Câmbio')
+    ano_min = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='Ano Mínimo')
+    ano_max = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='Ano Máximo')
+    km_min = models.PositiveIntegerField(null=True, blank=True, verbose_name='Km Mínimo')
+    km_max = models.PositiveIntegerField(null=True, blank=True, verbose_name='Km Máximo')
+    # Só passa a valer depois que o dono do e-mail confirma (double opt-in)
+    ativa = models.BooleanField(default=False, verbose_name='Ativa')
+    confirmada_em = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='Confirmada em')
+    # Links de confirmação e de cancelamento enviados por e-mail
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Busca Salva'
+        verbose_name_plural = 'Buscas Salvas'
+        ordering = ['-criado_em']
+    
+    def __str__(self):
+        return f"{self.email} - {self.descricao()}"
+    
+    def descricao(self):
+        partes = [self.fabricante.title() or 'Qualquer marca']
+        if self.condicao:
+            partes.append(self.get_condicao_display())
+        partes.extend(valor.title() for valor in (self.combustivel, self.cambio) if valor)
+        if self.preco_min is not None:
+            partes.append(f'a partir de R$ {self.preco_min:,.0f}'.replace(',', '.'))
+        if self.preco_max is not None:
+            partes.append(f'até R$ {self.preco_max:,.0f}'.replace(',', '.'))
+        if self.ano_min is not None:
+            partes.append(f'ano a partir de {self.ano_min}')
+        if self.ano_max is not None:
+            partes.append(f'ano até {self.ano_max}')
+        if self.km_min is not None:
+            partes.append(f'a partir de {self.km_min:,} km'.replace(',', '.'))
+        if self.km_max is not None:
+            partes.append(f'até {self.km_max:,} km'.replace(',', '.'))
+        return ', '.join(partes)
+    
+    def faixas(self):
+        """Faixas de preço que a busca cobre (uma linha de índice por faixa)"""
+        inicio = faixa_preco(self.preco_min) if self.preco_min is not None else 0
+        fim = faixa_preco(self.preco_max) if self.preco_max is not None else ULTIMA_FAIXA
+        return range(inicio, fim + 1)
+    
+    def aceita(self, preco, ano, quilometragem):
+        """Faixas que o índice não cobre exatamente (preço dentro da faixa, ano, km)"""
+        return all(
+            (minimo is None or valor >= minimo) and (maximo is None or valor <= maximo)
+            for valor, minimo, maximo in (
+                (preco, self.preco_min, self.preco_max),
+                (ano, self.ano_min, self.ano_max),
+                (quilometragem, self.km_min, self.km_max),
+            )
+        )
+    
+    def save(self, *args, **kwargs):
+        self.fabricante = normalizar(self.fabricante).strip()
+        self.combustivel = normalizar(self.combustivel).strip()
+        self.cambio = normalizar(self.cambio).strip()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.indices.all().delete()
+            if self.ativa:
+                BuscaSalvaIndice.objects.bulk_create([
+                    BuscaSalvaIndice(
+                        busca=self, faixa=faixa, fabricante=self.fabricante, condicao=self.condicao,
+                        combustivel=self.combustivel, cambio=self.cambio,
+                    )
+                    for faixa in self.faixas()
+                ])
+
+
+class BuscaSalvaIndice(models.Model):
+    """
+    Índice invertido das buscas ativas:
+    (faixa de preço, fabricante, condição, combustível, câmbio) -> busca
+    """
+    busca = models.ForeignKey(BuscaSalva, on_delete=models.CASCADE, related_name='indices')
+    fabricante = models.CharField(max_length=50, blank=True)
+    condicao = models.CharField(max_length=10, blank=True)
+    combustivel = models.CharField(max_length=20, blank=True)
+    cambio = models.CharField(max_length=20, blank=True)
+    faixa = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['faixa', 'fabricante', 'condicao', 'combustivel', 'cambio'], name='busca_salva_chave_idx',
+            ),
+        ]
+
+
+class NotificacaoBusca(models.Model):
+    """Carro novo ou com preço reduzido que atende a uma busca salva, aguardando envio"""
+    MOTIVO_CHOICES = [
+        ('novo', 'Chegou ao estoque'),
+        ('preco', 'Preço reduzido'),
+    ]
+    
+    busca = models.ForeignKey(BuscaSalva, on_delete=models.CASCADE, related_name='notificacoes')
+    carro = models.ForeignKey(Carro, on_delete=models.CASCADE, related_name='+')
+    motivo = models.CharField(max_length=10, choices=MOTIVO_CHOICES)
+    criada_em = models.DateTimeField(auto_now_add=True)
+    enviada_em = models.DateTimeField(null=True, blank=True, db_index=True)
+    
+    class Meta:
+        verbose_name = 'Notificação de Busca'
+        verbose_name_plural = 'Notificações de Busca'
+        ordering = ['criada_em']
+        constraints = [
+            # Um carro entra no máximo uma vez na fila de cada busca
+            models.UniqueConstraint(
+                fields=['busca', 'carro'], condition=models.Q(enviada_em__isnull=True),
+                name='notificacao_busca_pendente_unica',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.busca.email} - {self.carro} ({self.get_motivo_display()})"
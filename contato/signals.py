@@ -0,0 +1,24 @@
+"""
+Sinais do app Contato - Regional Veículos
+Enfileira os alertas de buscas salvas a partir do histórico de preço do inventário
+"""
+
+from functools import partial
+
+from django.db import transaction
+from django.dispatch import receiver
+
+from core.historico import eventos_registrados
+
+
+@receiver(eventos_registrados)
+def _enfileirar_alertas(sender, eventos, **kwargs):
+    motivos = {}
+    for evento in eventos:
+        if evento.tipo == 'criado':
+            motivos[evento.carro_id] = 'novo'
+        elif evento.tipo == 'preco' and evento.preco_novo < evento.preco_anterior:
+            motivos.setdefault(evento.carro_id, 'preco')
+    if motivos:
+        from .alertas import enfileirar_notificacoes
+        transaction.on_commit(partial(enfileirar_notificacoes, motivos))
@@ -1,3 +1,128 @@
-from django.test import TestCase
+import smtplib
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+
+from core.tests import criar_carro
+
+
+class FalhaSMTP:
+    """Backend de e-mail que recusa o destinatário indicado"""
+
+    def __init__(self, recusado):
+        self.recusado = recusado
+        self.enviados = []
+
+    def __call__(self, fail_silently=False, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def send_messages(self, mensagens):
+        for mensagem in mensagens:
+            if self.recusado in mensagem.to:
+                raise smtplib.SMTPRecipientsRefused({self.recusado: (550, b'recusado')})
+            self.enviados.append(mensagem)
+        return len(mensagens)
+
+
+@override_settings(
+    ALLOWED_HOSTS=['*'],
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class AlertasBuscaTest(TestCase):
+    """Double opt-in, cancelamento por POST e envio marcado por e-mail"""
+
+    def test_alerta_so_ativa_apos_confirmacao(self):
+        from django.core import mail
+        from contato.models import BuscaSalva
+        self.client.post('/alertas/', {'email': 'ana@example.com', 'fabricante': 'Toyota'})
+        busca = BuscaSalva.objects.get()
+        self.assertFalse(busca.ativa)
+        self.assertFalse(busca.indices.exists())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(f'/alertas/{busca.token}/confirmar/', mail.outbox[0].body)
+
+        url = f'/alertas/{busca.token}/confirmar/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        busca.refresh_from_db()
+        self.assertFalse(busca.ativa)
+
+        self.client.post(url)
+        busca.refresh_from_db()
+        self.assertTrue(busca.ativa)
+        self.assertIsNotNone(busca.confirmada_em)
+        self.assertTrue(busca.indices.exists())
+
+    def test_pedidos_de_confirmacao_sao_limitados(self):
+        from django.core import mail
+        from contato.alertas import MAX_CONFIRMACOES_PENDENTES
+        for _ in range(MAX_CONFIRMACOES_PENDENTES + 2):
+            self.client.post('/alertas/', {'email': 'alvo@example.com'})
+        self.assertEqual(len(mail.outbox), MAX_CONFIRMACOES_PENDENTES)
+
+    def test_cancelamento_exige_post(self):
+        from contato.models import BuscaSalva
+        busca = BuscaSalva.objects.create(email='ana@example.com', ativa=True)
+        url = f'/alertas/{busca.token}/cancelar/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        busca.refresh_from_db()
+        self.assertTrue(busca.ativa)
+
+        self.client.post(url)
+        busca.refresh_from_db()
+        self.assertFalse(busca.ativa)
+
+    def test_falha_de_smtp_nao_reenvia_os_ja_enviados(self):
+        from unittest import mock
+        from contato import alertas
+        from contato.models import BuscaSalva, NotificacaoBusca
+        carro = criar_carro()
+        for email in ('a@example.com', 'b@example.com', 'c@example.com'):
+            busca = BuscaSalva.objects.create(email=email, ativa=True)
+            NotificacaoBusca.objects.create(busca=busca, carro=carro, motivo='novo')
+
+        backend = FalhaSMTP('b@example.com')
+        with mock.patch.object(alertas, 'get_connection', backend), self.assertLogs('contato.alertas'):
+            self.assertEqual(alertas.enviar_notificacoes(tamanho_lote=1), 2)
+        pendentes = NotificacaoBusca.objects.filter(enviada_em__isnull=True)
+        self.assertEqual([n.busca.email for n in pendentes], ['b@example.com'])
+
+    def test_buscas_para_carros_curinga_e_limites_exatos(self):
+        from decimal import Decimal
+        from contato.alertas import buscas_para_carros
+        from contato.models import BuscaSalva
+
+        def busca(**campos):
+            return BuscaSalva.objects.create(email='ana@example.com', ativa=campos.pop('ativa', True), **campos).pk
+
+        qualquer = busca()
+        toyota = busca(fabricante='TOYOTA')
+        novo = busca(condicao='novo')
+        preco = busca(preco_min=Decimal('100000'), preco_max=Decimal('120000'))
+        ano = busca(ano_min=2020, ano_max=2020)
+        km = busca(km_max=10000)
+        citroen = busca(fabricante='Citroën', cambio='Manual')
+        busca(ativa=False)
+
+        def carro(pk, preco, ano, km, fabricante, condicao, cambio):
+            return {
+                'id': pk, 'preco': Decimal(preco), 'ano': ano, 'quilometragem': km, 'fabricante': fabricante,
+                'condicao': condicao, 'combustivel': 'Flex', 'cambio': cambio,
+            }
+
+        resultado = buscas_para_carros([
+            carro(1, '120000', 2020, 10000, 'Toyota', 'seminovo', 'Automático'),
+            carro(2, '120000.01', 2021, 10001, 'Toyota', 'novo', 'Manual'),
+            carro(3, '100000', 2019, 0, 'Citroen', 'seminovo', 'Manual'),
+        ])
+        self.assertEqual({pk: set(buscas) for pk, buscas in resultado.items()}, {
+            1: {qualquer, toyota, preco, ano, km},
+            2: {qualquer, toyota, novo},
+            3: {qualquer, preco, km, citroen},
+        })
+        self.assertEqual(buscas_para_carros([]), {})
@@ -7,4 +7,7 @@ urlpatterns = [
     path('contato/', views.contato, name='contato'),
     path('financiamento/', views.financiamento, name='financiamento'),
     path('financiamento/<int:carro_id>/', views.financiamento, name='financiamento_carro'),
+    path('alertas/', views.salvar_busca, name='salvar_busca'),
+    path('alertas/<uuid:token>/confirmar/', views.confirmar_busca, name='confirmar_busca'),
+    path('alertas/<uuid:token>/cancelar/', views.cancelar_busca, name='cancelar_busca'),
 ]
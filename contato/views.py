@@ -2,8 +2,13 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.core.mail import send_mail
 from django.conf import settings
-from .models import Lead, Financiamento
-from .forms import LeadForm, FinanciamentoForm
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+from .alertas import enviar_confirmacao, pode_enviar_confirmacao
+from .models import BuscaSalva, Lead, Financiamento
+from .forms import FILTROS_ALERTA, BuscaSalvaForm, LeadForm, FinanciamentoForm
+from core.middleware import fixar_primario
 from core.models import Carro
 
 
@@ -15,6 +20,7 @@ def contato(request):
         if form.is_valid():
             print("Formulário válido, salvando...")  # Debug
             lead = form.save()
+            fixar_primario(request)
             
             # Enviar email
             try:
@@ -69,6 +75,7 @@ def financiamento(request, carro_id=None):
                 financiamento.carro_interesse = carro
             
             financiamento.save()
+            fixar_primario(request)
             print("Financiamento salvo com sucesso!")  # Debug
             
             # Enviar email
@@ -119,3 +126,72 @@ def financiamento(request, carro_id=None):
         'carro': carro,
     }
     return render(request, 'contato/financiamento.html', context)
+
+
+def salvar_busca(request):
+    """
+    Alerta por e-mail com os filtros do estoque (chegam na query string)
+    O alerta só vale depois da confirmação por e-mail
+    """
+    if request.method == 'POST':
+        form = BuscaSalvaForm(request.POST)
+        if form.is_valid():
+            # Mesma resposta com ou sem envio, para não expor quais e-mails já foram usados
+            if pode_enviar_confirmacao(form.cleaned_data['email']):
+                busca = form.save()
+                fixar_primario(request)
+                enviar_confirmacao(busca)
+            messages.success(request, 'Quase lá! Enviamos um e-mail com o link para confirmar o alerta.')
+            filtros = {
+                campo: request.POST[campo]
+                for campo in FILTROS_ALERTA
+                if request.POST.get(campo)
+            }
+            return redirect(f"{reverse('core:estoque')}?{urlencode(filtros)}" if filtros else reverse('core:estoque'))
+        messages.error(request, 'Não foi possível criar o alerta. Verifique os dados informados.')
+    else:
+        form = BuscaSalvaForm(initial={
+            campo: request.GET[campo] for campo in FILTROS_ALERTA if request.GET.get(campo)
+        })
+    
+    return render(request, 'contato/alerta_novo.html', {'form': form})
+
+
+def confirmar_busca(request, token):
+    """Link de confirmação (double opt-in); só o POST da página ativa o alerta"""
+    busca = get_object_or_404(BuscaSalva, token=token)
+    if request.method == 'POST':
+        if not busca.confirmada_em:
+            busca.ativa = True
+            busca.confirmada_em = timezone.now()
+            busca.save()
+            fixar_primario(request)
+        messages.success(request, 'Alerta confirmado! Avisaremos por e-mail quando chegar um carro com estes filtros.')
+        return redirect('core:estoque')
+    
+    return render(request, 'contato/alerta_acao.html', {
+        'busca': busca,
+        'titulo': 'Confirmar alerta de estoque',
+        'botao': 'Confirmar alerta',
+    })
+
+
+def cancelar_busca(request, token):
+    """
+    Link de cancelamento enviado nos e-mails de alerta
+    O GET só mostra a confirmação: leitores de e-mail que pré-carregam links não cancelam nada
+    """
+    busca = get_object_or_404(BuscaSalva, token=token)
+    if request.method == 'POST':
+        if busca.ativa:
+            busca.ativa = False
+            busca.save()
+            fixar_primario(request)
+        messages.success(request, 'Você não receberá mais alertas desta busca.')
+        return redirect('core:estoque')
+    
+    return render(request, 'contato/alerta_acao.html', {
+        'busca': busca,
+        'titulo': 'Cancelar alerta de estoque',
+        'botao': 'Cancelar alerta',
+    })
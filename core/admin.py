@@ -1,5 +1,10 @@
-from django.contrib import admin
-from .models import Carro, Marca, ImagemSite
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.template.response import TemplateResponse
+
+from .inventario import ajustar_precos, alternar_destaque, marcar_vendidos
+from .models import Carro, CarroArquivado, CarroImagem, HistoricoCarro, Marca, ImagemSite, ResumoVital
 
 
 @admin.register(Marca)
@@ -16,17 +21,32 @@ class MarcaAdmin(admin.ModelAdmin):
     )
 
 
+class CarroImagemInline(admin.TabularInline):
+    model = CarroImagem
+    fields = ['imagem', 'ordem', 'largura', 'altura']
+    readonly_fields = ['largura', 'altura']
+    extra = 1
+
+
+class AjustePrecoForm(forms.Form):
+    percentual = forms.DecimalField(
+        label='Ajuste (%)', max_digits=5, decimal_places=2, min_value=-90, max_value=100,
+        help_text='Use valores negativos para desconto (ex: -5)',
+    )
+
+
 @admin.register(Carro)
 class CarroAdmin(admin.ModelAdmin):
     list_display = ['fabricante', 'modelo', 'ano', 'preco', 'condicao', 'destaque', 'criado_em']
     list_filter = ['fabricante', 'condicao', 'destaque', 'ano']
-    search_fields = ['modelo', 'fabricante', 'descricao']
-    list_editable = ['destaque', 'condicao']
-    readonly_fields = ['criado_em', 'atualizado_em']
+    search_fields = ['codigo_estoque', 'modelo', 'fabricante', 'descricao']
+    readonly_fields = ['criado_em', 'atualizado_em', 'visualizacoes', 'popularidade']
+    # Ações em lote: um UPDATE por ação em vez de um save() por linha
+    actions = ['marcar_como_vendido', 'alternar_destaque', 'ajustar_preco']
     
     fieldsets = (
         ('Informações Básicas', {
-            'fields': ('modelo', 'fabricante', 'ano', 'cor')
+            'fields': ('codigo_estoque', 'modelo', 'fabricante', 'ano', 'cor')
         }),
         ('Detalhes Técnicos', {
             'fields': ('quilometragem', 'combustivel', 'cambio', 'motor')
@@ -35,13 +55,46 @@ class CarroAdmin(admin.ModelAdmin):
             'fields': ('preco', 'condicao', 'destaque')
         }),
         ('Descrição e Imagens', {
-            'fields': ('descricao', 'imagem_principal', 'imagem_2', 'imagem_3', 'imagem_4')
+            'fields': ('descricao', 'imagem_principal')
         }),
         ('Metadados', {
-            'fields': ('criado_em', 'atualizado_em'),
+            'fields': ('criado_em', 'atualizado_em', 'visualizacoes', 'popularidade'),
             'classes': ('collapse',)
         }),
     )
+    inlines = [CarroImagemInline]
+    
+    @admin.action(description='Marcar como vendido', permissions=['change'])
+    def marcar_como_vendido(self, request, queryset):
+        total = marcar_vendidos(queryset)
+        self.message_user(request, f'{total} carro(s) marcado(s) como vendido(s).', messages.SUCCESS)
+    
+    @admin.action(description='Alternar destaque', permissions=['change'])
+    def alternar_destaque(self, request, queryset):
+        total = alternar_destaque(queryset)
+        self.message_user(request, f'Destaque alternado em {total} carro(s).', messages.SUCCESS)
+    
+    @admin.action(description='Ajustar preço (%%)', permissions=['change'])
+    def ajustar_preco(self, request, queryset):
+        form = AjustePrecoForm(request.POST if 'aplicar' in request.POST else None)
+        if form.is_valid():
+            total = ajustar_precos(queryset, form.cleaned_data['percentual'])
+            self.message_user(
+                request, f"Preço ajustado em {form.cleaned_data['percentual']}% para {total} carro(s).",
+                messages.SUCCESS,
+            )
+            return None
+        return TemplateResponse(request, 'admin/core/carro/ajustar_preco.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Ajustar preço',
+            'opts': self.model._meta,
+            'form': form,
+            'queryset': queryset,
+            'total': queryset.count(),
+            'selecionados': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
 
 
 @admin.register(ImagemSite)
@@ -64,3 +117,51 @@ class ImagemSiteAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(HistoricoCarro)
+class HistoricoCarroAdmin(admin.ModelAdmin):
+    """Somente leitura: o histórico é gravado pelos sinais de Carro"""
+    list_display = ['id', 'sequencia', 'carro_id', 'tipo', 'preco_anterior', 'preco_novo',
+                    'condicao_anterior', 'condicao_nova', 'registrado_em']
+    list_filter = ['tipo', 'registrado_em']
+    search_fields = ['carro_id']
+    date_hierarchy = 'registrado_em'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CarroArquivado)
+class CarroArquivadoAdmin(admin.ModelAdmin):
+    """Carros vendidos movidos pelo comando arquivar_vendidos (somente leitura)"""
+    list_display = ['id', 'fabricante', 'modelo', 'ano', 'preco', 'codigo_estoque', 'arquivado_em']
+    list_filter = ['fabricante', 'ano', 'arquivado_em']
+    search_fields = ['=id', 'codigo_estoque', 'modelo', 'fabricante']
+    date_hierarchy = 'arquivado_em'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ResumoVital)
+class ResumoVitalAdmin(admin.ModelAdmin):
+    """p75 diário dos Core Web Vitals por página (comando consolidar_vitais)"""
+    list_display = ['dia', 'rota', 'metrica', 'p75', 'amostras']
+    list_filter = ['metrica', 'rota', 'dia']
+    date_hierarchy = 'dia'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
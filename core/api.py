@@ -0,0 +1,279 @@
+"""
+API JSON somente leitura do inventário - Regional Veículos
+Lista carros e marcas com seleção de campos, paginação por cursor
+e respostas condicionais (ETag) servidas de um cache por versão do inventário,
+além do feed incremental de alterações de preço e condição
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_GET
+
+from . import autocompletar
+from .models import Carro, HistoricoCarro, Marca
+from .signals import get_versao_inventario
+
+API_CACHE_TIMEOUT = 60 * 60
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Campo da API -> coluna do banco (None para campos derivados)
+CARRO_CAMPOS = {
+    'id': 'id',
+    'url': None,
+    'modelo': 'modelo',
+    'fabricante': 'fabricante',
+    'ano': 'ano',
+    'cor': 'cor',
+    'quilometragem': 'quilometragem',
+    'combustivel': 'combustivel',
+    'cambio': 'cambio',
+    'motor': 'motor',
+    'preco': 'preco',
+    'condicao': 'condicao',
+    'destaque': 'destaque',
+    'descricao': 'descricao',
+    'imagem_principal': 'imagem_principal',
+    'atualizado_em': 'atualizado_em',
+}
+# `descricao` só é enviada quando pedida explicitamente em ?fields=
+CARRO_CAMPOS_PADRAO = [campo for campo in CARRO_CAMPOS if campo != 'descricao']
+
+ALTERACAO_CAMPOS = [
+    'id', 'carro_id', 'tipo', 'preco_anterior', 'preco_novo',
+    'condicao_anterior', 'condicao_nova', 'registrado_em',
+]
+TERMO_MAX = 60
+# Maior valor de uma coluna BIGINT: cursores acima disto estouram no banco
+MAX_CURSOR = 2 ** 63 - 1
+
+MARCA_CAMPOS = {
+    'id': 'id',
+    'nome': 'nome',
+    'logo': 'logo',
+    'ordem': 'ordem',
+}
+
+
+class ApiError(Exception):
+    """Erro de parâmetro da requisição (HTTP 400)"""
+
+
+def _parse_campos(request, disponiveis, padrao):
+    valor = request.GET.get('fields')
+    if not valor:
+        return list(padrao)
+    campos = [campo.strip() for campo in valor.split(',') if campo.strip()]
+    invalidos = [campo for campo in campos if campo not in disponiveis]
+    if invalidos:
+        raise ApiError(f"Campos inválidos: {', '.join(invalidos)}")
+    return campos
+
+
+def _parse_limit(request, padrao=PAGE_SIZE, maximo=MAX_PAGE_SIZE):
+    valor = request.GET.get('limit')
+    if not valor:
+        return padrao
+    try:
+        limit = int(valor)
+    except ValueError:
+        raise ApiError('limit deve ser um número inteiro')
+    if not 1 <= limit <= maximo:
+        raise ApiError(f'limit deve estar entre 1 e {maximo}')
+    return limit
+
+
+def _codificar_cursor(pk):
+    return base64.urlsafe_b64encode(str(pk).encode()).decode().rstrip('=')
+
+
+def _decodificar_cursor(cursor, minimo=1):
+    """Id (ou sequência) do cursor; fora da faixa de um BIGINT é inválido"""
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        valor = int(base64.urlsafe_b64decode(cursor + padding).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ApiError('cursor inválido')
+    if not minimo <= valor <= MAX_CURSOR:
+        raise ApiError('cursor inválido')
+    return valor
+
+
+def _url_arquivo(nome):
+    return default_storage.url(nome) if nome else None
+
+
+def _serializar_carros(linhas, campos):
+    itens = []
+    for linha in linhas:
+        item = {}
+        for campo in campos:
+            if campo == 'url':
+                item['url'] = reverse('core:detalhe_carro', kwargs={'pk': linha['id']})
+            elif campo == 'imagem_principal':
+                item[campo] = _url_arquivo(linha[campo])
+            else:
+                item[campo] = linha[campo]
+        itens.append(item)
+    return itens
+
+
+def _resposta_versionada(request, gerar_corpo):
+    """
+    Serve o corpo do cache da versão atual do inventário
+    O ETag depende só da versão e da query string, então um 304 não
+    consulta nem o cache nem o banco
+    """
+    versao = get_versao_inventario()
+    assinatura = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+    etag = f'"{versao}-{assinatura}"'
+
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        cache_key = f'api:{versao}:{assinatura}'
+        corpo = cache.get(cache_key)
+        if corpo is None:
+            try:
+                corpo = json.dumps(gerar_corpo(), cls=DjangoJSONEncoder).encode('utf-8')
+            except ApiError as erro:
+                return JsonResponse({'erro': str(erro)}, status=400)
+            cache.set(cache_key, corpo, API_CACHE_TIMEOUT)
+        response = HttpResponse(corpo, content_type='application/json')
+
+    response.headers['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=60)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+@require_GET
+def api_carros(request):
+    """
+    Carros disponíveis, do mais recente para o mais antigo
+    Parâmetros: fields, fabricante, condicao, limit, cursor
+    """
+    def gerar_corpo():
+        campos = _parse_campos(request, CARRO_CAMPOS, CARRO_CAMPOS_PADRAO)
+        limit = _parse_limit(request)
+
+        queryset = Carro.objects.filter(condicao__in=['novo', 'seminovo'])
+        if request.GET.get('fabricante'):
+            queryset = queryset.filter(fabricante__iexact=request.GET['fabricante'])
+        if request.GET.get('condicao'):
+            queryset = queryset.filter(condicao=request.GET['condicao'])
+        if request.GET.get('cursor'):
+            queryset = queryset.filter(pk__lt=_decodificar_cursor(request.GET['cursor']))
+
+        colunas = {'id'} | {CARRO_CAMPOS[campo] for campo in campos if CARRO_CAMPOS[campo]}
+        linhas = list(queryset.order_by('-pk').values(*colunas)[:limit + 1])
+
+        proximo = None
+        if len(linhas) > limit:
+            linhas = linhas[:limit]
+            params = request.GET.copy()
+            params['cursor'] = _codificar_cursor(linhas[-1]['id'])
+            proximo = f"{request.path}?{params.urlencode()}"
+
+        return {
+            'resultados': _serializar_carros(linhas, campos),
+            'proximo': proximo,
+        }
+
+    return _resposta_versionada(request, gerar_corpo)
+
+
+@require_GET
+def api_marcas(request):
+    """Marcas ativas na ordem de exibição. Parâmetros: fields"""
+    def gerar_corpo():
+        campos = _parse_campos(request, MARCA_CAMPOS, MARCA_CAMPOS)
+        linhas = Marca.objects.filter(ativa=True).order_by('ordem', 'nome').values(*campos)
+        resultados = []
+        for linha in linhas:
+            if 'logo' in linha:
+                linha['logo'] = _url_arquivo(linha['logo'])
+            resultados.append(linha)
+        return {'resultados': resultados}
+
+    return _resposta_versionada(request, gerar_corpo)
+
+
+@require_GET
+def api_alteracoes(request):
+    """
+    Feed de alterações de preço e condição em ordem de confirmação
+    Parâmetros: cursor (o `cursor` da resposta anterior), limit
+    Sem cursor começa do início: os eventos 'criado' reproduzem o inventário inteiro
+    """
+    try:
+        limit = _parse_limit(request)
+        # O feed vazio devolve o cursor 0
+        depois_de = _decodificar_cursor(request.GET['cursor'], minimo=0) if request.GET.get('cursor') else 0
+    except ApiError as erro:
+        return JsonResponse({'erro': str(erro)}, status=400)
+
+    # O cursor é a ordem de confirmação (numerada por quem grava), não o id
+    eventos = list(
+        HistoricoCarro.objects.filter(sequencia__gt=depois_de)
+        .order_by('sequencia').values('sequencia', *ALTERACAO_CAMPOS)[:limit + 1]
+    )
+    tem_mais = len(eventos) > limit
+    eventos = eventos[:limit]
+    if eventos:
+        depois_de = eventos[-1]['sequencia']
+    for evento in eventos:
+        del evento['sequencia']
+
+    response = JsonResponse({
+        'alteracoes': eventos,
+        'cursor': _codificar_cursor(depois_de),
+        'tem_mais': tem_mais,
+    })
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def _url_sugestao(texto, tipo):
+    """Página que lista os carros da sugestão: filtros do estoque ou a busca por texto"""
+    if tipo == 'fabricante':
+        return f"{reverse('core:estoque')}?{urlencode({'fabricante': texto})}"
+    if tipo == 'ano':
+        return f"{reverse('core:estoque')}?{urlencode({'ano_min': texto, 'ano_max': texto})}"
+    return f"{reverse('core:buscar')}?{urlencode({'q': texto})}"
+
+
+@require_GET
+def api_autocompletar(request):
+    """
+    Sugestões da busca enquanto o usuário digita, do índice em memória
+    Parâmetros: q, limit
+    """
+    termo = request.GET.get('q', '').strip()
+    try:
+        if len(termo) > TERMO_MAX:
+            raise ApiError(f'q deve ter no máximo {TERMO_MAX} caracteres')
+        limit = _parse_limit(request, autocompletar.LIMITE_PADRAO, autocompletar.LIMITE_MAXIMO)
+    except ApiError as erro:
+        return JsonResponse({'erro': str(erro)}, status=400)
+
+    sugestoes = autocompletar.sugerir(termo, limit) if termo else []
+    response = JsonResponse({
+        'q': termo,
+        'sugestoes': [
+            {'texto': texto, 'tipo': tipo, 'total': total, 'url': _url_sugestao(texto, tipo)}
+            for texto, tipo, total in sugestoes
+        ],
+    })
+    patch_cache_control(response, public=True, max_age=60)
+    return response
@@ -0,0 +1,55 @@
+"""
+Arquivo de carros vendidos - Regional Veículos
+
+Move carros vendidos há mais de alguns dias da tabela de inventário para
+CarroArquivado, mantendo o mesmo id. A tabela quente (e seus índices) fica só
+com o que o catálogo lê; solicitações de financiamento antigas continuam
+resolvendo o carro pelo id (ver Financiamento.get_carro_interesse).
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Carro, CarroArquivado, CarroImagem
+from .signals import lote_inventario
+
+DIAS_ANTES_DE_ARQUIVAR = 30
+TAMANHO_LOTE = 500
+
+CAMPOS_ARQUIVADOS = [
+    'id', 'codigo_estoque', 'modelo', 'fabricante', 'ano', 'cor', 'quilometragem',
+    'combustivel', 'cambio', 'motor', 'preco', 'condicao', 'destaque', 'descricao',
+    'imagem_principal', 'criado_em', 'atualizado_em',
+]
+
+
+def vendidos_para_arquivar(dias=DIAS_ANTES_DE_ARQUIVAR):
+    limite = timezone.now() - timedelta(days=dias)
+    return Carro.objects.filter(condicao='vendido', atualizado_em__lte=limite)
+
+
+def _arquivar_lote(ids):
+    galerias = {}
+    for carro_id, imagem in (
+        CarroImagem.objects.filter(carro_id__in=ids).order_by('ordem', 'id').values_list('carro_id', 'imagem')
+    ):
+        galerias.setdefault(carro_id, []).append(imagem)
+
+    with transaction.atomic(), lote_inventario():
+        CarroArquivado.objects.bulk_create([
+            CarroArquivado(**linha, imagens=galerias.get(linha['id'], []))
+            for linha in Carro.objects.filter(pk__in=ids).values(*CAMPOS_ARQUIVADOS)
+        ])
+        # Remove galeria e recomendações em cascata; histórico e financiamentos mantêm o id
+        Carro.objects.filter(pk__in=ids).delete()
+
+
+def arquivar_vendidos(dias=DIAS_ANTES_DE_ARQUIVAR, tamanho_lote=TAMANHO_LOTE, dry_run=False) -> int:
+    """Arquiva os carros vendidos há mais de `dias` dias; retorna quantos foram movidos"""
+    ids = list(vendidos_para_arquivar(dias).order_by('pk').values_list('pk', flat=True))
+    if not dry_run:
+        for inicio in range(0, len(ids), tamanho_lote):
+            _arquivar_lote(ids[inicio:inicio + tamanho_lote])
+    return len(ids)
@@ -0,0 +1,207 @@
+"""
+Bundles de assets estáticos - Regional Veículos
+Concatena e minifica CSS/JS e extrai o CSS crítico (acima da dobra)
+das páginas principais durante o collectstatic
+"""
+
+import hashlib
+import json
+import re
+from typing import Dict, List, Set
+
+import rcssmin
+import rjsmin
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.template.loader import get_template
+
+CSS_BUNDLE = 'bundles/site.min.css'
+CSS_FONTES = ['css/style.css']
+
+JS_BUNDLE = 'bundles/site.min.js'
+JS_FONTES = [
+    'js/main.js',
+    'js/analytics.js',
+    'js/google-ads.js',
+    'js/performance.js',
+]
+
+# Página -> template cujo conteúdo até o marcador fica acima da dobra
+PAGINAS_CRITICAS = {
+    'home': 'core/home.html',
+    'estoque': 'core/estoque.html',
+}
+MARCADOR_DOBRA = '{# fim-da-dobra #}'
+
+# Arquivos pré-carregados pelo service worker (apenas os presentes no manifesto)
+SW_PRECACHE = [
+    CSS_BUNDLE,
+    JS_BUNDLE,
+    'images/desk3.jpg',
+    'images/moba1.jpg',
+]
+SW_MAX_PAGINAS = 50
+SW_MAX_IMAGENS = 100
+
+# Seletores sempre mantidos no CSS crítico
+SELETORES_GLOBAIS = {':root', '*', 'html', 'body'}
+
+_COMENTARIO_RE = re.compile(r'/\*.*?\*/', re.S)
+_CLASSE_ATTR_RE = re.compile(r'class="([^"]*)"')
+_ID_ATTR_RE = re.compile(r'id="([^"]*)"')
+_TAG_TEMPLATE_RE = re.compile(r'{[%{#].*?[%}#]}', re.S)
+_TOKEN_SELETOR_RE = re.compile(r'([.#])(-?[_a-zA-Z][_a-zA-Z0-9-]*)')
+_ANIMACAO_RE = re.compile(r'animation(?:-name)?\s*:\s*([^;}]+)')
+_VARIAVEL = '\x00'
+
+
+def css_critico_path(pagina: str) -> str:
+    return f'bundles/critical-{pagina}.css'
+
+
+def minificar_css(conteudo: str) -> str:
+    return rcssmin.cssmin(conteudo)
+
+
+def minificar_js(conteudo: str) -> str:
+    return rjsmin.jsmin(conteudo)
+
+
+def _tokens_html(html: str) -> Set[str]:
+    """
+    Classes (.x) e ids (#x) usados no trecho de HTML
+    Nomes montados com variáveis (ex: badge-{{ carro.condicao }}) viram prefixos (.badge-*)
+    """
+    html = _TAG_TEMPLATE_RE.sub(_VARIAVEL, html)
+    tokens = set()
+    for prefixo, regex in (('.', _CLASSE_ATTR_RE), ('#', _ID_ATTR_RE)):
+        for valor in regex.findall(html):
+            for nome in valor.split():
+                partes = nome.split(_VARIAVEL)
+                for i, parte in enumerate(partes):
+                    if parte:
+                        tokens.add(prefixo + parte + ('*' if i < len(partes) - 1 else ''))
+    return tokens
+
+
+def _html_acima_da_dobra(template_name: str) -> str:
+    """Marcação do layout base até <main> mais o conteúdo da página até o marcador"""
+    base = get_template('base.html').template.source
+    pagina = get_template(template_name).template.source
+    return base.split('<main>')[0] + pagina.split(MARCADOR_DOBRA)[0]
+
+
+def _blocos_css(css: str) -> List[tuple]:
+    """Divide o CSS em blocos de primeiro nível (prelúdio, corpo)"""
+    blocos = []
+    inicio = profundidade = 0
+    abertura = None
+    for i, char in enumerate(css):
+        if char == '{':
+            if profundidade == 0:
+                abertura = i
+            profundidade += 1
+        elif char == '}':
+            profundidade -= 1
+            if profundidade == 0:
+                blocos.append((css[inicio:abertura].strip(), css[abertura + 1:i]))
+                inicio = i + 1
+        elif char == ';' and profundidade == 0:
+            # Regras sem bloco (@import, @charset)
+            blocos.append((css[inicio:i + 1].strip(), None))
+            inicio = i + 1
+    return blocos
+
+
+def _token_presente(token: str, tokens: Set[str]) -> bool:
+    if token in tokens:
+        return True
+    return any(t.endswith('*') and token.startswith(t[:-1]) for t in tokens)
+
+
+def _seletor_presente(seletor: str, tokens: Set[str]) -> bool:
+    seletor = seletor.strip()
+    if seletor in SELETORES_GLOBAIS:
+        return True
+    return all(
+        _token_presente(prefixo + nome, tokens)
+        for prefixo, nome in _TOKEN_SELETOR_RE.findall(seletor)
+    )
+
+
+def _filtrar_regras(css: str, tokens: Set[str]) -> List[str]:
+    regras = []
+    keyframes = {}
+    for preludio, corpo in _blocos_css(css):
+        if corpo is None:
+            if preludio.startswith('@import'):
+                regras.append(preludio)
+        elif preludio.startswith(('@media', '@supports')):
+            internas = _filtrar_regras(corpo, tokens)
+            if internas:
+                regras.append(f"{preludio}{{{''.join(internas)}}}")
+        elif preludio.startswith(('@keyframes', '@-webkit-keyframes')):
+            keyframes[preludio.split()[-1]] = f'{preludio}{{{corpo}}}'
+        elif preludio.startswith('@font-face'):
+            regras.append(f'{preludio}{{{corpo}}}')
+        elif not preludio.startswith('@'):
+            seletores = [s for s in preludio.split(',') if _seletor_presente(s, tokens)]
+            if seletores:
+                regras.append(f"{','.join(seletores)}{{{corpo}}}")
+
+    # Mantém apenas as animações usadas pelas regras críticas
+    usadas = set()
+    for regra in regras:
+        for valor in _ANIMACAO_RE.findall(regra):
+            usadas.update(valor.replace(',', ' ').split())
+    regras.extend(bloco for nome, bloco in keyframes.items() if nome in usadas)
+    return regras
+
+
+def extrair_css_critico(css: str, html: str) -> str:
+    """Retorna apenas as regras de `css` que se aplicam à marcação `html`"""
+    css = _COMENTARIO_RE.sub('', css)
+    return minificar_css(''.join(_filtrar_regras(css, _tokens_html(html))))
+
+
+def construir_bundles(storage) -> Dict[str, str]:
+    """
+    Gera os bundles a partir dos arquivos já coletados em `storage`
+    Retorna {caminho: conteúdo} dos arquivos gerados
+    """
+    def ler(nome):
+        with storage.open(nome) as arquivo:
+            return arquivo.read().decode('utf-8')
+
+    css = '\n'.join(ler(nome) for nome in CSS_FONTES)
+    # Cada script termina com ';' para que a concatenação não una expressões
+    js = '\n;'.join(ler(nome) for nome in JS_FONTES)
+
+    bundles = {
+        CSS_BUNDLE: minificar_css(css),
+        JS_BUNDLE: minificar_js(js),
+    }
+    for pagina, template_name in PAGINAS_CRITICAS.items():
+        bundles[css_critico_path(pagina)] = extrair_css_critico(
+            css, _html_acima_da_dobra(template_name)
+        )
+    return bundles
+
+
+def get_contexto_service_worker() -> Dict[str, object]:
+    """
+    Lista de pré-cache e versão do service worker a partir do manifesto
+    A versão é o hash do manifesto, então muda a cada deploy com assets novos
+    """
+    arquivos = getattr(staticfiles_storage, 'hashed_files', None) or {}
+    precache = [staticfiles_storage.url(nome) for nome in SW_PRECACHE if nome in arquivos]
+    if arquivos:
+        conteudo = json.dumps(arquivos, sort_keys=True).encode('utf-8')
+        versao = hashlib.sha1(conteudo).hexdigest()[:12]
+    else:
+        versao = 'dev'
+    return {
+        'versao': versao,
+        'precache_urls': json.dumps(precache),
+        'max_paginas': SW_MAX_PAGINAS,
+        'max_imagens': SW_MAX_IMAGENS,
+    }
@@ -0,0 +1,115 @@
+"""
+Autocompletar da busca - Regional Veículos
+Índice de prefixos em memória sobre fabricante, modelo e ano dos carros
+disponíveis, reconstruído quando a versão do inventário muda. Só entram tipos
+que alguma página sabe filtrar (o motor não tem filtro nem entra na busca)
+"""
+
+import re
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+
+from .models import Carro
+from .signals import get_versao_inventario
+
+LIMITE_PADRAO = 8
+LIMITE_MAXIMO = 20
+
+# Ordem de desempate entre sugestões com o mesmo total de carros
+ORDEM_TIPOS = {'fabricante': 0, 'modelo': 1, 'ano': 2}
+
+# Respostas memorizadas por índice (cada tecla repete prefixos já digitados)
+MAX_MEMO = 2048
+
+_RE_PALAVRA = re.compile(r'[a-z0-9.]+')
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos ("Citroën" -> "citroen")"""
+    decomposto = unicodedata.normalize('NFKD', str(texto).lower())
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def palavras(texto):
+    return _RE_PALAVRA.findall(normalizar(texto))
+
+
+class IndiceAutocompletar:
+    """
+    Trie achatada: cada prefixo de palavra aponta para as sugestões que o contêm,
+    já na ordem do ranking, então as primeiras `limite` são a resposta
+    """
+
+    def __init__(self, versao, sugestoes):
+        # sugestoes: [(texto, tipo, total)]
+        self.versao = versao
+        self.sugestoes = sorted(sugestoes, key=lambda s: (-s[2], ORDEM_TIPOS[s[1]], s[0]))
+        self._palavras_sugestao = [tuple(palavras(texto)) for texto, _, _ in self.sugestoes]
+        prefixos = {}
+        for posicao, conjunto in enumerate(self._palavras_sugestao):
+            for prefixo in {palavra[:i] for palavra in conjunto for i in range(1, len(palavra) + 1)}:
+                prefixos.setdefault(prefixo, array('I')).append(posicao)
+        self._prefixos = prefixos
+        self._memo = {}
+
+    @classmethod
+    def construir(cls, versao):
+        """Uma consulta: conta os carros disponíveis por fabricante, modelo e ano"""
+        contagem = Counter()
+        linhas = Carro.objects.filter(condicao__in=['novo', 'seminovo']).values_list(
+            'fabricante', 'modelo', 'ano'
+        )
+        for fabricante, modelo, ano in linhas.iterator(chunk_size=2000):
+            contagem[(fabricante.strip(), 'fabricante')] += 1
+            contagem[(f'{fabricante.strip()} {modelo.strip()}', 'modelo')] += 1
+            contagem[(str(ano), 'ano')] += 1
+        return cls(versao, [(texto, tipo, total) for (texto, tipo), total in contagem.items()])
+
+    def sugerir(self, termo, limite=LIMITE_PADRAO):
+        """
+        Sugestões ranqueadas por número de carros
+        Cada palavra do termo precisa iniciar alguma palavra da sugestão
+        """
+        tokens = palavras(termo)
+        if not tokens:
+            return []
+        chave = (' '.join(tokens), limite)
+        if chave in self._memo:
+            return self._memo[chave]
+
+        # Percorre a lista do token mais seletivo e confere os demais em cada sugestão
+        listas = sorted((self._prefixos.get(token, ()) for token in set(tokens)), key=len)
+        resultado = []
+        for posicao in listas[0]:
+            if all(any(p.startswith(t) for p in self._palavras_sugestao[posicao]) for t in tokens):
+                resultado.append(self.sugestoes[posicao])
+                if len(resultado) == limite:
+                    break
+
+        if len(self._memo) >= MAX_MEMO:
+            self._memo.clear()
+        self._memo[chave] = resultado
+        return resultado
+
+
+_indice = None
+_lock = threading.Lock()
+
+
+def get_indice():
+    """Índice da versão atual do inventário (reconstruído por um só thread quando ela muda)"""
+    global _indice
+    versao = get_versao_inventario()
+    indice = _indice
+    if indice is not None and indice.versao == versao:
+        return indice
+    with _lock:
+        if _indice is None or _indice.versao != versao:
+            _indice = IndiceAutocompletar.construir(versao)
+        return _indice
+
+
+def sugerir(termo, limite=LIMITE_PADRAO):
+    return get_indice().sugerir(termo, limite)
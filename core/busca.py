@@ -0,0 +1,194 @@
+"""
+Busca aproximada de carros - Regional Veículos
+Tolera erros de digitação comparando trigramas das palavras ("corola" ~ "corolla"):
+pg_trgm com índices GIN no PostgreSQL e a tabela TrigramaCarro no SQLite.
+A descrição entra pelo termo exato ("teto solar"), depois dos resultados aproximados
+"""
+
+import math
+import operator
+from collections import defaultdict
+from functools import reduce
+from typing import List, NamedTuple, Optional
+
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection, connections, router, transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Greatest
+
+from .autocompletar import palavras
+from .models import Carro, TrigramaCarro
+
+# Similaridade mínima entre uma palavra digitada e uma palavra do carro
+LIMIAR = 0.4
+MAX_PALAVRAS = 5
+MAX_RESULTADOS = 200
+# Carros pontuados por palavra digitada, saídos dos trigramas mais raros dela
+MAX_CANDIDATOS = 2000
+# Carros mais bem colocados de onde sai o "você quis dizer"
+CARROS_SUGESTAO = 10
+
+CAMPOS_BUSCA = ('fabricante', 'modelo')
+DISPONIVEIS = ['novo', 'seminovo']
+
+LOTE_IDS = 900
+
+
+class ResultadoBusca(NamedTuple):
+    ids: List[int]
+    sugestao: Optional[str]
+
+
+def trigramas(palavra):
+    """Trigramas de uma palavra normalizada, com o mesmo preenchimento do pg_trgm"""
+    texto = f'  {palavra} '
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def similaridade(a, b):
+    ta, tb = trigramas(a), trigramas(b)
+    return len(ta & tb) / len(ta | tb)
+
+
+def indexar_carros(ids):
+    """Refaz as linhas de TrigramaCarro dos carros `ids` (o PostgreSQL usa os índices GIN)"""
+    if connection.vendor == 'postgresql':
+        return
+    ids = list(ids)
+    for inicio in range(0, len(ids), LOTE_IDS):
+        bloco = ids[inicio:inicio + LOTE_IDS]
+        TrigramaCarro.objects.filter(carro_id__in=bloco).delete()
+        linhas = []
+        for pk, *textos in Carro.objects.filter(pk__in=bloco).values_list('pk', *CAMPOS_BUSCA):
+            for palavra in set(palavras(' '.join(textos))):
+                trigramas_palavra = trigramas(palavra)
+                linhas.extend(
+                    TrigramaCarro(carro_id=pk, trigrama=trigrama, palavra=palavra[:100], tamanho=len(trigramas_palavra))
+                    for trigrama in trigramas_palavra
+                )
+        TrigramaCarro.objects.bulk_create(linhas, batch_size=1000)
+
+
+def _trigramas_raros(alvo, frequencia):
+    """
+    Filtro de prefixo: com similaridade >= LIMIAR a palavra tem ao menos ceil(LIMIAR * |alvo|)
+    trigramas do alvo, logo contém algum dos |alvo| - ceil(LIMIAR * |alvo|) + 1 mais raros
+    """
+    prefixo = len(alvo) - math.ceil(LIMIAR * len(alvo)) + 1
+    raros = sorted(alvo, key=lambda trigrama: (frequencia.get(trigrama, 0), trigrama))[:prefixo]
+    return [trigrama for trigrama in raros if trigrama in frequencia]
+
+
+def _pontuar_sqlite(tokens):
+    """
+    Similaridade (Jaccard de trigramas) da melhor palavra de cada carro para cada token
+    Só os carros com algum trigrama raro do token são pontuados, não todo carro com "  c"
+    """
+    alvos = {token: trigramas(token) for token in tokens}
+    frequencia = dict(
+        TrigramaCarro.objects
+        .filter(trigrama__in=set().union(*alvos.values()))
+        .values('trigrama')
+        .annotate(total=Count('id'))
+        .order_by()
+        .values_list('trigrama', 'total')
+    )
+    melhores = defaultdict(dict)
+    for token, alvo in alvos.items():
+        raros = _trigramas_raros(alvo, frequencia)
+        if not raros:
+            continue
+        candidatos = (
+            TrigramaCarro.objects
+            .filter(trigrama__in=raros, carro__condicao__in=DISPONIVEIS)
+            .order_by('-carro_id')
+            .values('carro_id')
+            .distinct()[:MAX_CANDIDATOS]
+        )
+        linhas = (
+            TrigramaCarro.objects
+            .filter(trigrama__in=alvo, carro_id__in=candidatos)
+            .values('carro_id', 'palavra', 'tamanho')
+            .annotate(comuns=Count('id'))
+            .values_list('carro_id', 'tamanho', 'comuns')
+        )
+        for carro_id, tamanho, comuns in linhas:
+            valor = comuns / (len(alvo) + tamanho - comuns)
+            if valor >= LIMIAR and valor > melhores[carro_id].get(token, 0):
+                melhores[carro_id][token] = valor
+    pontuados = [(sum(valores.values()) / len(tokens), carro_id) for carro_id, valores in melhores.items()]
+    # Mesma pontuação: o mais recente (maior id) primeiro
+    pontuados.sort(reverse=True)
+    return [carro_id for _, carro_id in pontuados[:MAX_RESULTADOS]]
+
+
+def _pontuar_postgresql(tokens):
+    """
+    word_similarity do pg_trgm; o filtro %> é servido pelos índices GIN de fabricante e modelo
+    O limiar vale só para a transação (set_config local) e no mesmo banco da consulta
+    """
+    banco = router.db_for_read(Carro)
+    filtro = reduce(operator.or_, (
+        Q(TrigramWordSimilar(F(campo), Value(token))) for token in tokens for campo in CAMPOS_BUSCA
+    ))
+    pontuacao = reduce(operator.add, (
+        Greatest(*(TrigramWordSimilarity(Value(token), campo) for campo in CAMPOS_BUSCA)) for token in tokens
+    )) / len(tokens)
+    with transaction.atomic(using=banco):
+        with connections[banco].cursor() as cursor:
+            cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", [str(LIMIAR)])
+        return list(
+            Carro.objects.using(banco).filter(filtro, condicao__in=DISPONIVEIS)
+            .annotate(similaridade=pontuacao)
+            .order_by('-similaridade', '-criado_em')
+            .values_list('pk', flat=True)[:MAX_RESULTADOS]
+        )
+
+
+def _na_descricao(termo, excluir):
+    """Carros disponíveis com o termo exato na descrição, mais recentes primeiro"""
+    ids = (
+        Carro.objects.filter(descricao__icontains=termo, condicao__in=DISPONIVEIS)
+        .order_by('-criado_em')
+        .values_list('pk', flat=True)[:MAX_RESULTADOS]
+    )
+    return [pk for pk in ids if pk not in excluir]
+
+
+def _sugestao(tokens, ids):
+    """Troca cada palavra desconhecida pela mais parecida entre os primeiros resultados"""
+    vocabulario = set()
+    for textos in Carro.objects.filter(pk__in=ids[:CARROS_SUGESTAO]).order_by().values_list(*CAMPOS_BUSCA):
+        vocabulario.update(palavras(' '.join(textos)))
+    if not vocabulario:
+        return None
+    corrigidos = []
+    for token in tokens:
+        if token not in vocabulario:
+            melhor = max(sorted(vocabulario), key=lambda palavra: similaridade(token, palavra))
+            if similaridade(token, melhor) >= LIMIAR:
+                token = melhor
+        corrigidos.append(token)
+    return ' '.join(corrigidos) if corrigidos != tokens else None
+
+
+def buscar_aproximado(termo) -> ResultadoBusca:
+    """
+    Ids dos carros disponíveis ordenados por similaridade com `termo` (fabricante e modelo),
+    seguidos dos que só têm o termo na descrição, mais o "você quis dizer"
+    """
+    tokens = list(dict.fromkeys(palavras(termo)))[:MAX_PALAVRAS]
+    if not tokens:
+        return ResultadoBusca([], None)
+    pontuar = _pontuar_postgresql if connection.vendor == 'postgresql' else _pontuar_sqlite
+    ids = pontuar(tokens)
+    sugestao = _sugestao(tokens, ids)
+    ids += _na_descricao(termo.strip(), set(ids))
+    return ResultadoBusca(ids[:MAX_RESULTADOS], sugestao)
+
+
+def cards_em_ordem(ids):
+    """CarroCards dos `ids`, na mesma ordem"""
+    cards = {card.id: card for card in Carro.objects.filter(pk__in=ids).order_by().cards()}
+    return [cards[pk] for pk in ids if pk in cards]
@@ -0,0 +1,140 @@
+"""
+Cache protegido contra estouro (stampede) - Regional Veículos
+
+Quando uma entrada expira ou o inventário muda, apenas um worker recalcula
+o valor (lock no cache) enquanto os demais continuam servindo a cópia antiga.
+Entradas também podem ser recalculadas um pouco antes de expirar, com
+probabilidade crescente conforme o prazo se aproxima (expiração antecipada
+probabilística), para que o recálculo não aconteça em todos os workers ao mesmo tempo.
+"""
+
+import functools
+import hashlib
+import math
+import random
+import threading
+import time
+
+from django.core.cache import cache
+
+from .signals import get_versao_inventario
+
+CACHE_TIMEOUT = 60 * 15
+# Por quanto tempo uma entrada vencida ainda pode ser servida enquanto outro worker recalcula
+JANELA_STALE = 60 * 60
+# Tempo máximo do lock de recálculo e da espera por ele quando não há cópia antiga
+LOCK_TIMEOUT = 30
+ESPERA_MAXIMA = 5
+INTERVALO_ESPERA = 0.05
+# Quanto maior, mais cedo o recálculo antecipado tende a acontecer
+BETA = 1.0
+
+_metricas = {
+    'hits': 0,
+    'misses': 0,
+    'stale_servidos': 0,
+    'recalculos': 0,
+    'recalculos_antecipados': 0,
+    'esperas_lock': 0,
+    'tempo_espera_lock': 0.0,
+}
+_metricas_lock = threading.Lock()
+
+
+def _contar(nome, quantidade=1):
+    with _metricas_lock:
+        _metricas[nome] += quantidade
+
+
+def get_metricas_stampede():
+    """Contadores da proteção contra estouro neste processo"""
+    with _metricas_lock:
+        return dict(_metricas)
+
+
+def _expira_antecipadamente(entrada, beta):
+    """XFetch: recalcula antes do prazo com probabilidade proporcional ao custo do cálculo"""
+    return time.time() - entrada['custo'] * beta * math.log(1.0 - random.random()) >= entrada['expira_em']
+
+
+def _recalcular(chave, gerar, timeout, versao):
+    inicio = time.time()
+    valor = gerar()
+    agora = time.time()
+    cache.set(chave, {
+        'valor': valor,
+        'versao': versao,
+        'custo': agora - inicio,
+        'expira_em': agora + timeout,
+    }, timeout + JANELA_STALE)
+    _contar('recalculos')
+    return valor
+
+
+def obter_ou_recalcular(chave, gerar, timeout=CACHE_TIMEOUT, beta=BETA):
+    """
+    Retorna o valor de `chave`, chamando `gerar()` em um único worker quando
+    a entrada está ausente, vencida ou é de uma versão anterior do inventário
+    """
+    versao = get_versao_inventario()
+    entrada = cache.get(chave)
+    valida = (
+        entrada is not None
+        and entrada['versao'] == versao
+        and time.time() < entrada['expira_em']
+    )
+    if valida and not _expira_antecipadamente(entrada, beta):
+        _contar('hits')
+        return entrada['valor']
+
+    lock = f'{chave}:lock'
+    if cache.add(lock, 1, LOCK_TIMEOUT):
+        try:
+            if valida:
+                _contar('recalculos_antecipados')
+            else:
+                _contar('misses')
+            return _recalcular(chave, gerar, timeout, versao)
+        finally:
+            cache.delete(lock)
+
+    # Outro worker já está recalculando
+    if entrada is not None:
+        _contar('hits' if valida else 'stale_servidos')
+        return entrada['valor']
+
+    _contar('esperas_lock')
+    inicio = time.monotonic()
+    try:
+        while time.monotonic() - inicio < ESPERA_MAXIMA:
+            time.sleep(INTERVALO_ESPERA)
+            entrada = cache.get(chave)
+            if entrada is not None and entrada['versao'] == versao:
+                return entrada['valor']
+            if not cache.has_key(lock):
+                break
+    finally:
+        _contar('tempo_espera_lock', time.monotonic() - inicio)
+
+    # O lock expirou ou o worker que recalculava falhou: calcula aqui mesmo
+    _contar('misses')
+    return _recalcular(chave, gerar, timeout, versao)
+
+
+def cache_protegido(prefixo, timeout=CACHE_TIMEOUT, beta=BETA):
+    """
+    Decorator de `obter_ou_recalcular` para funções cujos argumentos formam a chave
+    A função deve retornar um valor serializável (lista, dict), não um QuerySet
+    """
+    def decorator(funcao):
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            chave = prefixo
+            if args or kwargs:
+                assinatura = repr((args, sorted(kwargs.items()))).encode('utf-8')
+                chave = f'{prefixo}:{hashlib.md5(assinatura).hexdigest()}'
+            return obter_ou_recalcular(
+                chave, lambda: funcao(*args, **kwargs), timeout=timeout, beta=beta
+            )
+        return wrapper
+    return decorator
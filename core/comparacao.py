@@ -0,0 +1,85 @@
+"""
+Comparação lado a lado de carros - Regional Veículos
+Até MAX_CARROS carros buscados numa única consulta (in_bulk); a matriz renderizada
+fica em cache por conjunto de ids, com o atualizado_em de cada carro na chave
+"""
+
+import hashlib
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from .cache import CACHE_TIMEOUT
+from .models import Carro, formatar_preco, formatar_quilometragem
+
+MAX_CARROS = 4
+# Faixa de um id válido (bigint); fora dela o banco nem aceita o parâmetro
+MAX_ID = 2 ** 63 - 1
+
+CAMPOS = (
+    'fabricante', 'modelo', 'ano', 'quilometragem', 'preco', 'motor', 'cambio',
+    'combustivel', 'condicao', 'imagem_principal', 'atualizado_em',
+)
+
+
+def parse_ids(valores):
+    """Ids de `?ids=1,2&ids=3`, sem repetição e em ordem crescente; ValueError se inválidos"""
+    ids = set()
+    for valor in valores:
+        for parte in valor.split(','):
+            parte = parte.strip()
+            if not parte:
+                continue
+            if not parte.isdigit() or not 1 <= int(parte) <= MAX_ID:
+                raise ValueError(f'id inválido: {parte[:20]}')
+            ids.add(int(parte))
+    if len(ids) > MAX_CARROS:
+        raise ValueError(f'compare no máximo {MAX_CARROS} carros')
+    return sorted(ids)
+
+
+def buscar_carros(ids):
+    """Carros à venda dos `ids` numa consulta, na ordem dos ids (inexistentes e vendidos ficam de fora)"""
+    carros = Carro.objects.filter(condicao__in=['novo', 'seminovo']).only(*CAMPOS).order_by().in_bulk(ids)
+    return [carros[pk] for pk in ids if pk in carros]
+
+
+def _melhor(valores, escolher):
+    """Posição do melhor valor, se houver diferença entre os carros"""
+    if len(set(valores)) < 2:
+        return None
+    return valores.index(escolher(valores))
+
+
+def linhas_matriz(carros):
+    """[(rótulo, valores formatados, posição do melhor ou None)] de cada especificação"""
+    precos = [carro.preco for carro in carros]
+    anos = [carro.ano for carro in carros]
+    quilometragens = [carro.quilometragem for carro in carros]
+    return [
+        ('Preço', [formatar_preco(valor) for valor in precos], _melhor(precos, min)),
+        ('Ano', anos, _melhor(anos, max)),
+        ('Quilometragem', [f'{formatar_quilometragem(valor)} km' for valor in quilometragens],
+         _melhor(quilometragens, min)),
+        ('Motor', [carro.motor for carro in carros], None),
+        ('Câmbio', [carro.cambio for carro in carros], None),
+        ('Combustível', [carro.combustivel for carro in carros], None),
+    ]
+
+
+def chave_cache(carros):
+    carimbo = '|'.join(f'{carro.pk}:{carro.atualizado_em.isoformat()}' for carro in carros)
+    ids = '-'.join(str(carro.pk) for carro in carros)
+    return f"comparar:{ids}:{hashlib.md5(carimbo.encode()).hexdigest()[:12]}"
+
+
+def matriz_html(carros):
+    """Matriz renderizada; um carro alterado muda a chave e a entrada antiga só expira"""
+    return cache.get_or_set(
+        chave_cache(carros),
+        lambda: render_to_string('core/matriz_comparacao.html', {
+            'carros': carros,
+            'linhas': linhas_matriz(carros),
+        }),
+        CACHE_TIMEOUT,
+    )
@@ -0,0 +1,125 @@
+"""
+Filtros e ordenação do estoque - Regional Veículos
+Todo valor vindo da URL passa pelo formulário antes de chegar ao ORM; os
+inválidos são descartados (com a mensagem de erro) em vez de ir para a consulta
+"""
+
+from django import forms
+from django.db import connection
+from django.db.models import F, Func
+
+from .models import Carro
+
+# ?ordem= -> (rótulo, ordenação); cada ordenação tem um índice com as mesmas
+# colunas (Carro.Meta.indexes), também precedido de fabricante; preço também
+# precedido de combustível e de câmbio
+ORDENS_ESTOQUE = {
+    'recentes': ('Mais recentes', ('-criado_em',)),
+    'populares': ('Mais vistos', ('-popularidade', '-criado_em')),
+    'menor_preco': ('Menor preço', ('preco', 'id')),
+    'maior_preco': ('Maior preço', ('-preco', '-id')),
+    'mais_novos': ('Ano mais novo', ('-ano', '-id')),
+    'menor_km': ('Menor quilometragem', ('quilometragem', 'id')),
+}
+ORDEM_PADRAO = 'recentes'
+# Teto das faixas de km (valores maiores estouram o inteiro do banco)
+MAX_KM = 2_000_000
+
+# Campo do formulário -> lookup no ORM
+LOOKUPS = {
+    'fabricante': 'fabricante',
+    'condicao': 'condicao',
+    'combustivel': 'combustivel',
+    'cambio': 'cambio',
+    'preco_min': 'preco__gte',
+    'preco_max': 'preco__lte',
+    'ano_min': 'ano__gte',
+    'ano_max': 'ano__lte',
+    'km_min': 'quilometragem__gte',
+    'km_max': 'quilometragem__lte',
+}
+FAIXAS = (('preco_min', 'preco_max', 'preço'), ('ano_min', 'ano_max', 'ano'), ('km_min', 'km_max', 'quilometragem'))
+
+
+def opcoes_estoque():
+    """Valores de fabricante, combustível e câmbio dos carros à venda (opções dos selects)"""
+    disponiveis = Carro.objects.filter(condicao__in=['novo', 'seminovo'])
+    return {
+        campo: list(disponiveis.order_by(campo).values_list(campo, flat=True).distinct())
+        for campo in ('fabricante', 'combustivel', 'cambio')
+    }
+
+
+def _sem_indice(coluna):
+    """`+coluna`: mesmo valor, mas o planejador não usa índice para filtrar por ela"""
+    return Func(F(coluna), template='(+%(expressions)s)', output_field=Carro._meta.get_field(coluna))
+
+
+def aplicar_filtros(queryset, filtros, ordenacao=None):
+    """
+    Aplica os filtros preenchidos de `filtros` (chaves de LOOKUPS)
+    Com `ordenacao`, no SQLite, faixas em outra coluna não disputam o índice da
+    ordenação: sem estatísticas de distribuição o planejador troca o índice ordenado
+    por uma busca na faixa seguida de sort. O PostgreSQL estima a seletividade da
+    faixa e escolhe sozinho entre os dois índices. A contagem não usa `ordenacao`
+    """
+    ordenada = ordenacao[0].lstrip('-') if ordenacao and connection.vendor == 'sqlite' else None
+    condicoes = {}
+    for campo, valor in filtros.items():
+        if campo not in LOOKUPS or valor in (None, ''):
+            continue
+        coluna, _, operador = LOOKUPS[campo].partition('__')
+        if operador and ordenada and coluna != ordenada:
+            nome = f'{coluna}_faixa'
+            queryset = queryset.alias(**{nome: _sem_indice(coluna)})
+            condicoes[f'{nome}__{operador}'] = valor
+        else:
+            condicoes[LOOKUPS[campo]] = valor
+    return queryset.filter(**condicoes)
+
+
+class FiltroEstoqueForm(forms.Form):
+    fabricante = forms.ChoiceField(label='Marca', required=False)
+    condicao = forms.ChoiceField(
+        label='Condição', required=False,
+        choices=[('', 'Todas as condições'), ('novo', 'Novo'), ('seminovo', 'Seminovo')],
+    )
+    combustivel = forms.ChoiceField(label='Combustível', required=False)
+    cambio = forms.ChoiceField(label='Câmbio', required=False)
+    preco_min = forms.DecimalField(label='Preço mínimo', required=False, min_value=0, max_digits=10, decimal_places=2)
+    preco_max = forms.DecimalField(label='Preço máximo', required=False, min_value=0, max_digits=10, decimal_places=2)
+    ano_min = forms.IntegerField(label='Ano de', required=False, min_value=1900, max_value=2100)
+    ano_max = forms.IntegerField(label='Ano até', required=False, min_value=1900, max_value=2100)
+    km_min = forms.IntegerField(label='Km mínimo', required=False, min_value=0, max_value=MAX_KM)
+    km_max = forms.IntegerField(label='Km máximo', required=False, min_value=0, max_value=MAX_KM)
+    ordem = forms.ChoiceField(
+        label='Ordenar por', required=False,
+        choices=[(valor, rotulo) for valor, (rotulo, _) in ORDENS_ESTOQUE.items()],
+    )
+
+    def __init__(self, *args, opcoes, **kwargs):
+        super().__init__(*args, **kwargs)
+        for campo, vazio in (('fabricante', 'Todas as marcas'), ('combustivel', 'Todos os combustíveis'),
+                             ('cambio', 'Todos os câmbios')):
+            self.fields[campo].choices = [('', vazio)] + [(valor, valor) for valor in opcoes[campo]]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for minimo, maximo, nome in FAIXAS:
+            inicio, fim = cleaned_data.get(minimo), cleaned_data.get(maximo)
+            if inicio is not None and fim is not None and inicio > fim:
+                self.add_error(maximo, f'O {nome} máximo deve ser maior que o mínimo.')
+        return cleaned_data
+
+    def filtros(self):
+        """Filtros válidos; campos com erro ficam de fora (is_valid() precisa ter rodado)"""
+        return {
+            campo: valor for campo in LOOKUPS
+            if (valor := self.cleaned_data.get(campo)) not in (None, '')
+        }
+
+    def ordem_escolhida(self):
+        return self.cleaned_data.get('ordem') or ORDEM_PADRAO
+
+    def ordenacao(self):
+        return ORDENS_ESTOQUE[self.ordem_escolhida()][1]
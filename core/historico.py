@@ -0,0 +1,108 @@
+"""
+Histórico de preço e condição dos carros - Regional Veículos
+Monta os eventos gravados em HistoricoCarro; usado pelos sinais de save/delete
+e por operações em lote (que não disparam sinais)
+"""
+
+import logging
+from typing import List, Optional
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.db.models import Case, Max, Value, When
+from django.dispatch import Signal
+
+from .models import HistoricoCarro
+
+logger = logging.getLogger(__name__)
+
+# Disparado com a lista de eventos gravados (save, lote, importador ou ações do admin)
+eventos_registrados = Signal()
+
+# Chave do advisory lock do PostgreSQL que serializa a numeração
+TRAVA_SEQUENCIA = 4_039_001
+LOTE_SEQUENCIA = 500
+
+
+def eventos_alteracao(carro_id, anterior: Optional[dict], atual: Optional[dict]) -> List[HistoricoCarro]:
+    """
+    Eventos entre dois estados {'preco', 'condicao'} de um carro
+    `anterior` None indica criação; `atual` None indica remoção
+    """
+    if anterior is None:
+        return [HistoricoCarro(
+            carro_id=carro_id, tipo='criado',
+            preco_novo=atual['preco'], condicao_nova=atual['condicao'],
+        )]
+    if atual is None:
+        return [HistoricoCarro(
+            carro_id=carro_id, tipo='removido',
+            preco_anterior=anterior['preco'], condicao_anterior=anterior['condicao'],
+        )]
+
+    eventos = []
+    if anterior['preco'] != atual['preco']:
+        eventos.append(HistoricoCarro(
+            carro_id=carro_id, tipo='preco',
+            preco_anterior=anterior['preco'], preco_novo=atual['preco'],
+        ))
+    if anterior['condicao'] != atual['condicao']:
+        eventos.append(HistoricoCarro(
+            carro_id=carro_id, tipo='condicao',
+            condicao_anterior=anterior['condicao'], condicao_nova=atual['condicao'],
+        ))
+    return eventos
+
+
+def registrar_eventos(eventos: List[HistoricoCarro]):
+    if eventos:
+        HistoricoCarro.objects.bulk_create(eventos, batch_size=500)
+        eventos_registrados.send(sender=HistoricoCarro, eventos=eventos)
+        # Numera quem grava, depois do commit: o GET do feed continua somente leitura
+        transaction.on_commit(_numerar_apos_commit)
+
+
+def _numerar_apos_commit():
+    try:
+        numerar_eventos()
+    except DatabaseError:
+        # A gravação já foi confirmada; a próxima numeração (ou o comando numerar_historico) pega estes
+        logger.warning('Falha ao numerar o histórico para o feed', exc_info=True)
+
+
+def _travar_sequencia(isolar):
+    conexao = connections[DEFAULT_DB_ALIAS]
+    if conexao.vendor == 'postgresql':
+        with conexao.cursor() as cursor:
+            if isolar:
+                # Primeira instrução da transação: em READ COMMITTED cada consulta depois
+                # do lock enxerga a numeração confirmada por quem o tinha (em SERIALIZABLE,
+                # o padrão do settings_professional, o snapshot seria anterior ao lock)
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL READ COMMITTED')
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [TRAVA_SEQUENCIA])
+    # No SQLite a escrita já é única; a unique de `sequencia` barra uma numeração repetida
+
+
+def numerar_eventos():
+    """
+    Dá `sequencia` aos eventos já confirmados que ainda não têm, em ordem de id
+    A numeração é serializada e só enxerga linhas confirmadas: um evento de uma
+    transação longa, com id menor, recebe número maior que os já entregues pelo
+    feed, então o cursor por `sequencia` nunca o pula
+    """
+    historico = HistoricoCarro.objects.using(DEFAULT_DB_ALIAS)
+    # Dentro de uma transação já aberta (verificar_planos) o nível não pode mais mudar
+    isolar = not connections[DEFAULT_DB_ALIAS].in_atomic_block
+    while True:
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            _travar_sequencia(isolar)
+            pendentes = list(
+                historico.filter(sequencia__isnull=True).order_by('id').values_list('id', flat=True)[:LOTE_SEQUENCIA]
+            )
+            if not pendentes:
+                return
+            ultima = historico.aggregate(ultima=Max('sequencia'))['ultima'] or 0
+            historico.filter(pk__in=pendentes).update(sequencia=Case(
+                *[When(pk=pk, then=Value(ultima + posicao)) for posicao, pk in enumerate(pendentes, 1)]
+            ))
+        if len(pendentes) < LOTE_SEQUENCIA:
+            return
@@ -0,0 +1,409 @@
+"""
+Importação do estoque a partir do feed do DMS - Regional Veículos
+
+Lê exportações CSV ou XML em streaming, casa cada linha com o carro pelo
+código de estoque e grava apenas as diferenças, em lotes (bulk_create/bulk_update).
+Imagens só são baixadas quando a URL de origem muda. O cache do inventário é
+invalidado uma única vez, ao final.
+
+Colunas/tags esperadas por veículo: codigo, modelo, fabricante, ano, cor,
+quilometragem, combustivel, cambio, motor, preco, condicao, destaque,
+descricao e imagens (URLs separadas por "|" no CSV; uma tag <imagem> cada no XML).
+"""
+
+import csv
+import http.client
+import io
+import ipaddress
+import os
+import posixpath
+import re
+import socket
+import urllib.request
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlparse
+from xml.etree import ElementTree
+
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .busca import indexar_carros
+from .historico import eventos_alteracao, registrar_eventos
+from .models import Carro, CarroImagem
+from .signals import notificar_alteracao_inventario
+
+TAMANHO_LOTE = 500
+TIMEOUT_DOWNLOAD = 15
+# Imagens maiores são recusadas (o download para ao passar do limite)
+MAX_BYTES_IMAGEM = 10 * 1024 * 1024
+ESQUEMAS_IMAGEM = ('http', 'https')
+# Formato detectado pelo Pillow -> extensão gravada
+FORMATOS_IMAGEM = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+TAG_VEICULO = 'veiculo'
+
+# Coluna do feed -> campo de Carro
+CAMPOS_FEED = {
+    'modelo': 'modelo',
+    'fabricante': 'fabricante',
+    'ano': 'ano',
+    'cor': 'cor',
+    'quilometragem': 'quilometragem',
+    'combustivel': 'combustivel',
+    'cambio': 'cambio',
+    'motor': 'motor',
+    'preco': 'preco',
+    'condicao': 'condicao',
+    'destaque': 'destaque',
+    'descricao': 'descricao',
+}
+CONDICOES = {valor for valor, _ in Carro.CONDICAO_CHOICES}
+
+# "45.990" / "1.245.990,00": pontos como separador de milhar
+_RE_MILHAR = re.compile(r'^\d{1,3}(\.\d{3})+(,\d+)?$')
+
+
+class ErroImportacao(ValueError):
+    """Linha do feed inválida (a linha é ignorada e reportada)"""
+
+
+class RelatorioImportacao:
+    """Contagens e diferenças encontradas durante a importação"""
+
+    def __init__(self, guardar_diferencas=False):
+        self.guardar_diferencas = guardar_diferencas
+        self.criados = 0
+        self.atualizados = 0
+        self.inalterados = 0
+        self.vendidos = 0
+        self.imagens_baixadas = 0
+        self.erros = []
+        # (codigo, {campo: (antes, depois)}) — guardado só no dry-run
+        self.diferencas = []
+
+    def registrar_diferenca(self, codigo, diferencas):
+        if self.guardar_diferencas:
+            self.diferencas.append((codigo, diferencas))
+
+    @property
+    def houve_alteracao(self):
+        return bool(self.criados or self.atualizados or self.vendidos)
+
+    def resumo(self):
+        return (
+            f'{self.criados} criados, {self.atualizados} atualizados, '
+            f'{self.inalterados} inalterados, {self.vendidos} marcados como vendidos, '
+            f'{self.imagens_baixadas} imagens baixadas, {len(self.erros)} erros'
+        )
+
+
+# Leitura do feed ---------------------------------------------------------
+
+def ler_csv(arquivo):
+    """Linhas do CSV como dicts (arquivo binário ou texto)"""
+    if isinstance(arquivo.read(0), bytes):
+        arquivo = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    for linha in csv.DictReader(arquivo):
+        linha['imagens'] = [url.strip() for url in (linha.get('imagens') or '').split('|') if url.strip()]
+        yield linha
+
+
+def ler_xml(arquivo):
+    """Cada <veiculo> como dict, liberando os elementos já lidos"""
+    for _, elemento in ElementTree.iterparse(arquivo, events=('end',)):
+        if elemento.tag != TAG_VEICULO:
+            continue
+        linha = {filho.tag: (filho.text or '').strip() for filho in elemento if filho.tag != 'imagens'}
+        linha['imagens'] = [
+            (imagem.text or '').strip()
+            for imagem in elemento.iter('imagem')
+            if (imagem.text or '').strip()
+        ]
+        elemento.clear()
+        yield linha
+
+
+def converter_preco(valor):
+    """Preço do feed em Decimal: aceita 45990.00, 45990,00 e 45.990,00 (milhar com ponto)"""
+    if _RE_MILHAR.match(valor) or ',' in valor:
+        valor = valor.replace('.', '').replace(',', '.')
+    return Decimal(valor).quantize(Decimal('0.01'))
+
+
+def normalizar(linha):
+    """Converte uma linha do feed em {campo: valor} de Carro, mais 'imagens'"""
+    codigo = (linha.get('codigo') or '').strip()
+    if not codigo:
+        raise ErroImportacao('codigo ausente')
+
+    dados = {'codigo_estoque': codigo}
+    for coluna, campo in CAMPOS_FEED.items():
+        valor = (linha.get(coluna) or '').strip()
+        if campo in ('ano', 'quilometragem'):
+            try:
+                valor = int(valor.replace('.', ''))
+            except ValueError:
+                raise ErroImportacao(f'{coluna} inválido: {valor!r}')
+        elif campo == 'preco':
+            try:
+                valor = converter_preco(valor)
+            except InvalidOperation:
+                raise ErroImportacao(f'preco inválido: {valor!r}')
+        elif campo == 'destaque':
+            valor = valor.lower() in ('1', 'true', 'sim', 's')
+        elif campo == 'condicao':
+            valor = valor.lower()
+            if valor not in CONDICOES:
+                raise ErroImportacao(f'condicao inválida: {valor!r}')
+        elif not valor and campo in ('modelo', 'fabricante'):
+            raise ErroImportacao(f'{coluna} ausente')
+        dados[campo] = valor
+
+    dados['imagens'] = linha.get('imagens') or []
+    return dados
+
+
+# Imagens -----------------------------------------------------------------
+
+def validar_url_imagem(url):
+    """
+    Só http(s) para hosts públicos: a URL vem do feed, então file://, a rede
+    interna e o loopback ficam de fora (ValueError)
+    """
+    partes = urlparse(url)
+    if partes.scheme not in ESQUEMAS_IMAGEM or not partes.hostname:
+        raise ValueError(f'URL de imagem não permitida: {url[:200]!r}')
+    try:
+        enderecos = socket.getaddrinfo(partes.hostname, partes.port or 443, proto=socket.IPPROTO_TCP)
+    except socket.gaierror as erro:
+        raise ValueError(f'host da imagem não resolvido: {partes.hostname}') from erro
+    for *_, sockaddr in enderecos:
+        if not ipaddress.ip_address(sockaddr[0].split('%')[0]).is_global:
+            raise ValueError(f'host da imagem em rede interna: {partes.hostname}')
+
+
+class _RedirecionamentoValidado(urllib.request.HTTPRedirectHandler):
+    """Cada redirect passa pela mesma validação da URL original"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        validar_url_imagem(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+_abridor = urllib.request.OpenerDirector()
+for _handler in (
+    urllib.request.HTTPHandler(), urllib.request.HTTPSHandler(), _RedirecionamentoValidado(),
+    urllib.request.HTTPErrorProcessor(), urllib.request.HTTPDefaultErrorHandler(),
+):
+    _abridor.add_handler(_handler)
+
+
+def _formato_imagem(conteudo, url):
+    """(extensão, largura, altura) do formato detectado pelo Pillow; o resto é recusado"""
+    try:
+        with Image.open(io.BytesIO(conteudo)) as imagem:
+            formato, (largura, altura) = imagem.format, imagem.size
+    except (OSError, Image.DecompressionBombError) as erro:
+        raise ValueError(f'conteúdo não é uma imagem: {url[:200]}') from erro
+    if formato not in FORMATOS_IMAGEM:
+        raise ValueError(f'formato de imagem não aceito ({formato}): {url[:200]}')
+    return FORMATOS_IMAGEM[formato], largura, altura
+
+
+def baixar_imagem(url):
+    """Baixa a imagem e a grava no storage de media; retorna (nome salvo, largura, altura)"""
+    validar_url_imagem(url)
+    with _abridor.open(url, timeout=TIMEOUT_DOWNLOAD) as resposta:
+        tamanho = resposta.headers.get('Content-Length')
+        if tamanho and tamanho.isdigit() and int(tamanho) > MAX_BYTES_IMAGEM:
+            raise ValueError(f'imagem maior que {MAX_BYTES_IMAGEM} bytes: {url[:200]}')
+        conteudo = resposta.read(MAX_BYTES_IMAGEM + 1)
+    if len(conteudo) > MAX_BYTES_IMAGEM:
+        raise ValueError(f'imagem maior que {MAX_BYTES_IMAGEM} bytes: {url[:200]}')
+    # A extensão vem do conteúdo, não da URL: o feed não escolhe o tipo do arquivo em media
+    extensao, largura, altura = _formato_imagem(conteudo, url)
+    base = posixpath.splitext(posixpath.basename(urlparse(url).path))[0] or 'imagem'
+    nome = default_storage.save(os.path.join('carros', f'{base}.{extensao}'), ContentFile(conteudo))
+    return nome, largura, altura
+
+
+# Aplicação das diferenças ------------------------------------------------
+
+def _diferencas(carro, dados):
+    return {
+        campo: (getattr(carro, campo), valor)
+        for campo, valor in dados.items()
+        if campo in CAMPOS_FEED.values() and getattr(carro, campo) != valor
+    }
+
+
+def _origens_galeria(carro_ids):
+    origens = {}
+    for carro_id, origem in (
+        CarroImagem.objects.filter(carro_id__in=carro_ids)
+        .order_by('carro_id', 'ordem', 'id')
+        .values_list('carro_id', 'origem')
+    ):
+        origens.setdefault(carro_id, []).append(origem)
+    return origens
+
+
+def _processar_lote(lote, relatorio, dry_run, baixar):
+    codigos = [dados['codigo_estoque'] for dados in lote]
+    existentes = Carro.objects.only(
+        'id', 'codigo_estoque', 'imagem_origem', *CAMPOS_FEED.values()
+    ).in_bulk(codigos, field_name='codigo_estoque')
+    galerias = _origens_galeria([carro.pk for carro in existentes.values()])
+
+    agora = timezone.now()
+    novos, alterados, campos_alterados, eventos = [], [], set(), []
+    # (carro, URLs da imagem principal + galeria) a baixar
+    imagens_pendentes = []
+
+    for dados in lote:
+        imagens = dados.pop('imagens')
+        carro = existentes.get(dados['codigo_estoque'])
+        if carro is None:
+            carro = Carro(**dados)
+            novos.append(carro)
+            relatorio.registrar_diferenca(dados['codigo_estoque'], {'novo': (None, dados['modelo'])})
+            if imagens:
+                imagens_pendentes.append((carro, imagens))
+            continue
+
+        diferencas = _diferencas(carro, dados)
+        origens_atuais = ([carro.imagem_origem] if carro.imagem_origem else []) + galerias.get(carro.pk, [])
+        imagens_mudaram = bool(imagens) and imagens != origens_atuais
+        if imagens_mudaram:
+            diferencas['imagens'] = (len(origens_atuais), len(imagens))
+            imagens_pendentes.append((carro, imagens))
+        if not diferencas:
+            relatorio.inalterados += 1
+            continue
+
+        relatorio.registrar_diferenca(carro.codigo_estoque, diferencas)
+        anterior = {'preco': carro.preco, 'condicao': carro.condicao}
+        for campo, (_, valor) in diferencas.items():
+            if campo != 'imagens':
+                setattr(carro, campo, valor)
+                campos_alterados.add(campo)
+        eventos.extend(eventos_alteracao(carro.pk, anterior, {'preco': carro.preco, 'condicao': carro.condicao}))
+        carro.atualizado_em = agora
+        alterados.append(carro)
+
+    relatorio.criados += len(novos)
+    relatorio.atualizados += len(alterados)
+    if dry_run:
+        return
+
+    # Downloads fora da transação; uma falha mantém as imagens atuais
+    galerias_novas = []
+    for carro, urls in imagens_pendentes:
+        if not baixar:
+            continue
+        try:
+            baixadas = [baixar_imagem(url) for url in urls]
+        except (OSError, ValueError, http.client.HTTPException) as erro:
+            # HTTPException: resposta truncada ou malformada de um host de imagem
+            relatorio.erros.append((carro.codigo_estoque, f'imagens não baixadas: {erro}'))
+            continue
+        relatorio.imagens_baixadas += len(baixadas)
+        carro.imagem_principal = baixadas[0][0]
+        carro.imagem_origem = urls[0]
+        galerias_novas.append((carro, list(zip(baixadas[1:], urls[1:]))))
+        if carro.pk is not None:
+            campos_alterados.update(['imagem_principal', 'imagem_origem'])
+
+    with transaction.atomic():
+        Carro.objects.bulk_create(novos, batch_size=TAMANHO_LOTE)
+        if alterados:
+            Carro.objects.bulk_update(
+                alterados, sorted(campos_alterados | {'atualizado_em'}), batch_size=TAMANHO_LOTE
+            )
+        CarroImagem.objects.filter(carro__in=[carro for carro, _ in galerias_novas]).delete()
+        CarroImagem.objects.bulk_create(
+            [
+                CarroImagem(
+                    carro=carro, imagem=nome, origem=url, ordem=ordem, largura=largura, altura=altura,
+                )
+                for carro, imagens in galerias_novas
+                for ordem, ((nome, largura, altura), url) in enumerate(imagens, start=1)
+            ],
+            batch_size=TAMANHO_LOTE,
+        )
+        eventos.extend(
+            evento
+            for carro in novos
+            for evento in eventos_alteracao(carro.pk, None, {'preco': carro.preco, 'condicao': carro.condicao})
+        )
+        registrar_eventos(eventos)
+        # bulk_create/bulk_update não disparam o post_save que mantém o índice da busca
+        reindexar = [carro.pk for carro in novos]
+        if campos_alterados & {'fabricante', 'modelo'}:
+            reindexar += [carro.pk for carro in alterados]
+        indexar_carros(reindexar)
+
+
+def _marcar_vendidos(codigos_no_feed, relatorio, dry_run):
+    """Carros importados do DMS que sumiram do feed passam a 'vendido'"""
+    ausentes = [
+        carro
+        for carro in Carro.objects.exclude(codigo_estoque__isnull=True)
+        .exclude(condicao='vendido')
+        .values('id', 'codigo_estoque', 'preco', 'condicao')
+        .iterator(chunk_size=TAMANHO_LOTE)
+        if carro['codigo_estoque'] not in codigos_no_feed
+    ]
+    relatorio.vendidos = len(ausentes)
+    for carro in ausentes:
+        relatorio.registrar_diferenca(carro['codigo_estoque'], {'condicao': (carro['condicao'], 'vendido')})
+    if dry_run or not ausentes:
+        return
+    with transaction.atomic():
+        Carro.objects.filter(pk__in=[carro['id'] for carro in ausentes]).update(
+            condicao='vendido', atualizado_em=timezone.now()
+        )
+        registrar_eventos([
+            evento
+            for carro in ausentes
+            for evento in eventos_alteracao(
+                carro['id'], carro, {'preco': carro['preco'], 'condicao': 'vendido'}
+            )
+        ])
+
+
+def importar_estoque(linhas, dry_run=False, marcar_vendidos=False, baixar_imagens=True,
+                     tamanho_lote=TAMANHO_LOTE):
+    """
+    Importa as linhas do feed (ver ler_csv/ler_xml) e retorna o RelatorioImportacao
+    Em dry-run nada é gravado nem baixado; as diferenças ficam no relatório
+    """
+    relatorio = RelatorioImportacao(guardar_diferencas=dry_run)
+    codigos_vistos = set()
+    lote = []
+    for numero, linha in enumerate(linhas, start=1):
+        try:
+            dados = normalizar(linha)
+        except ErroImportacao as erro:
+            relatorio.erros.append((linha.get('codigo') or f'linha {numero}', str(erro)))
+            continue
+        if dados['codigo_estoque'] in codigos_vistos:
+            relatorio.erros.append((dados['codigo_estoque'], 'código repetido no feed'))
+            continue
+        codigos_vistos.add(dados['codigo_estoque'])
+        lote.append(dados)
+        if len(lote) >= tamanho_lote:
+            _processar_lote(lote, relatorio, dry_run, baixar_imagens)
+            lote = []
+    if lote:
+        _processar_lote(lote, relatorio, dry_run, baixar_imagens)
+
+    if marcar_vendidos:
+        _marcar_vendidos(codigos_vistos, relatorio, dry_run)
+
+    # Operações em lote não disparam sinais: uma única invalidação ao final
+    if relatorio.houve_alteracao and not dry_run:
+        notificar_alteracao_inventario()
+    return relatorio
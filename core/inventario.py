@@ -0,0 +1,84 @@
+"""
+Operações em lote sobre o inventário - Regional Veículos
+
+Cada operação é um único UPDATE dentro de uma transação, grava o histórico
+de preço/condição e dispara uma só notificação de inventário alterado
+(update() não dispara os sinais de save por carro).
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .historico import eventos_alteracao, registrar_eventos
+from .signals import notificar_alteracao_inventario
+
+LOTE_IDS = 900
+
+
+def _estados(queryset):
+    return {
+        carro['id']: carro
+        for carro in queryset.select_for_update().values('id', 'preco', 'condicao').iterator(chunk_size=2000)
+    }
+
+
+def _estados_por_ids(model, ids):
+    """Estado atual dos carros em `ids`, consultado em blocos (limite de parâmetros do SQLite)"""
+    ids = list(ids)
+    estados = {}
+    for inicio in range(0, len(ids), LOTE_IDS):
+        estados.update(_estados(model.objects.filter(pk__in=ids[inicio:inicio + LOTE_IDS])))
+    return estados
+
+
+def _registrar_diferencas(antes, depois):
+    registrar_eventos([
+        evento
+        for carro_id, anterior in antes.items()
+        if carro_id in depois
+        for evento in eventos_alteracao(carro_id, anterior, depois[carro_id])
+    ])
+
+
+def marcar_vendidos(queryset) -> int:
+    """Marca os carros como vendidos; retorna quantos mudaram"""
+    queryset = queryset.exclude(condicao='vendido')
+    with transaction.atomic():
+        antes = _estados(queryset)
+        total = queryset.update(condicao='vendido', atualizado_em=timezone.now())
+        _registrar_diferencas(antes, {
+            carro_id: {'preco': carro['preco'], 'condicao': 'vendido'}
+            for carro_id, carro in antes.items()
+        })
+        if total:
+            transaction.on_commit(notificar_alteracao_inventario)
+    return total
+
+
+def alternar_destaque(queryset) -> int:
+    """Inverte o destaque de cada carro selecionado"""
+    with transaction.atomic():
+        total = queryset.update(
+            destaque=Case(When(destaque=True, then=Value(False)), default=Value(True)),
+            atualizado_em=timezone.now(),
+        )
+        if total:
+            transaction.on_commit(notificar_alteracao_inventario)
+    return total
+
+
+def ajustar_precos(queryset, percentual: Decimal) -> int:
+    """Aplica `percentual` (ex: -5 para 5% de desconto) ao preço, arredondado em centavos"""
+    fator = Decimal(1) + Decimal(percentual) / Decimal(100)
+    with transaction.atomic():
+        antes = _estados(queryset)
+        total = queryset.update(preco=Round(F('preco') * fator, 2), atualizado_em=timezone.now())
+        # Preços lidos de volta: o histórico registra exatamente o que o banco gravou
+        _registrar_diferencas(antes, _estados_por_ids(queryset.model, antes))
+        if total:
+            transaction.on_commit(notificar_alteracao_inventario)
+    return total
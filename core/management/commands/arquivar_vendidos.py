@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from core.arquivo import DIAS_ANTES_DE_ARQUIVAR, arquivar_vendidos
+
+
+class Command(BaseCommand):
+    help = 'Move carros vendidos para o arquivo (agendar diariamente)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=DIAS_ANTES_DE_ARQUIVAR,
+                            help='Arquiva carros vendidos há mais de N dias')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas conta os carros a arquivar')
+
+    def handle(self, *args, **options):
+        total = arquivar_vendidos(options['dias'], dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'{total} carro(s) seriam arquivados')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{total} carro(s) arquivados'))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.rum import RETENCAO_DIAS, consolidar_dia, remover_amostras_antigas
+
+
+class Command(BaseCommand):
+    help = 'Calcula o p75 diário dos Core Web Vitals por página e remove amostras antigas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=2, help='Dias recalculados, contando hoje')
+        parser.add_argument('--retencao', type=int, default=RETENCAO_DIAS, help='Dias de amostras brutas mantidos')
+
+    def handle(self, *args, **options):
+        hoje = timezone.localdate()
+        for atras in range(options['dias'] - 1, -1, -1):
+            dia = hoje - timedelta(days=atras)
+            grupos = consolidar_dia(dia)
+            self.stdout.write(f'{dia}: {grupos} páginas/métricas consolidadas')
+        removidas = remover_amostras_antigas(options['retencao'])
+        self.stdout.write(self.style.SUCCESS(f'{removidas} amostras antigas removidas'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from core.sitemaps import gerar_sitemaps
+
+
+class Command(BaseCommand):
+    help = 'Pré-computa os sitemaps e os armazena no cache'
+
+    def handle(self, *args, **options):
+        arquivos = gerar_sitemaps()
+        for nome in arquivos:
+            self.stdout.write(f'Sitemap {nome} gerado')
+        self.stdout.write(self.style.SUCCESS(f'{len(arquivos)} arquivo(s) de sitemap gerado(s)'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from core.popularidade import gravar_visualizacoes
+
+
+class Command(BaseCommand):
+    help = 'Grava no banco as visualizações acumuladas no cache e atualiza a popularidade (rodar via cron)'
+
+    def handle(self, *args, **options):
+        total = gravar_visualizacoes()
+        if total is None:
+            self.stdout.write(self.style.WARNING('Outra gravação em andamento; nada foi feito'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'{total} visualizações gravadas'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.importacao import TAMANHO_LOTE, importar_estoque, ler_csv, ler_xml
+
+
+class Command(BaseCommand):
+    help = 'Importa o estoque a partir do feed do DMS (CSV ou XML), gravando só as diferenças'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do feed exportado pelo DMS')
+        parser.add_argument('--formato', choices=['csv', 'xml'], help='Padrão: pela extensão do arquivo')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas lista as diferenças, sem gravar')
+        parser.add_argument('--marcar-vendidos', action='store_true',
+                            help='Marca como vendidos os carros do DMS ausentes no feed')
+        parser.add_argument('--sem-imagens', action='store_true', help='Não baixa imagens')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Linhas por lote')
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or options['arquivo'].rsplit('.', 1)[-1].lower()
+        if formato not in ('csv', 'xml'):
+            raise CommandError('Informe --formato csv ou xml')
+        leitor = ler_csv if formato == 'csv' else ler_xml
+
+        try:
+            arquivo = open(options['arquivo'], 'rb')
+        except OSError as erro:
+            raise CommandError(f'Não foi possível abrir o feed: {erro}')
+        with arquivo:
+            relatorio = importar_estoque(
+                leitor(arquivo),
+                dry_run=options['dry_run'],
+                marcar_vendidos=options['marcar_vendidos'],
+                baixar_imagens=not options['sem_imagens'],
+                tamanho_lote=options['lote'],
+            )
+
+        if options['dry_run']:
+            for codigo, diferencas in relatorio.diferencas:
+                detalhes = ', '.join(f'{campo}: {antes!r} -> {depois!r}' for campo, (antes, depois) in diferencas.items())
+                self.stdout.write(f'{codigo}: {detalhes}')
+        for codigo, erro in relatorio.erros:
+            self.stderr.write(f'{codigo}: {erro}')
+
+        prefixo = '[dry-run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(prefixo + relatorio.resumo()))
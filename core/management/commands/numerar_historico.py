@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.historico import numerar_eventos
+
+
+class Command(BaseCommand):
+    help = 'Numera para o feed de alterações os eventos do histórico ainda sem sequência (rodar via cron)'
+
+    def handle(self, *args, **options):
+        numerar_eventos()
+        self.stdout.write(self.style.SUCCESS('Histórico numerado'))
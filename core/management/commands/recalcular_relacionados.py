@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from core.recomendacoes import K_RELACIONADOS, recalcular_relacionados, recalcular_se_pendente
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula o índice de carros relacionados (vizinhos por similaridade); '
+        'com --pendentes, só se o inventário mudou (rodar via cron a cada minuto)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=K_RELACIONADOS, help='Vizinhos por carro')
+        parser.add_argument('--pendentes', action='store_true',
+                            help='Só recalcula se houver alterações no inventário já assentadas')
+
+    def handle(self, *args, **options):
+        if options['pendentes']:
+            total = recalcular_se_pendente(options['k'])
+            if total is None:
+                self.stdout.write('Nenhuma alteração pendente no inventário')
+                return
+        else:
+            total = recalcular_relacionados(options['k'])
+        self.stdout.write(self.style.SUCCESS(f'{total} pares de carros relacionados gravados'))
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core.planos import (
+    CARROS_PADRAO, TOLERANCIA_CUSTO, caminho_baseline, capturar_planos, carregar_baseline, comparar,
+    gravar_baseline,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara o EXPLAIN das consultas do catálogo com o baseline do banco atual '
+        '(o inventário de teste é inserido e desfeito na mesma transação)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--carros', type=int, default=CARROS_PADRAO, help='Carros inseridos para a medição')
+        parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_CUSTO,
+                            help='Aumento de custo aceito sobre o baseline (0.2 = 20%%)')
+        parser.add_argument('--atualizar', action='store_true', help='Grava os planos atuais como baseline')
+        parser.add_argument('--exigir-baseline', action='store_true',
+                            help='Falha quando não há baseline para o banco atual (CI)')
+        parser.add_argument('--verbose-planos', action='store_true', help='Mostra o plano de cada consulta')
+
+    def handle(self, *args, **options):
+        planos = capturar_planos(options['carros'])
+
+        if options['verbose_planos']:
+            for chave, plano in sorted(planos.items()):
+                self.stdout.write(f"{chave}  {plano['sql']}")
+                for linha in plano['plano']:
+                    self.stdout.write(f'    {linha}')
+
+        if options['atualizar']:
+            caminho = gravar_baseline(planos, options['carros'])
+            self.stdout.write(self.style.SUCCESS(f'{len(planos)} planos gravados em {caminho}'))
+            return
+
+        baseline = carregar_baseline()
+        if baseline is None:
+            mensagem = (
+                f'Sem baseline para {connection.vendor}: {caminho_baseline()} '
+                f'(grave um com --atualizar)'
+            )
+            if options['exigir_baseline']:
+                raise CommandError(mensagem)
+            self.stdout.write(self.style.WARNING(f'{mensagem}; verificação ignorada'))
+            return
+
+        tolerancia = options['tolerancia']
+        if baseline['carros'] != options['carros']:
+            tolerancia = None
+            self.stdout.write(self.style.WARNING(
+                f"Baseline medido com {baseline['carros']} carros: só varreduras e ordenações são comparadas"
+            ))
+
+        regressoes, novas, removidas = comparar(planos, baseline, tolerancia)
+        for chave, sql in novas:
+            self.stdout.write(self.style.WARNING(f'Consulta nova {chave}: {sql}'))
+        for chave, sql in removidas:
+            self.stdout.write(f'Consulta não executada mais {chave}: {sql}')
+        for chave, motivo in regressoes:
+            self.stderr.write(self.style.ERROR(f"{chave}: {motivo}\n    {planos[chave]['sql']}"))
+
+        if regressoes:
+            raise CommandError(f'{len(regressoes)} regressões de plano em {len(planos)} consultas')
+        self.stdout.write(self.style.SUCCESS(f'{len(planos)} planos conferidos, nenhuma regressão'))
@@ -0,0 +1,125 @@
+"""
+Entrega de arquivos de media (fotos dos carros) - Regional Veículos
+
+Com um proxy na frente (nginx/Apache), a view só valida o caminho e devolve
+X-Accel-Redirect/X-Sendfile: o proxy transfere os bytes e o worker Python fica livre.
+Sem proxy, o arquivo é servido direto com suporte a Range e GET condicional.
+Nomes com hash de conteúdo (ver HashedMediaStorage) recebem cache imutável.
+"""
+
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .storage import NOME_COM_HASH_RE
+
+CACHE_IMUTAVEL = 60 * 60 * 24 * 365
+CACHE_PADRAO = 60 * 60
+TAMANHO_BLOCO = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _caminho_arquivo(caminho):
+    try:
+        absoluto = safe_join(settings.MEDIA_ROOT, caminho)
+    except SuspiciousFileOperation:
+        raise Http404('Arquivo não encontrado')
+    if not os.path.isfile(absoluto):
+        raise Http404('Arquivo não encontrado')
+    return absoluto
+
+
+def _intervalo(cabecalho, tamanho):
+    """
+    Interpreta um Range de intervalo único; retorna (inicio, fim) inclusivo,
+    None para servir o arquivo inteiro ou False se o intervalo for insatisfazível
+    """
+    match = _RANGE_RE.match(cabecalho.strip()) if cabecalho else None
+    if not match or match.groups() == ('', ''):
+        return None
+    inicio, fim = match.groups()
+    if inicio:
+        inicio = int(inicio)
+        fim = min(int(fim), tamanho - 1) if fim else tamanho - 1
+    else:
+        # bytes=-N: últimos N bytes
+        inicio = max(tamanho - int(fim), 0)
+        fim = tamanho - 1
+    if inicio > fim or inicio >= tamanho:
+        return False
+    return inicio, fim
+
+
+def _ler_intervalo(arquivo, inicio, tamanho):
+    with arquivo:
+        arquivo.seek(inicio)
+        while tamanho > 0:
+            bloco = arquivo.read(min(TAMANHO_BLOCO, tamanho))
+            if not bloco:
+                break
+            tamanho -= len(bloco)
+            yield bloco
+
+
+def _content_type(absoluto):
+    return mimetypes.guess_type(absoluto)[0] or 'application/octet-stream'
+
+
+def _resposta_proxy(caminho, absoluto):
+    """Resposta vazia para o proxy completar (ele trata Content-Length e Range)"""
+    prefixo = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', None)
+    if prefixo:
+        response = HttpResponse(content_type=_content_type(absoluto))
+        response['X-Accel-Redirect'] = prefixo.rstrip('/') + '/' + caminho.lstrip('/')
+    elif getattr(settings, 'MEDIA_X_SENDFILE', False):
+        response = HttpResponse(content_type=_content_type(absoluto))
+        response['X-Sendfile'] = absoluto
+    else:
+        return None
+    return response
+
+
+@require_safe
+def servir_media(request, caminho):
+    """Serve um arquivo de MEDIA_ROOT (ou delega ao proxy)"""
+    absoluto = _caminho_arquivo(caminho)
+    stat = os.stat(absoluto)
+
+    response = _resposta_proxy(caminho, absoluto)
+    if response is None:
+        desde = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        if desde is not None and int(stat.st_mtime) <= desde:
+            response = HttpResponseNotModified()
+        else:
+            intervalo = _intervalo(request.headers.get('Range'), stat.st_size)
+            if intervalo is False:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{stat.st_size}'
+            elif intervalo is None:
+                response = FileResponse(open(absoluto, 'rb'))
+            else:
+                inicio, fim = intervalo
+                response = StreamingHttpResponse(
+                    _ler_intervalo(open(absoluto, 'rb'), inicio, fim - inicio + 1),
+                    status=206,
+                    content_type=_content_type(absoluto),
+                )
+                response['Content-Length'] = fim - inicio + 1
+                response['Content-Range'] = f'bytes {inicio}-{fim}/{stat.st_size}'
+        response['Accept-Ranges'] = 'bytes'
+
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if NOME_COM_HASH_RE.search(caminho):
+        patch_cache_control(response, public=True, max_age=CACHE_IMUTAVEL, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=CACHE_PADRAO)
+    return response
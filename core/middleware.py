@@ -0,0 +1,88 @@
+"""
+Middlewares do app Core - Regional Veículos
+"""
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.urls import reverse
+
+from regional_veiculos.db_router import usar_replica
+
+
+class SessaoAdminMiddleware(SessionMiddleware):
+    """
+    Substitui o SessionMiddleware: a sessão só é carregada e gravada no admin
+    ou quando o navegador já tem cookie de sessão (usuário que entrou pelo admin).
+    Visitantes anônimos do catálogo não tocam o session store nem recebem
+    Set-Cookie/Vary: Cookie, o que permite cache compartilhado das páginas.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self._admin_prefix = None
+
+    def _usa_sessao(self, request):
+        if self._admin_prefix is None:
+            self._admin_prefix = reverse('admin:index')
+        return (
+            settings.SESSION_COOKIE_NAME in request.COOKIES
+            or request.path.startswith(self._admin_prefix)
+        )
+
+    def process_request(self, request):
+        request._sessao_anonima = not self._usa_sessao(request)
+        # Sem chave de sessão o store nunca é consultado (sessão vazia em memória)
+        request.session = self.SessionStore(
+            None if request._sessao_anonima else request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        )
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if getattr(request, '_sessao_anonima', False) and not (session and session.modified):
+            return response
+        return super().process_response(request, response)
+
+
+def fixar_primario(request):
+    """Chamado pelas views que gravaram algo que o próximo GET do cliente precisa ver"""
+    request._fixar_primario = True
+
+
+class ReplicaMiddleware:
+    """
+    Direciona as leituras das views do catálogo para as réplicas.
+    Depois de uma gravação bem-sucedida (Lead, Financiamento; ver fixar_primario)
+    o cliente recebe um cookie que o fixa no primário por REPLICA_PIN_SECONDS,
+    para que o redirect já veja o que acabou de ser gravado. Outros POSTs (beacon
+    de RUM, por exemplo) não fixam.
+    """
+
+    COOKIE = 'rv_primario'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.modulos_catalogo = tuple(getattr(settings, 'REPLICA_VIEW_MODULES', ('core.views', 'core.api')))
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+    def __call__(self, request):
+        request._replica_token = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if request._replica_token is not None:
+                usar_replica.reset(request._replica_token)
+        if getattr(request, '_fixar_primario', False) and response.status_code < 400:
+            response.set_cookie(
+                self.COOKIE, '1', max_age=self.pin_seconds,
+                secure=request.is_secure(), httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in ('GET', 'HEAD')
+            and self.COOKIE not in request.COOKIES
+            and view_func.__module__.startswith(self.modulos_catalogo)
+        ):
+            request._replica_token = usar_replica.set(True)
+        return None
@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-19 13:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_add_imagem_site_model'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarroRelacionado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicao', models.PositiveSmallIntegerField(verbose_name='Posição')),
+                ('distancia', models.FloatField(verbose_name='Distância')),
+                ('carro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relacionados', to='core.carro')),
+                ('relacionado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relacionado_em', to='core.carro')),
+            ],
+            options={
+                'verbose_name': 'Carro Relacionado',
+                'verbose_name_plural': 'Carros Relacionados',
+                'ordering': ['carro', 'posicao'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='carrorelacionado',
+            constraint=models.UniqueConstraint(fields=('carro', 'posicao'), name='carro_relacionado_posicao_unica'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-19 13:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_carro_relacionado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarroImagem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('imagem', models.ImageField(upload_to='carros/', verbose_name='Imagem')),
+                ('ordem', models.PositiveSmallIntegerField(default=0, verbose_name='Ordem de Exibição')),
+                ('largura', models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Largura')),
+                ('altura', models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Altura')),
+                ('carro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='imagens', to='core.carro')),
+            ],
+            options={
+                'verbose_name': 'Imagem do Carro',
+                'verbose_name_plural': 'Imagens do Carro',
+                'ordering': ['ordem', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='carroimagem',
+            index=models.Index(fields=['carro', 'ordem'], name='carro_imagem_ordem_idx'),
+        ),
+    ]
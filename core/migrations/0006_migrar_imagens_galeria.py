@@ -0,0 +1,54 @@
+from django.core.files.images import get_image_dimensions
+from django.db import migrations
+
+COLUNAS_ANTIGAS = ['imagem_2', 'imagem_3', 'imagem_4']
+
+
+def _dimensoes(arquivo):
+    try:
+        return get_image_dimensions(arquivo)
+    except (OSError, TypeError, ValueError):
+        return None, None
+
+
+def copiar_para_galeria(apps, schema_editor):
+    """Move imagem_2..imagem_4 para CarroImagem, mantendo a ordem"""
+    Carro = apps.get_model('core', 'Carro')
+    CarroImagem = apps.get_model('core', 'CarroImagem')
+    novas = []
+    for carro in Carro.objects.only('id', *COLUNAS_ANTIGAS).iterator(chunk_size=500):
+        for ordem, coluna in enumerate(COLUNAS_ANTIGAS, start=1):
+            arquivo = getattr(carro, coluna)
+            if arquivo:
+                largura, altura = _dimensoes(arquivo)
+                novas.append(CarroImagem(
+                    carro_id=carro.id, imagem=arquivo.name, ordem=ordem,
+                    largura=largura, altura=altura,
+                ))
+    CarroImagem.objects.bulk_create(novas, batch_size=500)
+
+
+def restaurar_colunas(apps, schema_editor):
+    """Devolve as três primeiras imagens da galeria para as colunas antigas"""
+    Carro = apps.get_model('core', 'Carro')
+    CarroImagem = apps.get_model('core', 'CarroImagem')
+    por_carro = {}
+    for imagem in CarroImagem.objects.order_by('carro_id', 'ordem', 'id').iterator(chunk_size=500):
+        por_carro.setdefault(imagem.carro_id, []).append(imagem.imagem.name)
+    carros = []
+    for carro in Carro.objects.filter(id__in=por_carro).only('id', *COLUNAS_ANTIGAS):
+        for coluna, nome in zip(COLUNAS_ANTIGAS, por_carro[carro.id]):
+            setattr(carro, coluna, nome)
+        carros.append(carro)
+    Carro.objects.bulk_update(carros, COLUNAS_ANTIGAS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_carro_imagem'),
+    ]
+
+    operations = [
+        migrations.RunPython(copiar_para_galeria, restaurar_colunas),
+    ]
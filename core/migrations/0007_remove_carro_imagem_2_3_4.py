@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-19 13:17
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_migrar_imagens_galeria'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='carro',
+            name='imagem_2',
+        ),
+        migrations.RemoveField(
+            model_name='carro',
+            name='imagem_3',
+        ),
+        migrations.RemoveField(
+            model_name='carro',
+            name='imagem_4',
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2 on 2026-10-19 13:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def registrar_estado_inicial(apps, schema_editor):
+    """Um evento 'criado' por carro existente, para o feed partir do estado atual"""
+    Carro = apps.get_model('core', 'Carro')
+    HistoricoCarro = apps.get_model('core', 'HistoricoCarro')
+    HistoricoCarro.objects.bulk_create(
+        (
+            HistoricoCarro(carro_id=carro['id'], tipo='criado', preco_novo=carro['preco'], condicao_nova=carro['condicao'])
+            for carro in Carro.objects.order_by('id').values('id', 'preco', 'condicao').iterator(chunk_size=500)
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_remove_carro_imagem_2_3_4'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoricoCarro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('criado', 'Criado'), ('preco', 'Preço alterado'), ('condicao', 'Condição alterada'), ('removido', 'Removido')], max_length=10, verbose_name='Tipo')),
+                ('preco_anterior', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Preço Anterior')),
+                ('preco_novo', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Preço Novo')),
+                ('condicao_anterior', models.CharField(blank=True, max_length=10, verbose_name='Condição Anterior')),
+                ('condicao_nova', models.CharField(blank=True, max_length=10, verbose_name='Condição Nova')),
+                ('registrado_em', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Registrado em')),
+                ('carro', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='historico', to='core.carro')),
+            ],
+            options={
+                'verbose_name': 'Histórico do Carro',
+                'verbose_name_plural': 'Histórico dos Carros',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(registrar_estado_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-19 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_historico_carro'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carro',
+            name='codigo_estoque',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True, verbose_name='Código no Estoque (DMS)'),
+        ),
+        migrations.AddField(
+            model_name='carro',
+            name='imagem_origem',
+            field=models.URLField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='carroimagem',
+            name='origem',
+            field=models.URLField(blank=True, editable=False, max_length=500),
+        ),
+    ]
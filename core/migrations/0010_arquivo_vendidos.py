@@ -0,0 +1,54 @@
+# Generated by Django 4.2 on 2026-10-19 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_importacao_estoque'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarroArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID Original')),
+                ('codigo_estoque', models.CharField(blank=True, db_index=True, max_length=50, null=True, verbose_name='Código no Estoque (DMS)')),
+                ('modelo', models.CharField(max_length=100, verbose_name='Modelo')),
+                ('fabricante', models.CharField(max_length=50, verbose_name='Fabricante')),
+                ('ano', models.IntegerField(verbose_name='Ano')),
+                ('cor', models.CharField(max_length=30, verbose_name='Cor')),
+                ('quilometragem', models.IntegerField(verbose_name='Quilometragem')),
+                ('combustivel', models.CharField(max_length=20, verbose_name='Combustível')),
+                ('cambio', models.CharField(max_length=20, verbose_name='Câmbio')),
+                ('motor', models.CharField(max_length=30, verbose_name='Motor')),
+                ('preco', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço')),
+                ('condicao', models.CharField(choices=[('novo', 'Novo'), ('seminovo', 'Seminovo'), ('vendido', 'Vendido')], max_length=10, verbose_name='Condição')),
+                ('destaque', models.BooleanField(default=False, verbose_name='Carro em Destaque')),
+                ('descricao', models.TextField(verbose_name='Descrição')),
+                ('imagem_principal', models.ImageField(blank=True, upload_to='carros/', verbose_name='Imagem Principal')),
+                ('imagens', models.JSONField(blank=True, default=list, verbose_name='Galeria')),
+                ('criado_em', models.DateTimeField(verbose_name='Criado em')),
+                ('atualizado_em', models.DateTimeField(verbose_name='Atualizado em')),
+                ('arquivado_em', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Arquivado em')),
+            ],
+            options={
+                'verbose_name': 'Carro Arquivado',
+                'verbose_name_plural': 'Carros Arquivados',
+                'ordering': ['-arquivado_em'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(condition=models.Q(('condicao__in', ['novo', 'seminovo'])), fields=['-criado_em'], name='carro_disponivel_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(condition=models.Q(('condicao__in', ['novo', 'seminovo'])), fields=['fabricante'], name='carro_disponivel_fabr_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(condition=models.Q(('condicao__in', ['novo', 'seminovo']), ('destaque', True)), fields=['-criado_em'], name='carro_destaque_criado_idx'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 4.2 on 2026-10-19 13:29
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+INDICES_GIN = {
+    'carro_fabricante_trgm_idx': 'fabricante',
+    'carro_modelo_trgm_idx': 'modelo',
+}
+
+
+def _palavras(texto):
+    decomposto = unicodedata.normalize('NFKD', texto.lower())
+    return set(re.findall(r'[a-z0-9.]+', ''.join(c for c in decomposto if not unicodedata.combining(c))))
+
+
+def _trigramas(palavra):
+    texto = f'  {palavra} '
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def criar_indices_trigrama(apps, schema_editor):
+    """PostgreSQL: pg_trgm com índices GIN; demais bancos: popula a tabela TrigramaCarro"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for nome, coluna in INDICES_GIN.items():
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {nome} ON core_carro USING gin ({coluna} gin_trgm_ops)'
+            )
+        return
+    Carro = apps.get_model('core', 'Carro')
+    TrigramaCarro = apps.get_model('core', 'TrigramaCarro')
+    linhas = []
+    for pk, fabricante, modelo in Carro.objects.values_list('pk', 'fabricante', 'modelo').iterator(chunk_size=500):
+        for palavra in _palavras(f'{fabricante} {modelo}'):
+            trigramas = _trigramas(palavra)
+            linhas.extend(
+                TrigramaCarro(carro_id=pk, trigrama=t, palavra=palavra[:100], tamanho=len(trigramas))
+                for t in trigramas
+            )
+    TrigramaCarro.objects.bulk_create(linhas, batch_size=1000)
+
+
+def remover_indices_trigrama(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for nome in INDICES_GIN:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {nome}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_arquivo_vendidos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrigramaCarro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigrama', models.CharField(max_length=3)),
+                ('palavra', models.CharField(max_length=100)),
+                ('tamanho', models.PositiveSmallIntegerField()),
+                ('carro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigramas', to='core.carro')),
+            ],
+            options={
+                'verbose_name': 'Trigrama do Carro',
+                'verbose_name_plural': 'Trigramas dos Carros',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trigramacarro',
+            index=models.Index(fields=['trigrama', 'carro'], name='carro_trigrama_idx'),
+        ),
+        migrations.RunPython(criar_indices_trigrama, remover_indices_trigrama),
+    ]
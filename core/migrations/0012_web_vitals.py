@@ -0,0 +1,47 @@
+# Generated by Django 4.2 on 2026-10-19 13:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_busca_trigramas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AmostraVital',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rota', models.CharField(max_length=50, verbose_name='Rota')),
+                ('metrica', models.CharField(choices=[('LCP', 'Largest Contentful Paint'), ('CLS', 'Cumulative Layout Shift'), ('INP', 'Interaction to Next Paint'), ('TTFB', 'Time to First Byte')], max_length=4, verbose_name='Métrica')),
+                ('valor', models.FloatField(verbose_name='Valor')),
+                ('registrado_em', models.DateTimeField(db_index=True, verbose_name='Registrado em')),
+            ],
+            options={
+                'verbose_name': 'Amostra de Web Vital',
+                'verbose_name_plural': 'Amostras de Web Vitals',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumoVital',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Dia')),
+                ('rota', models.CharField(max_length=50, verbose_name='Rota')),
+                ('metrica', models.CharField(choices=[('LCP', 'Largest Contentful Paint'), ('CLS', 'Cumulative Layout Shift'), ('INP', 'Interaction to Next Paint'), ('TTFB', 'Time to First Byte')], max_length=4, verbose_name='Métrica')),
+                ('p75', models.FloatField(verbose_name='p75')),
+                ('amostras', models.PositiveIntegerField(verbose_name='Amostras')),
+            ],
+            options={
+                'verbose_name': 'Resumo de Web Vitals',
+                'verbose_name_plural': 'Resumos de Web Vitals',
+                'ordering': ['-dia', 'rota', 'metrica'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumovital',
+            constraint=models.UniqueConstraint(fields=('dia', 'rota', 'metrica'), name='resumo_vital_unico'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-19 13:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_web_vitals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carro',
+            name='popularidade',
+            field=models.FloatField(default=0, editable=False, verbose_name='Popularidade'),
+        ),
+        migrations.AddField(
+            model_name='carro',
+            name='visualizacoes',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Visualizações'),
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(fields=['-popularidade', '-criado_em'], name='carro_popularidade_idx'),
+        ),
+    ]
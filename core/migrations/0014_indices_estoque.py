@@ -0,0 +1,49 @@
+# Generated by Django 4.2 on 2026-10-19 13:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_popularidade'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(fields=['-criado_em'], name='carro_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(fields=['preco', 'id'], name='carro_preco_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(fields=['ano', 'id'], name='carro_ano_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(fields=['quilometragem', 'id'], name='carro_km_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(fields=['fabricante', '-criado_em'], name='carro_fabr_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(fields=['fabricante', '-popularidade', '-criado_em'], name='carro_fabr_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(fields=['fabricante', 'preco', 'id'], name='carro_fabr_preco_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(fields=['fabricante', 'ano', 'id'], name='carro_fabr_ano_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(fields=['fabricante', 'quilometragem', 'id'], name='carro_fabr_km_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-19 13:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_indices_estoque'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(fields=['combustivel', 'preco', 'id'], name='carro_comb_preco_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(fields=['cambio', 'preco', 'id'], name='carro_cambio_preco_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(fields=['condicao'], name='carro_condicao_idx'),
+        ),
+    ]
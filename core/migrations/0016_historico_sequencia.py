@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-19 14:04
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def numerar_existentes(apps, schema_editor):
+    # Tudo o que já existe está confirmado: a sequência é o próprio id,
+    # então os cursores já entregues pelo feed continuam valendo
+    HistoricoCarro = apps.get_model('core', 'HistoricoCarro')
+    HistoricoCarro.objects.using(schema_editor.connection.alias).update(sequencia=F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_indices_estoque_filtros'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicocarro',
+            name='sequencia',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True, verbose_name='Sequência'),
+        ),
+        migrations.RunPython(numerar_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def criar_indice_descricao(apps, schema_editor):
+    """PostgreSQL: GIN de trigramas para o descricao__icontains da busca (UPPER(...) LIKE)"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS carro_descricao_trgm_idx ON core_carro USING gin (UPPER(descricao) gin_trgm_ops)'
+        )
+
+
+def remover_indice_descricao(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS carro_descricao_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_historico_sequencia'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice_descricao, remover_indice_descricao),
+    ]
@@ -1,7 +1,20 @@
+from django.core.files.images import get_image_dimensions
+from django.core.files.storage import default_storage
 from django.db import models
+from django.db.models.query import ValuesListIterable
 from django.urls import reverse
 
 
+def formatar_preco(valor):
+    """Formata um valor em reais (R$ 1.234,56)"""
+    return f"R$ {valor:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def formatar_quilometragem(valor):
+    """Formata a quilometragem com separador de milhar (12.345)"""
+    return f"{valor:,}".replace(',', '.')
+
+
 class Marca(models.Model):
     """Modelo para representar marcas de carros"""
     nome = models.CharField(max_length=50, unique=True, verbose_name='Nome da Marca')
@@ -18,6 +31,67 @@ class Marca(models.Model):
         return self.nome
 
 
+class CarroCard:
+    """
+    Projeção leve de um Carro para cards de listagem
+    Só carrega as colunas exibidas no card; textos formatados são calculados uma vez por linha
+    """
+    CAMPOS = (
+        'id', 'modelo', 'fabricante', 'ano', 'cor', 'quilometragem',
+        'combustivel', 'preco', 'condicao', 'imagem_principal', 'popularidade',
+    )
+    __slots__ = CAMPOS + ('preco_formatado', 'quilometragem_formatada', 'imagem_url')
+
+    def __init__(self, id, modelo, fabricante, ano, cor, quilometragem,
+                 combustivel, preco, condicao, imagem_principal, popularidade):
+        self.id = id
+        self.modelo = modelo
+        self.fabricante = fabricante
+        self.ano = ano
+        self.cor = cor
+        self.quilometragem = quilometragem
+        self.combustivel = combustivel
+        self.preco = preco
+        self.condicao = condicao
+        self.imagem_principal = imagem_principal
+        self.popularidade = popularidade
+        self.preco_formatado = formatar_preco(preco)
+        self.quilometragem_formatada = formatar_quilometragem(quilometragem)
+        self.imagem_url = default_storage.url(imagem_principal) if imagem_principal else None
+
+    def __repr__(self):
+        return f"<CarroCard: {self.fabricante} {self.modelo} - {self.ano}>"
+
+    @property
+    def pk(self):
+        return self.id
+
+    def get_condicao_display(self):
+        return dict(Carro.CONDICAO_CHOICES).get(self.condicao, self.condicao)
+
+    def get_preco_formatado(self):
+        return self.preco_formatado
+
+    def get_absolute_url(self):
+        return reverse('core:detalhe_carro', kwargs={'pk': self.id})
+
+
+class CarroCardIterable(ValuesListIterable):
+    """Converte cada linha de values_list em um CarroCard"""
+
+    def __iter__(self):
+        for linha in super().__iter__():
+            yield CarroCard(*linha)
+
+
+class CarroQuerySet(models.QuerySet):
+    def cards(self):
+        """Carros como CarroCard (sem descrição nem imagens extras)"""
+        queryset = self.values_list(*CarroCard.CAMPOS)
+        queryset._iterable_class = CarroCardIterable
+        return queryset
+
+
 class Carro(models.Model):
     CONDICAO_CHOICES = [
         ('novo', 'Novo'),
@@ -26,6 +100,9 @@ class Carro(models.Model):
     ]
     
     # Informações básicas
+    codigo_estoque = models.CharField(
+        max_length=50, unique=True, null=True, blank=True, verbose_name='Código no Estoque (DMS)'
+    )
     modelo = models.CharField(max_length=100, verbose_name='Modelo')
     fabricante = models.CharField(max_length=50, verbose_name='Fabricante')
     ano = models.IntegerField(verbose_name='Ano')
@@ -45,18 +122,56 @@ class Carro(models.Model):
     # Descrição e imagens
     descricao = models.TextField(verbose_name='Descrição')
     imagem_principal = models.ImageField(upload_to='carros/', verbose_name='Imagem Principal')
-    imagem_2 = models.ImageField(upload_to='carros/', blank=True, null=True, verbose_name='Imagem 2')
-    imagem_3 = models.ImageField(upload_to='carros/', blank=True, null=True, verbose_name='Imagem 3')
-    imagem_4 = models.ImageField(upload_to='carros/', blank=True, null=True, verbose_name='Imagem 4')
+    # URL de origem da imagem principal no feed do DMS (evita baixar de novo)
+    imagem_origem = models.URLField(max_length=500, blank=True, editable=False)
+    
+    # Visualizações de detalhe_carro, gravadas em lote por core.popularidade
+    visualizacoes = models.PositiveIntegerField(default=0, editable=False, verbose_name='Visualizações')
+    # Visualizações com decaimento exponencial (meia-vida de 7 dias): ordem "Mais vistos"
+    popularidade = models.FloatField(default=0, editable=False, verbose_name='Popularidade')
     
     # Metadados
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
     
+    objects = CarroQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Carro'
         verbose_name_plural = 'Carros'
         ordering = ['-criado_em']
+        # Índices parciais: só os carros à venda, que são os lidos pelo catálogo
+        indexes = [
+            models.Index(
+                fields=['-criado_em'], name='carro_disponivel_criado_idx',
+                condition=models.Q(condicao__in=['novo', 'seminovo']),
+            ),
+            models.Index(
+                fields=['fabricante'], name='carro_disponivel_fabr_idx',
+                condition=models.Q(condicao__in=['novo', 'seminovo']),
+            ),
+            models.Index(
+                fields=['-criado_em'], name='carro_destaque_criado_idx',
+                condition=models.Q(condicao__in=['novo', 'seminovo'], destaque=True),
+            ),
+            models.Index(fields=['-popularidade', '-criado_em'], name='carro_popularidade_idx'),
+            # Uma ordenação do estoque por índice (core.forms.ORDENS_ESTOQUE), sozinha e
+            # precedida de fabricante: o ORDER BY ... LIMIT percorre o índice em vez de
+            # ordenar em memória. Sem condição: o SQLite não usa índice parcial com IN parametrizado
+            models.Index(fields=['-criado_em'], name='carro_criado_idx'),
+            models.Index(fields=['preco', 'id'], name='carro_preco_idx'),
+            models.Index(fields=['ano', 'id'], name='carro_ano_idx'),
+            models.Index(fields=['quilometragem', 'id'], name='carro_km_idx'),
+            models.Index(fields=['fabricante', '-criado_em'], name='carro_fabr_criado_idx'),
+            models.Index(fields=['fabricante', '-popularidade', '-criado_em'], name='carro_fabr_popular_idx'),
+            models.Index(fields=['fabricante', 'preco', 'id'], name='carro_fabr_preco_idx'),
+            models.Index(fields=['fabricante', 'ano', 'id'], name='carro_fabr_ano_idx'),
+            models.Index(fields=['fabricante', 'quilometragem', 'id'], name='carro_fabr_km_idx'),
+            models.Index(fields=['combustivel', 'preco', 'id'], name='carro_comb_preco_idx'),
+            models.Index(fields=['cambio', 'preco', 'id'], name='carro_cambio_preco_idx'),
+            # Contagens do estoque (condicao IN (...)) só pelo índice
+            models.Index(fields=['condicao'], name='carro_condicao_idx'),
+        ]
     
     def __str__(self):
         return f"{self.fabricante} {self.modelo} - {self.ano}"
@@ -65,16 +180,46 @@ class Carro(models.Model):
         return reverse('core:detalhe_carro', kwargs={'pk': self.pk})
     
     def get_outras_imagens(self):
-        """Retorna lista de imagens adicionais não vazias"""
-        imagens = []
-        for img in [self.imagem_2, self.imagem_3, self.imagem_4]:
-            if img:
-                imagens.append(img)
-        return imagens
+        """Imagens da galeria em ordem (use prefetch_related('imagens') na consulta)"""
+        return self.imagens.all()
     
     def get_preco_formatado(self):
         """Retorna o preço formatado em reais"""
-        return f"R$ {self.preco:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+        return formatar_preco(self.preco)
+
+
+class CarroImagem(models.Model):
+    """Foto da galeria de um carro (além da imagem principal)"""
+    carro = models.ForeignKey(Carro, on_delete=models.CASCADE, related_name='imagens')
+    imagem = models.ImageField(upload_to='carros/', verbose_name='Imagem')
+    ordem = models.PositiveSmallIntegerField(default=0, verbose_name='Ordem de Exibição')
+    origem = models.URLField(max_length=500, blank=True, editable=False)
+    # Preenchidas no save; evitam abrir o arquivo para montar width/height no template
+    largura = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name='Largura')
+    altura = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name='Altura')
+    
+    class Meta:
+        verbose_name = 'Imagem do Carro'
+        verbose_name_plural = 'Imagens do Carro'
+        ordering = ['ordem', 'id']
+        indexes = [
+            models.Index(fields=['carro', 'ordem'], name='carro_imagem_ordem_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.carro} - imagem {self.ordem}"
+    
+    @property
+    def url(self):
+        return self.imagem.url
+    
+    def save(self, *args, **kwargs):
+        if self.imagem and self.largura is None:
+            try:
+                self.largura, self.altura = get_image_dimensions(self.imagem)
+            except (OSError, TypeError, ValueError):
+                pass
+        super().save(*args, **kwargs)
 
 
 class ImagemSite(models.Model):
@@ -101,3 +246,167 @@ class ImagemSite(models.Model):
     
     def __str__(self):
         return f"{self.nome} ({self.get_tipo_display()})"
+
+
+class CarroRelacionado(models.Model):
+    """Vizinhos mais próximos de cada carro, pré-calculados (core.recomendacoes)"""
+    carro = models.ForeignKey(Carro, on_delete=models.CASCADE, related_name='relacionados')
+    relacionado = models.ForeignKey(Carro, on_delete=models.CASCADE, related_name='relacionado_em')
+    posicao = models.PositiveSmallIntegerField(verbose_name='Posição')
+    distancia = models.FloatField(verbose_name='Distância')
+    
+    class Meta:
+        verbose_name = 'Carro Relacionado'
+        verbose_name_plural = 'Carros Relacionados'
+        ordering = ['carro', 'posicao']
+        constraints = [
+            models.UniqueConstraint(fields=['carro', 'posicao'], name='carro_relacionado_posicao_unica'),
+        ]
+    
+    def __str__(self):
+        return f"{self.carro} -> {self.relacionado} (#{self.posicao})"
+
+
+class TrigramaCarro(models.Model):
+    """
+    Índice de trigramas das palavras de fabricante e modelo (core.busca)
+    Usado no SQLite; no PostgreSQL a busca aproximada usa pg_trgm com índices GIN
+    """
+    carro = models.ForeignKey(Carro, on_delete=models.CASCADE, related_name='trigramas')
+    trigrama = models.CharField(max_length=3)
+    palavra = models.CharField(max_length=100)
+    # Trigramas da palavra: denominador da similaridade
+    tamanho = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        verbose_name = 'Trigrama do Carro'
+        verbose_name_plural = 'Trigramas dos Carros'
+        indexes = [
+            models.Index(fields=['trigrama', 'carro'], name='carro_trigrama_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.trigrama} -> {self.palavra}"
+
+
+class HistoricoCarro(models.Model):
+    """
+    Registro somente de inserção das mudanças de preço e condição de um carro
+    A `sequencia` (ordem de confirmação, ver core.historico.numerar_eventos) serve
+    de cursor para o feed de alterações (core.api.api_alteracoes)
+    """
+    TIPO_CHOICES = [
+        ('criado', 'Criado'),
+        ('preco', 'Preço alterado'),
+        ('condicao', 'Condição alterada'),
+        ('removido', 'Removido'),
+    ]
+    
+    # Sem constraint no banco: o histórico sobrevive à remoção do carro
+    carro = models.ForeignKey(
+        Carro, on_delete=models.DO_NOTHING, db_constraint=False, related_name='historico'
+    )
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES, verbose_name='Tipo')
+    preco_anterior = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name='Preço Anterior')
+    preco_novo = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name='Preço Novo')
+    condicao_anterior = models.CharField(max_length=10, blank=True, verbose_name='Condição Anterior')
+    condicao_nova = models.CharField(max_length=10, blank=True, verbose_name='Condição Nova')
+    registrado_em = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Registrado em')
+    # Preenchida depois da confirmação da transação, em ordem; nula até lá
+    sequencia = models.BigIntegerField(null=True, blank=True, unique=True, editable=False, verbose_name='Sequência')
+    
+    class Meta:
+        verbose_name = 'Histórico do Carro'
+        verbose_name_plural = 'Histórico dos Carros'
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"#{self.pk} carro {self.carro_id}: {self.get_tipo_display()}"
+    
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('O histórico é somente de inserção')
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError('O histórico é somente de inserção')
+
+
+class CarroArquivado(models.Model):
+    """
+    Carro vendido retirado da tabela de inventário (ver core.arquivo)
+    Mantém o id original, então referências antigas continuam resolvendo
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name='ID Original')
+    codigo_estoque = models.CharField(max_length=50, null=True, blank=True, db_index=True, verbose_name='Código no Estoque (DMS)')
+    modelo = models.CharField(max_length=100, verbose_name='Modelo')
+    fabricante = models.CharField(max_length=50, verbose_name='Fabricante')
+    ano = models.IntegerField(verbose_name='Ano')
+    cor = models.CharField(max_length=30, verbose_name='Cor')
+    quilometragem = models.IntegerField(verbose_name='Quilometragem')
+    combustivel = models.CharField(max_length=20, verbose_name='Combustível')
+    cambio = models.CharField(max_length=20, verbose_name='Câmbio')
+    motor = models.CharField(max_length=30, verbose_name='Motor')
+    preco = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Preço')
+    condicao = models.CharField(max_length=10, choices=Carro.CONDICAO_CHOICES, verbose_name='Condição')
+    destaque = models.BooleanField(default=False, verbose_name='Carro em Destaque')
+    descricao = models.TextField(verbose_name='Descrição')
+    imagem_principal = models.ImageField(upload_to='carros/', blank=True, verbose_name='Imagem Principal')
+    imagens = models.JSONField(default=list, blank=True, verbose_name='Galeria')
+    criado_em = models.DateTimeField(verbose_name='Criado em')
+    atualizado_em = models.DateTimeField(verbose_name='Atualizado em')
+    arquivado_em = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Arquivado em')
+    
+    class Meta:
+        verbose_name = 'Carro Arquivado'
+        verbose_name_plural = 'Carros Arquivados'
+        ordering = ['-arquivado_em']
+    
+    def __str__(self):
+        return f"{self.fabricante} {self.modelo} - {self.ano} (arquivado)"
+    
+    def get_preco_formatado(self):
+        return formatar_preco(self.preco)
+
+
+class AmostraVital(models.Model):
+    """Amostra de Core Web Vitals enviada pelo navegador (core.rum); consolidada em ResumoVital"""
+    METRICA_CHOICES = [
+        ('LCP', 'Largest Contentful Paint'),
+        ('CLS', 'Cumulative Layout Shift'),
+        ('INP', 'Interaction to Next Paint'),
+        ('TTFB', 'Time to First Byte'),
+    ]
+    
+    rota = models.CharField(max_length=50, verbose_name='Rota')
+    metrica = models.CharField(max_length=4, choices=METRICA_CHOICES, verbose_name='Métrica')
+    # Milissegundos; CLS é adimensional
+    valor = models.FloatField(verbose_name='Valor')
+    registrado_em = models.DateTimeField(db_index=True, verbose_name='Registrado em')
+    
+    class Meta:
+        verbose_name = 'Amostra de Web Vital'
+        verbose_name_plural = 'Amostras de Web Vitals'
+    
+    def __str__(self):
+        return f"{self.rota} {self.metrica}={self.valor:g}"
+
+
+class ResumoVital(models.Model):
+    """p75 diário de cada métrica por página (comando consolidar_vitais)"""
+    dia = models.DateField(verbose_name='Dia')
+    rota = models.CharField(max_length=50, verbose_name='Rota')
+    metrica = models.CharField(max_length=4, choices=AmostraVital.METRICA_CHOICES, verbose_name='Métrica')
+    p75 = models.FloatField(verbose_name='p75')
+    amostras = models.PositiveIntegerField(verbose_name='Amostras')
+    
+    class Meta:
+        verbose_name = 'Resumo de Web Vitals'
+        verbose_name_plural = 'Resumos de Web Vitals'
+        ordering = ['-dia', 'rota', 'metrica']
+        constraints = [
+            models.UniqueConstraint(fields=['dia', 'rota', 'metrica'], name='resumo_vital_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.dia} {self.rota} {self.metrica} p75={self.p75:g}"
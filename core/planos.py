@@ -0,0 +1,284 @@
+"""
+Regressão de planos de consulta do catálogo - Regional Veículos
+
+Popula um inventário grande dentro de uma transação (desfeita no final),
+executa as views e o CarroService capturando cada SELECT do catálogo e
+compara o EXPLAIN de cada um com o baseline gravado em core/planos/<banco>.json.
+
+Regressões:
+- varredura sequencial de uma tabela do catálogo que o baseline não tinha
+- ordenação em tabela temporária (SQLite) que o baseline não tinha
+- custo estimado acima do baseline + tolerância (PostgreSQL; o SQLite não estima custo)
+"""
+
+import hashlib
+import json
+import random
+import re
+from decimal import Decimal
+from pathlib import Path
+
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+
+from .busca import indexar_carros
+from .historico import numerar_eventos
+from .models import Carro, CarroRelacionado, HistoricoCarro, Marca
+
+DIRETORIO_BASELINE = Path(__file__).resolve().parent / 'planos'
+
+CARROS_PADRAO = 20000
+# Semente da suíte de testes: no SQLite os planos são os mesmos do baseline de 20000 carros
+CARROS_TESTE = 2000
+TOLERANCIA_CUSTO = 0.2
+
+# Só as consultas que tocam estas tabelas entram na verificação
+TABELAS_CATALOGO = (
+    'core_carro', 'core_carroimagem', 'core_carrorelacionado', 'core_historicocarro', 'core_marca',
+    'core_trigramacarro',
+)
+
+FABRICANTES = (
+    'Chevrolet', 'Fiat', 'Ford', 'Honda', 'Hyundai', 'Jeep', 'Nissan', 'Peugeot',
+    'Renault', 'Toyota', 'Volkswagen', 'BMW', 'Audi', 'Mitsubishi', 'Citroën',
+)
+MODELOS = ('Corolla', 'Onix', 'Civic', 'HB20', 'Compass', 'Kicks', 'Polo', 'Argo', 'Ranger', 'T-Cross', 'Hilux SW4')
+
+_RE_TABELA = re.compile(r'\b(%s)\b' % '|'.join(TABELAS_CATALOGO))
+_RE_IN = re.compile(r'IN \((?:%s, )*%s\)')
+_RE_NUMERO = re.compile(r'\b\d+\b')
+_RE_SCAN_SQLITE = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+
+def _normalizar_sql(sql):
+    sql = _RE_IN.sub('IN (...)', sql)
+    # A API monta a lista de colunas a partir de um set: a ordem não identifica a consulta
+    colunas, separador, resto = sql.partition(' FROM ')
+    if separador and colunas.startswith('SELECT ') and not colunas.startswith('SELECT DISTINCT'):
+        sql = 'SELECT ' + ', '.join(sorted(colunas[len('SELECT '):].split(', '))) + separador + resto
+    return ' '.join(_RE_NUMERO.sub('?', sql).split())
+
+
+def _chave(cenario, sql):
+    return f"{cenario}:{hashlib.md5(sql.encode()).hexdigest()[:8]}"
+
+
+def popular_inventario(total, semente=42):
+    """Insere `total` carros (mais marcas, histórico, trigramas da busca e vizinhos) sem disparar sinais"""
+    aleatorio = random.Random(semente)
+    Marca.objects.bulk_create(
+        [Marca(nome=f'{nome} (plano)', logo='marcas/plano.png', ordem=i) for i, nome in enumerate(FABRICANTES)],
+        ignore_conflicts=True,
+    )
+    Carro.objects.bulk_create([
+        Carro(
+            modelo=aleatorio.choice(MODELOS),
+            fabricante=aleatorio.choice(FABRICANTES),
+            ano=aleatorio.randint(2008, 2025),
+            cor=aleatorio.choice(('Preto', 'Branco', 'Prata', 'Vermelho')),
+            quilometragem=aleatorio.randint(0, 200000),
+            motor='1.6',
+            combustivel=aleatorio.choice(('Flex', 'Gasolina', 'Diesel', 'Híbrido')),
+            cambio=aleatorio.choice(('Manual', 'Automático', 'CVT')),
+            preco=Decimal(aleatorio.randint(30000, 400000)),
+            condicao=aleatorio.choices(('novo', 'seminovo', 'vendido'), weights=(2, 5, 3))[0],
+            destaque=aleatorio.random() < 0.03,
+            descricao='Carro gerado para a verificação de planos',
+            imagem_principal='carros/plano.jpg',
+        )
+        for _ in range(total)
+    ], batch_size=500)
+    # bulk_create não devolve pk no SQLite antigo: relê os ids
+    ids = list(Carro.objects.order_by('-pk').values_list('pk', flat=True)[:total])
+    HistoricoCarro.objects.bulk_create(
+        [HistoricoCarro(carro_id=pk, tipo='criado', condicao_nova='seminovo') for pk in ids], batch_size=500
+    )
+    numerar_eventos()
+    indexar_carros(ids)
+    CarroRelacionado.objects.bulk_create([
+        CarroRelacionado(carro_id=pk, relacionado_id=ids[(i + posicao) % len(ids)], posicao=posicao, distancia=posicao)
+        for i, pk in enumerate(ids[:1000])
+        for posicao in range(1, 4)
+    ], batch_size=500)
+    return ids
+
+
+def atualizar_estatisticas():
+    """Atualiza as estatísticas do planejador para o inventário recém-populado"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for tabela in TABELAS_CATALOGO:
+                cursor.execute(f'ANALYZE {tabela}')
+        else:
+            cursor.execute('ANALYZE')
+
+
+def cenarios(carro_id):
+    """(nome, função) de cada caminho quente do catálogo; querysets são forçados com list()"""
+    from .views_refactored import CarroService
+
+    cliente = Client()
+
+    def get(url):
+        return lambda: cliente.get(url)
+
+    carro = Carro.objects.get(pk=carro_id)
+    return [
+        ('home', get('/')),
+        ('estoque', get('/estoque/')),
+        ('estoque_pagina', get('/estoque/?page=50')),
+        ('estoque_fabricante', get('/estoque/?fabricante=Toyota')),
+        ('estoque_condicao', get('/estoque/?condicao=seminovo')),
+        ('estoque_preco', get('/estoque/?preco_min=50000&preco_max=90000')),
+        ('estoque_populares', get('/estoque/?ordem=populares')),
+        ('estoque_menor_preco', get('/estoque/?ordem=menor_preco&ano_min=2015&km_max=80000')),
+        ('estoque_maior_preco', get('/estoque/?ordem=maior_preco&combustivel=Flex&cambio=Automático')),
+        ('estoque_ano', get('/estoque/?ordem=mais_novos&preco_max=150000')),
+        ('estoque_km', get('/estoque/?ordem=menor_km&condicao=seminovo')),
+        ('estoque_fabricante_preco', get('/estoque/?fabricante=Toyota&ordem=menor_preco&ano_min=2012')),
+        ('estoque_fabricante_km', get('/estoque/?fabricante=Honda&ordem=menor_km')),
+        ('detalhe', get(f'/carro/{carro_id}/')),
+        ('comparar', get(f'/comparar/?ids={carro_id},{carro_id - 1},{carro_id - 2}')),
+        ('api_carros', get('/api/carros/')),
+        ('api_carros_fabricante', get('/api/carros/?fabricante=Toyota&condicao=novo')),
+        ('api_marcas', get('/api/marcas/')),
+        ('api_alteracoes', get('/api/alteracoes/?cursor=&limit=100')),
+        ('service_destaque', CarroService.get_carros_destaque),
+        ('service_total', CarroService.contar_disponiveis),
+        ('service_fabricantes', CarroService.get_fabricantes_disponiveis),
+        ('service_filtros', lambda: list(CarroService.aplicar_filtros(
+            CarroService.get_carros_disponiveis(),
+            {'fabricante': 'Honda', 'condicao': 'novo', 'preco_min': '40000', 'preco_max': '120000'},
+        )[:6])),
+        ('buscar', get('/buscar/?q=toiota+corola')),
+        ('buscar_descricao', get('/buscar/?q=teto+solar')),
+        ('service_busca', lambda: CarroService.buscar_carros('hilux sw4')),
+        ('service_relacionados', lambda: list(CarroService.get_carros_relacionados(carro))),
+    ]
+
+
+def _capturar(funcao):
+    """Executa `funcao` e devolve os SELECTs do catálogo com seus parâmetros"""
+    consultas = []
+
+    def coletor(execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT') and _RE_TABELA.search(sql):
+            consultas.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(coletor):
+        funcao()
+    return consultas
+
+
+def _explicar_sqlite(cursor, sql, params):
+    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+    plano = [linha[-1] for linha in cursor.fetchall()]
+    sequenciais = sorted({
+        m.group(1) for m in map(_RE_SCAN_SQLITE.match, plano) if m and m.group(1) in TABELAS_CATALOGO
+    })
+    return {
+        'plano': plano,
+        'sequencial': sequenciais,
+        'ordenacao_temporaria': any('USE TEMP B-TREE' in linha for linha in plano),
+        'custo': None,
+    }
+
+
+def _explicar_postgresql(cursor, sql, params):
+    cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+    resultado = cursor.fetchone()[0]
+    raiz = (json.loads(resultado) if isinstance(resultado, str) else resultado)[0]['Plan']
+    plano, sequenciais, pilha = [], set(), [(raiz, 0)]
+    while pilha:
+        no, nivel = pilha.pop()
+        relacao = no.get('Relation Name')
+        plano.append('  ' * nivel + no['Node Type'] + (f' on {relacao}' if relacao else ''))
+        if no['Node Type'] == 'Seq Scan' and relacao in TABELAS_CATALOGO:
+            sequenciais.add(relacao)
+        pilha.extend((filho, nivel + 1) for filho in reversed(no.get('Plans', [])))
+    return {
+        'plano': plano,
+        'sequencial': sorted(sequenciais),
+        'ordenacao_temporaria': False,
+        'custo': raiz['Total Cost'],
+    }
+
+
+def explicar(sql, params):
+    """EXPLAIN de uma consulta no banco atual, resumido para comparação"""
+    explicador = _explicar_postgresql if connection.vendor == 'postgresql' else _explicar_sqlite
+    with connection.cursor() as cursor:
+        return explicador(cursor, sql, params)
+
+
+def capturar_planos(total_carros=CARROS_PADRAO):
+    """Popula o inventário, captura o plano de cada consulta e desfaz tudo"""
+    planos = {}
+    with transaction.atomic():
+        ids = popular_inventario(total_carros)
+        atualizar_estatisticas()
+        # Sem cache, senão as consultas nem chegam ao banco; o manifesto de estáticos
+        # pode não existir (testes, CI) e não interfere nos planos
+        with override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+            STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+            ALLOWED_HOSTS=['*'],
+        ):
+            for nome, funcao in cenarios(ids[-1]):
+                for sql, params in _capturar(funcao):
+                    normalizada = _normalizar_sql(sql)
+                    planos.setdefault(_chave(nome, normalizada), {
+                        'sql': normalizada,
+                        **explicar(sql, params),
+                    })
+        transaction.set_rollback(True)
+    return planos
+
+
+def caminho_baseline(vendor=None):
+    return DIRETORIO_BASELINE / f'{vendor or connection.vendor}.json'
+
+
+def carregar_baseline():
+    caminho = caminho_baseline()
+    if not caminho.exists():
+        return None
+    return json.loads(caminho.read_text(encoding='utf-8'))
+
+
+def gravar_baseline(planos, total_carros):
+    caminho = caminho_baseline()
+    caminho.parent.mkdir(exist_ok=True)
+    caminho.write_text(
+        json.dumps({'carros': total_carros, 'consultas': planos}, indent=2, ensure_ascii=False, sort_keys=True) + '\n',
+        encoding='utf-8',
+    )
+    return caminho
+
+
+def comparar(planos, baseline, tolerancia=TOLERANCIA_CUSTO):
+    """
+    Devolve (regressoes, novas, removidas); cada item é (chave, descrição)
+    Com `tolerancia` None o custo não é comparado (inventário de outro tamanho)
+    """
+    anteriores = baseline['consultas']
+    regressoes, novas = [], []
+    for chave, atual in planos.items():
+        anterior = anteriores.get(chave)
+        if anterior is None:
+            novas.append((chave, atual['sql']))
+            if atual['sequencial']:
+                regressoes.append((chave, f"consulta nova com varredura sequencial em {', '.join(atual['sequencial'])}"))
+            continue
+        varreduras = set(atual['sequencial']) - set(anterior['sequencial'])
+        if varreduras:
+            regressoes.append((chave, f"passou a varrer {', '.join(sorted(varreduras))} sequencialmente"))
+        if atual['ordenacao_temporaria'] and not anterior['ordenacao_temporaria']:
+            regressoes.append((chave, 'passou a ordenar em tabela temporária'))
+        if tolerancia is not None and atual['custo'] is not None and anterior.get('custo') and \
+                atual['custo'] > anterior['custo'] * (1 + tolerancia):
+            regressoes.append((chave, f"custo estimado {anterior['custo']:.1f} -> {atual['custo']:.1f}"))
+    removidas = [(chave, anterior['sql']) for chave, anterior in anteriores.items() if chave not in planos]
+    return regressoes, novas, removidas
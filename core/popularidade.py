@@ -0,0 +1,116 @@
+"""
+Popularidade dos carros - Regional Veículos
+
+Cada visita a detalhe_carro só incrementa um contador no cache (operação
+atômica, sem escrita no banco). O comando gravar_visualizacoes lê os
+contadores em lote, soma no banco com um UPDATE por bloco e desconta dos
+contadores apenas o que foi gravado; visitas durante a gravação não se perdem.
+Um lock no cache impede que duas execuções do cron somem os mesmos contadores.
+"""
+
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import Carro
+
+# Alias sem a camada local do CacheDuasCamadas (contadores mudam a cada visita)
+CACHE_ALIAS = 'contadores'
+PREFIXO = 'visualizacoes:'
+ULTIMA_GRAVACAO_KEY = 'visualizacoes:ultima_gravacao'
+GRAVACAO_LOCK_KEY = 'visualizacoes:lock'
+# Maior que a duração de uma gravação: se o processo morrer, o lock expira sozinho
+GRAVACAO_LOCK_TIMEOUT = 600
+
+MEIA_VIDA = timedelta(days=7)
+LOTE_IDS = 500
+# Carros com o selo "Mais visto" no estoque
+TOP_POPULARES = 10
+
+_RE_ROBO = re.compile(r'bot|crawl|spider|slurp|preview', re.IGNORECASE)
+
+
+def _contadores():
+    return caches[CACHE_ALIAS if CACHE_ALIAS in settings.CACHES else 'default']
+
+
+def registrar_visualizacao(request, carro_id):
+    """Conta uma visita humana ao carro (robôs e HEAD não contam)"""
+    if request.method != 'GET' or _RE_ROBO.search(request.META.get('HTTP_USER_AGENT', '')):
+        return
+    contadores = _contadores()
+    chave = f'{PREFIXO}{carro_id}'
+    try:
+        contadores.incr(chave)
+    except ValueError:
+        # Primeira visita desde a última gravação; outro processo pode criar a chave antes
+        if not contadores.add(chave, 1, None):
+            contadores.incr(chave)
+
+
+def _somar(lidos, campo, tipo):
+    return F(campo) + Case(
+        *[When(pk=pk, then=Value(total)) for pk, total in lidos.items()],
+        default=Value(0), output_field=tipo,
+    )
+
+
+def gravar_visualizacoes():
+    """
+    Grava os contadores pendentes e aplica o decaimento; retorna as visitas gravadas
+    ou None se outra execução ainda está gravando
+    """
+    contadores = _contadores()
+    if not contadores.add(GRAVACAO_LOCK_KEY, 1, GRAVACAO_LOCK_TIMEOUT):
+        return None
+    try:
+        return _gravar(contadores)
+    finally:
+        contadores.delete(GRAVACAO_LOCK_KEY)
+
+
+def _gravar(contadores):
+    agora = timezone.now()
+    ultima = contadores.get(ULTIMA_GRAVACAO_KEY)
+    fator = 0.5 ** ((agora - ultima) / MEIA_VIDA) if ultima else 1.0
+
+    ids = list(Carro.objects.order_by().values_list('pk', flat=True))
+    gravados = {}
+    with transaction.atomic():
+        if fator < 1:
+            Carro.objects.filter(popularidade__gt=0).update(popularidade=F('popularidade') * fator)
+        for inicio in range(0, len(ids), LOTE_IDS):
+            chaves = {f'{PREFIXO}{pk}': pk for pk in ids[inicio:inicio + LOTE_IDS]}
+            lidos = {chaves[chave]: total for chave, total in contadores.get_many(chaves).items() if total > 0}
+            if not lidos:
+                continue
+            Carro.objects.filter(pk__in=lidos).update(
+                visualizacoes=_somar(lidos, 'visualizacoes', IntegerField()),
+                popularidade=_somar(lidos, 'popularidade', FloatField()),
+            )
+            gravados.update(lidos)
+
+    # Só depois do commit: uma falha acima mantém os contadores para a próxima execução.
+    # O decaimento já está no banco, então a data vai antes dos descontos
+    contadores.set(ULTIMA_GRAVACAO_KEY, agora, None)
+    for pk, total in gravados.items():
+        try:
+            contadores.decr(f'{PREFIXO}{pk}', total)
+        except ValueError:
+            # Chave despejada do cache depois da leitura: não há o que descontar
+            pass
+    return sum(gravados.values())
+
+
+def limiar_popular():
+    """Popularidade mínima para o selo "Mais visto" (0 enquanto não houver visitas)"""
+    valores = list(
+        Carro.objects.filter(condicao__in=['novo', 'seminovo'], popularidade__gt=0)
+        .order_by('-popularidade').values_list('popularidade', flat=True)[:TOP_POPULARES]
+    )
+    return valores[-1] if valores else 0
@@ -0,0 +1,150 @@
+"""
+Recomendações de carros similares - Regional Veículos
+Calcula, em uma única passada vetorizada, os k vizinhos mais próximos de
+cada carro disponível e grava o resultado em CarroRelacionado
+
+Alterações no inventário só marcam o índice como pendente; o comando
+`recalcular_relacionados --pendentes` (cron) recalcula depois que as
+alterações param por QUIETO segundos, ou no máximo a cada ESPERA_MAXIMA
+"""
+
+import time
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Carro, CarroRelacionado
+
+K_RELACIONADOS = 6
+
+# Peso de cada grupo de atributos na distância
+PESOS = {
+    'preco': 3.0,
+    'ano': 1.5,
+    'quilometragem': 1.0,
+    'combustivel': 0.5,
+    'cambio': 0.75,
+    'fabricante': 1.0,
+}
+
+# Linhas por bloco no cálculo das distâncias (limita a memória a BLOCO x n)
+BLOCO = 1024
+
+PENDENTE_DESDE_KEY = 'relacionados:pendente_desde'
+ULTIMA_ALTERACAO_KEY = 'relacionados:ultima_alteracao'
+# Debounce: espera o inventário ficar parado, sem adiar o recálculo indefinidamente
+QUIETO = 60
+ESPERA_MAXIMA = 15 * 60
+
+
+def _normalizar(coluna):
+    desvio = coluna.std()
+    return (coluna - coluna.mean()) / desvio if desvio else np.zeros_like(coluna)
+
+
+def _one_hot(valores):
+    categorias = {valor: i for i, valor in enumerate(sorted(set(valores)))}
+    matriz = np.zeros((len(valores), len(categorias)))
+    matriz[np.arange(len(valores)), [categorias[valor] for valor in valores]] = 1.0
+    # Duas categorias diferentes ficam a distância 1
+    return matriz / np.sqrt(2)
+
+
+def _matriz_atributos(linhas):
+    """Uma linha por carro com atributos numéricos padronizados e categóricos em one-hot"""
+    preco = np.log1p(np.array([float(linha['preco']) for linha in linhas]))
+    ano = np.array([linha['ano'] for linha in linhas], dtype=float)
+    km = np.log1p(np.array([linha['quilometragem'] for linha in linhas], dtype=float))
+    blocos = [
+        PESOS['preco'] * _normalizar(preco)[:, None],
+        PESOS['ano'] * _normalizar(ano)[:, None],
+        PESOS['quilometragem'] * _normalizar(km)[:, None],
+        PESOS['combustivel'] * _one_hot([linha['combustivel'].lower() for linha in linhas]),
+        PESOS['cambio'] * _one_hot([linha['cambio'].lower() for linha in linhas]),
+        PESOS['fabricante'] * _one_hot([linha['fabricante'].lower() for linha in linhas]),
+    ]
+    return np.hstack(blocos)
+
+
+def calcular_vizinhos(matriz, k):
+    """
+    Retorna (indices, distancias), ambos n x k, dos k vizinhos mais
+    próximos de cada linha (excluindo a própria linha)
+    """
+    n = matriz.shape[0]
+    k = min(k, n - 1)
+    normas = (matriz ** 2).sum(axis=1)
+    indices = np.empty((n, k), dtype=np.int64)
+    distancias = np.empty((n, k))
+    for inicio in range(0, n, BLOCO):
+        fim = min(inicio + BLOCO, n)
+        bloco = matriz[inicio:fim]
+        # |a - b|^2 = |a|^2 + |b|^2 - 2ab
+        quadrados = normas[inicio:fim, None] + normas[None, :] - 2 * bloco @ matriz.T
+        np.maximum(quadrados, 0, out=quadrados)
+        quadrados[np.arange(fim - inicio), np.arange(inicio, fim)] = np.inf
+        candidatos = np.argpartition(quadrados, k - 1, axis=1)[:, :k]
+        dist_candidatos = np.take_along_axis(quadrados, candidatos, axis=1)
+        ordem = np.argsort(dist_candidatos, axis=1)
+        indices[inicio:fim] = np.take_along_axis(candidatos, ordem, axis=1)
+        distancias[inicio:fim] = np.sqrt(np.take_along_axis(dist_candidatos, ordem, axis=1))
+    return indices, distancias
+
+
+def recalcular_relacionados(k: int = K_RELACIONADOS) -> int:
+    """Recalcula o índice de carros relacionados; retorna o número de pares gravados"""
+    linhas = list(
+        Carro.objects.filter(condicao__in=['novo', 'seminovo'])
+        .order_by('pk')
+        .values('pk', 'preco', 'ano', 'quilometragem', 'combustivel', 'cambio', 'fabricante')
+    )
+    pares = []
+    if len(linhas) > 1:
+        indices, distancias = calcular_vizinhos(_matriz_atributos(linhas), k)
+        pks = [linha['pk'] for linha in linhas]
+        for i, carro_id in enumerate(pks):
+            for posicao, (j, distancia) in enumerate(zip(indices[i], distancias[i])):
+                pares.append(CarroRelacionado(
+                    carro_id=carro_id,
+                    relacionado_id=pks[j],
+                    posicao=posicao,
+                    distancia=float(distancia),
+                ))
+
+    with transaction.atomic():
+        CarroRelacionado.objects.all().delete()
+        CarroRelacionado.objects.bulk_create(pares, batch_size=1000)
+    return len(pares)
+
+
+def marcar_pendente():
+    """Registra uma alteração no inventário; o recálculo fica para o comando"""
+    agora = time.time()
+    cache.add(PENDENTE_DESDE_KEY, agora, None)
+    cache.set(ULTIMA_ALTERACAO_KEY, agora, None)
+
+
+def recalcular_se_pendente(k: int = K_RELACIONADOS):
+    """Recalcula se houver alterações pendentes já assentadas; retorna os pares gravados ou None"""
+    valores = cache.get_many([PENDENTE_DESDE_KEY, ULTIMA_ALTERACAO_KEY])
+    pendente_desde = valores.get(PENDENTE_DESDE_KEY)
+    if pendente_desde is None:
+        return None
+    agora = time.time()
+    ultima = valores.get(ULTIMA_ALTERACAO_KEY, pendente_desde)
+    if agora - ultima < QUIETO and agora - pendente_desde < ESPERA_MAXIMA:
+        return None
+    # Apaga antes de calcular: o que mudar durante o cálculo marca de novo
+    cache.delete_many([PENDENTE_DESDE_KEY, ULTIMA_ALTERACAO_KEY])
+    return recalcular_relacionados(k)
+
+
+def get_relacionados(carro, limit: int = 3):
+    """
+    Carros relacionados lidos do índice pré-calculado (uma consulta)
+    O índice pode estar atrasado em relação ao inventário: os vendidos são descartados aqui
+    """
+    return Carro.objects.filter(
+        relacionado_em__carro_id=carro.pk, condicao__in=['novo', 'seminovo'],
+    ).order_by('relacionado_em__posicao').cards()[:limit]
@@ -0,0 +1,199 @@
+"""
+Core Web Vitals de usuários reais (RUM) - Regional Veículos
+
+O navegador envia por sendBeacon lotes de LCP, CLS, INP e TTFB marcados com a
+rota (url_name) da página. As amostras ficam num buffer em memória do processo
+e são gravadas com bulk_create quando o buffer enche ou, no máximo,
+FLUSH_INTERVALO segundos depois da primeira pendente (timer do processo);
+o comando consolidar_vitais calcula o p75 diário por página.
+"""
+
+import atexit
+import json
+import logging
+import math
+import threading
+from collections import defaultdict
+from datetime import datetime, time as dt_time, timedelta
+from functools import lru_cache
+
+from django.db import DatabaseError, connections, transaction
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.urls import URLResolver, get_resolver
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .models import AmostraVital, ResumoVital
+
+logger = logging.getLogger(__name__)
+
+# Faixa aceita de cada métrica (ms; CLS adimensional): o resto é ruído ou abuso
+LIMITES = {
+    'LCP': (0, 60000),
+    'CLS': (0, 10),
+    'INP': (0, 60000),
+    'TTFB': (0, 60000),
+}
+MAX_AMOSTRAS_BEACON = 20
+MAX_CORPO = 4096
+
+# Gravação: ao juntar FLUSH_TAMANHO amostras ou FLUSH_INTERVALO segundos após a primeira pendente
+FLUSH_TAMANHO = 200
+FLUSH_INTERVALO = 30
+# Banco fora do ar: acima disto as amostras novas são descartadas
+MAX_BUFFER = 5000
+
+RETENCAO_DIAS = 30
+PERCENTIL = 0.75
+
+
+class BufferAmostras:
+    """Amostras pendentes deste processo"""
+
+    def __init__(self):
+        self._amostras = []
+        self._lock = threading.Lock()
+        self._timer = None
+        self.descartadas = 0
+
+    def adicionar(self, amostras):
+        with self._lock:
+            espaco = MAX_BUFFER - len(self._amostras)
+            self.descartadas += max(0, len(amostras) - espaco)
+            self._amostras.extend(amostras[:max(0, espaco)])
+            if len(self._amostras) < FLUSH_TAMANHO:
+                self._agendar()
+                return
+            lote, self._amostras = self._amostras, []
+        self._gravar(lote)
+
+    def flush(self):
+        with self._lock:
+            lote, self._amostras = self._amostras, []
+        self._gravar(lote)
+
+    def _agendar(self):
+        """Garante a gravação das pendentes em até FLUSH_INTERVALO segundos (com o lock)"""
+        if self._timer is None and self._amostras:
+            # Com pouco tráfego o próximo beacon pode demorar: não depende dele
+            self._timer = threading.Timer(FLUSH_INTERVALO, self._flush_agendado)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_agendado(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            # A thread do timer não passa pelo request_finished
+            connections.close_all()
+
+    def _gravar(self, lote):
+        if not lote:
+            return
+        try:
+            AmostraVital.objects.bulk_create(lote, batch_size=500)
+        except DatabaseError:
+            logger.exception('Falha ao gravar %d amostras de web vitals', len(lote))
+            with self._lock:
+                espaco = MAX_BUFFER - len(self._amostras)
+                self._amostras[:0] = lote[:max(0, espaco)]
+                self._agendar()
+
+    def __len__(self):
+        return len(self._amostras)
+
+
+buffer = BufferAmostras()
+atexit.register(buffer.flush)
+
+
+@lru_cache(maxsize=None)
+def rotas_conhecidas():
+    """url_names das páginas do site (o data-rota do base.html), lidos uma vez do URLconf"""
+    nomes = set()
+    pendentes = list(get_resolver().url_patterns)
+    while pendentes:
+        padrao = pendentes.pop()
+        if isinstance(padrao, URLResolver):
+            if padrao.namespace != 'admin':
+                pendentes.extend(padrao.url_patterns)
+        elif padrao.name:
+            nomes.add(padrao.name)
+    return frozenset(nomes)
+
+
+def _parse_beacon(corpo):
+    """Lista de AmostraVital do corpo {"rota": ..., "amostras": [{"m": "LCP", "v": 1234}, ...]}"""
+    dados = json.loads(corpo)
+    rota = dados.get('rota')
+    amostras = dados.get('amostras')
+    # Só rotas existentes: um valor qualquer viraria um grupo novo no ResumoVital
+    if not isinstance(rota, str) or rota not in rotas_conhecidas():
+        raise ValueError('rota inválida')
+    if not isinstance(amostras, list) or not 0 < len(amostras) <= MAX_AMOSTRAS_BEACON:
+        raise ValueError('amostras inválidas')
+
+    agora = timezone.now()
+    validas = []
+    for amostra in amostras:
+        metrica = amostra.get('m') if isinstance(amostra, dict) else None
+        valor = amostra.get('v') if isinstance(amostra, dict) else None
+        if metrica not in LIMITES or isinstance(valor, bool) or not isinstance(valor, (int, float)):
+            raise ValueError('amostra inválida')
+        minimo, maximo = LIMITES[metrica]
+        if minimo <= valor <= maximo:
+            validas.append(AmostraVital(rota=rota, metrica=metrica, valor=float(valor), registrado_em=agora))
+    return validas
+
+
+@csrf_exempt
+@require_POST
+def coletar_vitais(request):
+    """Recebe o beacon do performance.js (sendBeacon não envia token CSRF)"""
+    if len(request.body) > MAX_CORPO:
+        return HttpResponseBadRequest('beacon grande demais')
+    try:
+        amostras = _parse_beacon(request.body)
+    except (ValueError, AttributeError):
+        return HttpResponseBadRequest('beacon inválido')
+    buffer.adicionar(amostras)
+    return HttpResponse(status=204)
+
+
+def percentil(valores_ordenados, p=PERCENTIL):
+    """Percentil pelo método nearest-rank (o mesmo usado pelo CrUX)"""
+    return valores_ordenados[max(0, math.ceil(p * len(valores_ordenados)) - 1)]
+
+
+def consolidar_dia(dia):
+    """Recalcula os ResumoVital de `dia` a partir das amostras; retorna quantos grupos"""
+    inicio = timezone.make_aware(datetime.combine(dia, dt_time.min))
+    amostras = (
+        AmostraVital.objects
+        .filter(registrado_em__gte=inicio, registrado_em__lt=inicio + timedelta(days=1))
+        .order_by()
+        .values_list('rota', 'metrica', 'valor')
+    )
+    grupos = defaultdict(list)
+    for rota, metrica, valor in amostras.iterator(chunk_size=5000):
+        grupos[(rota, metrica)].append(valor)
+
+    resumos = []
+    for (rota, metrica), valores in grupos.items():
+        valores.sort()
+        resumos.append(ResumoVital(
+            dia=dia, rota=rota, metrica=metrica, p75=percentil(valores), amostras=len(valores),
+        ))
+    with transaction.atomic():
+        ResumoVital.objects.filter(dia=dia).delete()
+        ResumoVital.objects.bulk_create(resumos)
+    return len(resumos)
+
+
+def remover_amostras_antigas(dias=RETENCAO_DIAS):
+    limite = timezone.now() - timedelta(days=dias)
+    removidas, _ = AmostraVital.objects.filter(registrado_em__lt=limite).delete()
+    return removidas
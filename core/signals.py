@@ -0,0 +1,129 @@
+"""
+Sinais do app Core - Regional Veículos
+Centraliza a notificação de alterações no inventário de carros
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .historico import eventos_alteracao, registrar_eventos
+from .models import Carro, Marca
+
+# Disparado (após o commit) sempre que o inventário muda
+inventario_alterado = Signal()
+
+VERSAO_INVENTARIO_KEY = 'inventario:versao'
+
+# Lote aberto por `lote_inventario()` no contexto atual
+_lote = ContextVar('lote_inventario', default=None)
+
+
+def get_versao_inventario() -> int:
+    """Retorna a versão atual do inventário (muda a cada alteração)"""
+    versao = cache.get(VERSAO_INVENTARIO_KEY)
+    if versao is None:
+        versao = int(time.time())
+        cache.add(VERSAO_INVENTARIO_KEY, versao, None)
+        versao = cache.get(VERSAO_INVENTARIO_KEY, versao)
+    return versao
+
+
+def notificar_alteracao_inventario():
+    """Incrementa a versão do inventário e dispara `inventario_alterado`"""
+    try:
+        versao = cache.incr(VERSAO_INVENTARIO_KEY)
+    except ValueError:
+        versao = int(time.time())
+        cache.set(VERSAO_INVENTARIO_KEY, versao, None)
+    inventario_alterado.send(sender=Carro, versao=versao)
+
+
+@receiver(post_save, sender=Carro)
+@receiver(post_delete, sender=Carro)
+@receiver(post_save, sender=Marca)
+@receiver(post_delete, sender=Marca)
+def _inventario_modificado(sender, **kwargs):
+    if kwargs.get('raw'):
+        return
+    lote = _lote.get()
+    if lote is not None:
+        lote['alterado'] = True
+        return
+    transaction.on_commit(notificar_alteracao_inventario)
+
+
+@contextmanager
+def lote_inventario():
+    """
+    Agrupa as alterações de vários carros feitas com save()/delete():
+    o histórico é gravado em bulk e o inventário é notificado uma só vez
+    """
+    if _lote.get() is not None:
+        yield
+        return
+    lote = {'eventos': [], 'alterado': False}
+    token = _lote.set(lote)
+    try:
+        yield
+    finally:
+        _lote.reset(token)
+    registrar_eventos(lote['eventos'])
+    if lote['alterado']:
+        transaction.on_commit(notificar_alteracao_inventario)
+
+
+def _registrar(eventos):
+    lote = _lote.get()
+    if lote is not None:
+        lote['eventos'].extend(eventos)
+    else:
+        registrar_eventos(eventos)
+
+
+def _estado(carro):
+    preco = Carro._meta.get_field('preco').to_python(carro.preco)
+    return {'preco': preco, 'condicao': carro.condicao}
+
+
+@receiver(pre_save, sender=Carro)
+def _guardar_estado_anterior(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._estado_anterior = None
+    if instance.pk is not None:
+        instance._estado_anterior = (
+            Carro.objects.filter(pk=instance.pk).values('preco', 'condicao').first()
+        )
+
+
+@receiver(post_save, sender=Carro)
+def _registrar_historico(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = getattr(instance, '_estado_anterior', None)
+    _registrar(eventos_alteracao(instance.pk, anterior, _estado(instance)))
+
+
+@receiver(post_save, sender=Carro)
+def _indexar_busca(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and not {'fabricante', 'modelo'} & set(update_fields)):
+        return
+    from .busca import indexar_carros
+    indexar_carros([instance.pk])
+
+
+@receiver(post_delete, sender=Carro)
+def _registrar_remocao(sender, instance, **kwargs):
+    _registrar(eventos_alteracao(instance.pk, _estado(instance), None))
+
+
+@receiver(inventario_alterado)
+def _marcar_relacionados(sender, **kwargs):
+    from .recomendacoes import marcar_pendente
+    marcar_pendente()
@@ -1,14 +1,38 @@
+import gzip
+import hashlib
+
+from django.conf import settings
 from django.contrib import sitemaps
+from django.core.cache import cache
+from django.db.models import Max
+from django.template.loader import render_to_string
 from django.urls import reverse
-from django.utils import timezone
-from datetime import datetime
 from .models import Carro
+from .signals import get_versao_inventario
+
+# Acima deste número de URLs o sitemap vira um índice de sitemaps paginados
+SITEMAP_MAX_URLS = getattr(settings, 'SITEMAP_MAX_URLS', 5000)
+SITEMAP_CACHE_PREFIX = 'sitemap:'
+SITEMAP_ARQUIVOS_KEY = 'sitemap:arquivos_versao'
+SITEMAP_LOCK_KEY = 'sitemap:lock'
+SITEMAP_LOCK_TIMEOUT = 120
+
+
+def _ultima_alteracao_inventario():
+    """Data da última alteração em carros disponíveis"""
+    return Carro.objects.filter(
+        condicao__in=['novo', 'seminovo']
+    ).aggregate(ultima=Max('atualizado_em'))['ultima']
+
 
 class StaticViewSitemap(sitemaps.Sitemap):
     """Sitemap para páginas estáticas"""
-    priority = 1.0
     changefreq = 'daily'
     protocol = 'https'
+    limit = SITEMAP_MAX_URLS
+
+    # Páginas cujo conteúdo depende do inventário
+    paginas_inventario = ['core:home', 'core:estoque']
 
     def items(self):
         return ['core:home', 'core:estoque', 'core:sobre', 'contato:contato', 'contato:financiamento']
@@ -17,10 +41,14 @@ class StaticViewSitemap(sitemaps.Sitemap):
         return reverse(item)
 
     def lastmod(self, item):
-        """Data da última modificação"""
-        return timezone.now()
+        """Data da última modificação (somente páginas que listam carros)"""
+        if item in self.paginas_inventario:
+            if not hasattr(self, '_ultima_alteracao'):
+                self._ultima_alteracao = _ultima_alteracao_inventario()
+            return self._ultima_alteracao
+        return None
 
-    def priority_func(self, item):
+    def priority(self, item):
         """Prioridade baseada na página"""
         priorities = {
             'core:home': 1.0,
@@ -34,20 +62,22 @@ class StaticViewSitemap(sitemaps.Sitemap):
 class CarroSitemap(sitemaps.Sitemap):
     """Sitemap para páginas de carros individuais"""
     changefreq = 'weekly'
-    priority = 0.8
     protocol = 'https'
+    limit = SITEMAP_MAX_URLS
 
     def items(self):
-        return Carro.objects.filter(disponivel=True).select_related('marca')
+        return Carro.objects.filter(
+            condicao__in=['novo', 'seminovo']
+        ).only('id', 'destaque', 'atualizado_em').order_by('id')
 
     def lastmod(self, obj):
         """Data da última modificação do carro"""
-        return obj.data_cadastro
+        return obj.atualizado_em
 
     def location(self, obj):
         return reverse('core:detalhe_carro', args=[obj.id])
 
-    def priority_func(self, obj):
+    def priority(self, obj):
         """Prioridade baseada no destaque do carro"""
         return 0.9 if obj.destaque else 0.7
 
@@ -56,18 +86,22 @@ class EstoqueSitemap(sitemaps.Sitemap):
     changefreq = 'daily'
     priority = 0.6
     protocol = 'https'
+    limit = SITEMAP_MAX_URLS
 
     def items(self):
-        """URLs de estoque por marca"""
-        marcas = Carro.objects.filter(disponivel=True).values_list('marca__nome', flat=True).distinct()
-        return [f"estoque-{marca.lower()}" for marca in marcas if marca]
+        """Fabricantes com carros disponíveis e a última alteração de cada um"""
+        return list(
+            Carro.objects.filter(condicao__in=['novo', 'seminovo'])
+            .values('fabricante')
+            .annotate(ultima=Max('atualizado_em'))
+            .order_by('fabricante')
+        )
 
     def location(self, item):
-        marca = item.replace('estoque-', '')
-        return f"{reverse('core:estoque')}?fabricante={marca}"
+        return f"{reverse('core:estoque')}?fabricante={item['fabricante']}"
 
     def lastmod(self, item):
-        return timezone.now()
+        return item['ultima']
 
 # Configuração do sitemap
 sitemaps = {
@@ -75,3 +109,100 @@ sitemaps = {
     'carros': CarroSitemap,
     'estoque': EstoqueSitemap,
 }
+
+
+class _Dominio:
+    """Substitui `Site` na geração fora de uma requisição"""
+
+    def __init__(self, domain):
+        self.domain = domain
+        self.name = domain
+
+
+def _ultima_data(urls):
+    datas = [url['lastmod'] for url in urls if url['lastmod']]
+    return max(datas) if datas else None
+
+
+def gerar_sitemaps():
+    """
+    Pré-computa os arquivos de sitemap e os guarda comprimidos no cache.
+    Gera um único urlset enquanto couber em SITEMAP_MAX_URLS; acima disso
+    gera um índice apontando para as páginas de cada seção.
+    Guarda a versão do inventário usada, para get_sitemap saber quando regenerar.
+    """
+    versao = get_versao_inventario()
+    site = _Dominio(settings.SITE_DOMAIN)
+    paginas = []
+    for secao, classe in sitemaps.items():
+        sitemap = classe()
+        for pagina in sitemap.paginator.page_range:
+            paginas.append((secao, pagina, sitemap.get_urls(page=pagina, site=site, protocol='https')))
+
+    total_urls = sum(len(urls) for _, _, urls in paginas)
+    arquivos = {}
+    if total_urls <= SITEMAP_MAX_URLS:
+        urlset = [url for _, _, urls in paginas for url in urls]
+        arquivos['sitemap.xml'] = (
+            render_to_string('sitemap.xml', {'urlset': urlset}),
+            _ultima_data(urlset),
+        )
+    else:
+        entradas = []
+        for secao, pagina, urls in paginas:
+            nome = f'sitemap-{secao}-{pagina}.xml'
+            ultima = _ultima_data(urls)
+            arquivos[nome] = (render_to_string('sitemap.xml', {'urlset': urls}), ultima)
+            entradas.append({'location': f'https://{site.domain}/{nome}', 'last_mod': ultima})
+        datas = [entrada['last_mod'] for entrada in entradas if entrada['last_mod']]
+        arquivos['sitemap.xml'] = (
+            render_to_string('sitemap_index.xml', {'sitemaps': entradas}),
+            max(datas) if datas else None,
+        )
+
+    valores = {}
+    for nome, (xml, ultima) in arquivos.items():
+        conteudo = xml.encode('utf-8')
+        valores[SITEMAP_CACHE_PREFIX + nome] = {
+            'conteudo': gzip.compress(conteudo),
+            'etag': '"%s"' % hashlib.md5(conteudo).hexdigest(),
+            'lastmod': ultima,
+        }
+
+    anteriores = cache.get(SITEMAP_ARQUIVOS_KEY) or {}
+    antigos = set(anteriores.get('arquivos', [])) - set(arquivos)
+    cache.set_many(valores, None)
+    cache.set(SITEMAP_ARQUIVOS_KEY, {'versao': versao, 'arquivos': list(arquivos)}, None)
+    cache.delete_many([SITEMAP_CACHE_PREFIX + nome for nome in antigos])
+    return list(arquivos)
+
+
+def _arquivos_atuais():
+    """
+    Nomes dos sitemaps da versão atual do inventário
+    As alterações no inventário só mudam a versão; o primeiro pedido depois
+    regenera (um worker por vez, com o lock) e os demais servem a cópia anterior
+    """
+    entrada = cache.get(SITEMAP_ARQUIVOS_KEY)
+    if entrada is not None and entrada['versao'] == get_versao_inventario():
+        return entrada['arquivos']
+    if cache.add(SITEMAP_LOCK_KEY, 1, SITEMAP_LOCK_TIMEOUT):
+        try:
+            return gerar_sitemaps()
+        finally:
+            cache.delete(SITEMAP_LOCK_KEY)
+    if entrada is not None:
+        return entrada['arquivos']
+    # Cache vazio e outro worker gerando: gera aqui mesmo em vez de responder 404
+    return gerar_sitemaps()
+
+
+def get_sitemap(nome):
+    """Retorna o sitemap pré-computado, gerando-o se estiver ausente ou desatualizado"""
+    if nome not in _arquivos_atuais():
+        return None
+    sitemap = cache.get(SITEMAP_CACHE_PREFIX + nome)
+    if sitemap is None:
+        gerar_sitemaps()
+        sitemap = cache.get(SITEMAP_CACHE_PREFIX + nome)
+    return sitemap
@@ -0,0 +1,58 @@
+"""
+Storages de arquivos estáticos e de media - Regional Veículos
+"""
+
+import hashlib
+import os
+import re
+
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+from .assets import construir_bundles
+
+
+class BundledStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    Gera os bundles minificados e o CSS crítico durante o collectstatic,
+    antes do hash e da compressão (gzip/Brotli) feitos pelo whitenoise
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for nome, conteudo in construir_bundles(self).items():
+                if self.exists(nome):
+                    self.delete(nome)
+                self._save(nome, ContentFile(conteudo.encode('utf-8')))
+                paths[nome] = (self, nome)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+
+# Nomes gerados por HashedMediaStorage: <nome>.<12 hex><extensão>
+NOME_COM_HASH_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+
+class HashedMediaStorage(FileSystemStorage):
+    """
+    Salva uploads com o hash do conteúdo no nome (carros/civic.3f2a9c1b7d4e.jpg)
+    Um arquivo nunca muda sob o mesmo nome, então pode ser servido como imutável;
+    uploads idênticos reaproveitam o arquivo existente
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = hashlib.sha256()
+        for bloco in content.chunks():
+            digest.update(bloco)
+        content.seek(0)
+
+        raiz, extensao = os.path.splitext(self.get_valid_name(os.path.basename(name)))
+        nome = os.path.join(os.path.dirname(name), f'{raiz}.{digest.hexdigest()[:12]}{extensao}')
+        if self.exists(nome):
+            return nome.replace('\\', '/')
+        return super().save(nome, content, max_length=max_length)
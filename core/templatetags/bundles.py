@@ -0,0 +1,59 @@
+from functools import lru_cache
+
+from django import template
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from core.assets import CSS_BUNDLE, CSS_FONTES, JS_BUNDLE, JS_FONTES, css_critico_path
+
+register = template.Library()
+
+
+@lru_cache(maxsize=None)
+def _bundle_disponivel(nome):
+    """Os bundles só existem após o collectstatic (produção)"""
+    return staticfiles_storage.exists(nome)
+
+
+@lru_cache(maxsize=None)
+def _ler_css_critico(pagina):
+    nome = css_critico_path(pagina)
+    if hasattr(staticfiles_storage, 'stored_name'):
+        nome = staticfiles_storage.stored_name(nome)
+    with staticfiles_storage.open(nome) as arquivo:
+        return arquivo.read().decode('utf-8')
+
+
+@register.simple_tag
+def css_bundle():
+    """Folha de estilo do site (bundle minificado quando disponível)"""
+    if _bundle_disponivel(CSS_BUNDLE):
+        return format_html('<link href="{}" rel="stylesheet">', static(CSS_BUNDLE))
+    return format_html_join('\n', '<link href="{}" rel="stylesheet">', ((static(nome),) for nome in CSS_FONTES))
+
+
+@register.simple_tag
+def js_bundle():
+    """Scripts do site (bundle minificado quando disponível)"""
+    if _bundle_disponivel(JS_BUNDLE):
+        return format_html('<script src="{}" defer></script>', static(JS_BUNDLE))
+    return format_html_join('\n', '<script src="{}" defer></script>', ((static(nome),) for nome in JS_FONTES))
+
+
+@register.simple_tag
+def critical_css(pagina):
+    """
+    CSS acima da dobra embutido na página e o restante carregado de forma
+    assíncrona; sem o build, cai para a folha de estilo normal
+    """
+    if not (_bundle_disponivel(CSS_BUNDLE) and _bundle_disponivel(css_critico_path(pagina))):
+        return css_bundle()
+    url = static(CSS_BUNDLE)
+    return format_html(
+        '<style>{}</style>\n'
+        '<link rel="preload" href="{}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+        '<noscript><link rel="stylesheet" href="{}"></noscript>',
+        mark_safe(_ler_css_critico(pagina)), url, url,
+    )
@@ -1,3 +1,793 @@
-from django.test import TestCase
+import io
+import json
+import os
+import threading
+import time
+import unittest
 
-# Create your tests here.
+import psycopg2
+from django.core.management import call_command
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from regional_veiculos.cache_backend import CacheDuasCamadas
+from regional_veiculos.db_pool.pool import PoolDeConexoes, PoolEsgotado
+
+try:
+    import fakeredis
+except ImportError:  # dependência só dos testes
+    fakeredis = None
+
+# Postgres local usado pelos testes do pool (ex: "dbname=postgres user=postgres host=localhost")
+POSTGRES_TEST_DSN = os.environ.get('POSTGRES_TEST_DSN', 'dbname=postgres host=localhost connect_timeout=2')
+
+# Redis usado pelos testes do cache em duas camadas; sem ele, um fakeredis em memória
+REDIS_TEST_URL = os.environ.get('REDIS_TEST_URL')
+
+
+def criar_carro(**campos):
+    """Carro disponível mínimo para os testes; os campos passados substituem os padrões"""
+    from core.models import Carro
+    return Carro.objects.create(**{
+        'modelo': 'Corolla', 'fabricante': 'Toyota', 'ano': 2022, 'cor': 'Prata', 'quilometragem': 10000,
+        'motor': '2.0', 'preco': 120000, 'descricao': '-', 'imagem_principal': 'carros/x.jpg',
+        **campos,
+    })
+
+
+def _postgres_disponivel():
+    try:
+        psycopg2.connect(POSTGRES_TEST_DSN).close()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+class PoolDeConexoesTest(SimpleTestCase):
+    """Simula o esgotamento do pool contra um PostgreSQL local"""
+
+    @classmethod
+    def setUpClass(cls):
+        # Conecta só quando a classe roda, não ao importar o módulo de testes
+        if not _postgres_disponivel():
+            raise unittest.SkipTest('PostgreSQL local indisponível (defina POSTGRES_TEST_DSN)')
+        super().setUpClass()
+
+    def setUp(self):
+        self.pool = PoolDeConexoes(
+            lambda: psycopg2.connect(POSTGRES_TEST_DSN),
+            min_size=1, max_size=2, timeout=0.2,
+        )
+
+    def tearDown(self):
+        self.pool.fechar()
+
+    def test_esgotamento_gera_timeout_e_metricas(self):
+        conexoes = [self.pool.obter(), self.pool.obter()]
+        self.assertEqual(self.pool.metricas()['utilizacao'], 1.0)
+
+        inicio = time.monotonic()
+        with self.assertRaises(PoolEsgotado):
+            self.pool.obter()
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.2)
+
+        metricas = self.pool.metricas()
+        self.assertEqual(metricas['timeouts'], 1)
+        self.assertEqual(metricas['abertas'], 2)
+        for conexao in conexoes:
+            self.pool.devolver(conexao)
+        self.assertEqual(self.pool.metricas()['ociosas'], 2)
+
+    def test_espera_conexao_devolvida_por_outra_thread(self):
+        self.pool.timeout = 2.0
+        conexoes = [self.pool.obter(), self.pool.obter()]
+        threading.Timer(0.1, self.pool.devolver, args=[conexoes[0]]).start()
+
+        conexao = self.pool.obter()
+        self.assertIs(conexao, conexoes[0])
+        metricas = self.pool.metricas()
+        self.assertEqual(metricas['esperas'], 1)
+        self.assertGreater(metricas['tempo_espera_max'], 0.05)
+
+        self.pool.devolver(conexao)
+        self.pool.devolver(conexoes[1])
+
+    def test_transacao_pendente_desfeita_ao_devolver(self):
+        conexao = self.pool.obter()
+        with conexao.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.pool.devolver(conexao)
+        self.assertEqual(
+            conexao.get_transaction_status(),
+            psycopg2.extensions.TRANSACTION_STATUS_IDLE,
+        )
+
+    def test_sessao_reiniciada_ao_devolver(self):
+        conexao = self.pool.obter()
+        conexao.autocommit = True
+        with conexao.cursor() as cursor:
+            cursor.execute("SET statement_timeout = '1s'")
+            cursor.execute('CREATE TEMP TABLE rascunho (id int)')
+        self.pool.devolver(conexao)
+
+        reaproveitada = self.pool.obter()
+        self.assertIs(reaproveitada, conexao)
+        self.assertTrue(reaproveitada.autocommit)
+        with reaproveitada.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            self.assertEqual(cursor.fetchone()[0], '0')
+            cursor.execute("SELECT to_regclass('pg_temp.rascunho')")
+            self.assertIsNone(cursor.fetchone()[0])
+        self.pool.devolver(reaproveitada)
+
+
+class ConexaoFalsa:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class PreenchimentoDoPoolTest(SimpleTestCase):
+    """O pré-preenchimento concorre com checkouts sem passar de MAX_SIZE"""
+
+    def test_preenchimento_concorrente_respeita_max_size(self):
+        criadas = []
+
+        def criar():
+            time.sleep(0.05)
+            criadas.append(ConexaoFalsa())
+            return criadas[-1]
+
+        pool = PoolDeConexoes(criar, min_size=2, max_size=2, timeout=2.0, health_check_interval=None)
+        obtidas = []
+        threads = [threading.Thread(target=lambda: obtidas.append(pool.obter())) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(criadas), 2)
+        self.assertEqual(pool.metricas()['abertas'], 2)
+        self.assertEqual(len(obtidas), 2)
+
+
+class ConexaoComSessao(ConexaoFalsa):
+    """Registra os comandos e o autocommit de cada um"""
+
+    def __init__(self, status=psycopg2.extensions.TRANSACTION_STATUS_IDLE):
+        self.status = status
+        self.autocommit = False
+        self.comandos = []
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.comandos.append(('ROLLBACK', self.autocommit))
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        conexao = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *erro):
+                return False
+
+            def execute(self, sql):
+                conexao.comandos.append((sql, conexao.autocommit))
+
+        return Cursor()
+
+
+class SessaoDevolvidaTest(SimpleTestCase):
+    """A conexão devolvida perde a transação e o estado da sessão antes do próximo checkout"""
+
+    def test_rollback_e_discard_all_fora_da_transacao(self):
+        conexao = ConexaoComSessao(psycopg2.extensions.TRANSACTION_STATUS_INTRANS)
+        pool = PoolDeConexoes(lambda: conexao, min_size=0, max_size=1, health_check_interval=None)
+        self.assertIs(pool.obter(), conexao)
+        pool.devolver(conexao)
+
+        self.assertEqual(conexao.comandos, [('ROLLBACK', False), ('DISCARD ALL', True)])
+        self.assertFalse(conexao.autocommit)
+        self.assertEqual(pool.metricas()['ociosas'], 1)
+
+@unittest.skipUnless(REDIS_TEST_URL or fakeredis, 'Defina REDIS_TEST_URL ou instale o fakeredis')
+class CacheDuasCamadasTest(SimpleTestCase):
+    """Dois backends simulam dois workers compartilhando o mesmo Redis"""
+
+    def setUp(self):
+        opcoes = {'LOCAL_TIMEOUT': 60, 'CHANNEL': 'teste:invalidacao'}
+        url = REDIS_TEST_URL
+        if url is None:
+            # Os dois workers falam com o mesmo servidor em memória
+            url = 'redis://fakeredis:6379/0'
+            opcoes.update(connection_class=fakeredis.FakeConnection, server=fakeredis.FakeServer())
+        params = {'KEY_PREFIX': 'teste', 'OPTIONS': opcoes}
+        self.worker_a = CacheDuasCamadas(url, params)
+        self.worker_b = CacheDuasCamadas(url, params)
+        self.worker_a.clear()
+
+    def tearDown(self):
+        self.worker_a.clear()
+
+    def _aguardar(self, condicao):
+        limite = time.monotonic() + 2
+        while not condicao() and time.monotonic() < limite:
+            time.sleep(0.01)
+        return condicao()
+
+    def test_leitura_repetida_servida_pelo_lru(self):
+        self.worker_a.set('chave', 'valor')
+        self.assertEqual(self.worker_b.get('chave'), 'valor')
+        self.assertEqual(self.worker_b.get('chave'), 'valor')
+        estatisticas = self.worker_b.estatisticas()
+        self.assertEqual(estatisticas['redis_hits'], 1)
+        self.assertEqual(estatisticas['local_hits'], 1)
+        self.assertEqual(estatisticas['local_hit_ratio'], 0.5)
+
+    def test_escrita_invalida_copia_local_de_outro_worker(self):
+        self.worker_a.set('chave', 'antigo')
+        self.assertEqual(self.worker_b.get('chave'), 'antigo')
+        time.sleep(0.1)  # garante que a assinatura do worker B está ativa
+
+        self.worker_a.set('chave', 'novo')
+        self.assertTrue(self._aguardar(lambda: self.worker_b.get('chave') == 'novo'))
+
+        self.worker_a.delete('chave')
+        self.assertTrue(self._aguardar(lambda: self.worker_b.get('chave') is None))
+
+    def test_lru_respeita_limite_de_entradas(self):
+        self.worker_a.local.max_entries = 2
+        for i in range(3):
+            self.worker_a.set(f'chave-{i}', i)
+        self.assertEqual(len(self.worker_a.local), 2)
+        self.assertEqual(self.worker_a.get('chave-0'), 0)
+        self.assertEqual(self.worker_a.estatisticas()['redis_hits'], 1)
+
+    def test_has_key_descarta_lru_herdado_do_fork(self):
+        self.worker_a.set('chave', 'valor')
+        self.assertEqual(self.worker_b.get('chave'), 'valor')
+        # Removida direto no Redis enquanto o LRU do worker B ainda tem a cópia
+        self.worker_b._cache.delete(self.worker_b.make_and_validate_key('chave'))
+        self.worker_b._assinante_pid = None  # como num processo filho após o fork
+        self.assertFalse(self.worker_b.has_key('chave'))
+
+
+class PlanosDeConsultaTest(TestCase):
+    """
+    EXPLAIN das consultas do catálogo contra o baseline do banco de testes (core/planos/)
+    Roda com um inventário reduzido; VERIFICAR_PLANOS=1 usa o tamanho do baseline
+    """
+
+    def test_sem_regressao_de_plano(self):
+        from core.planos import CARROS_PADRAO, CARROS_TESTE, caminho_baseline
+        if not caminho_baseline().exists():
+            self.skipTest(f'Sem baseline de planos para {connection.vendor} ({caminho_baseline().name})')
+        carros = CARROS_PADRAO if os.environ.get('VERIFICAR_PLANOS') else CARROS_TESTE
+        call_command('verificar_planos', carros=carros, stdout=io.StringIO())
+
+
+@override_settings(
+    ALLOWED_HOSTS=['*'],
+    MIDDLEWARE=settings.MIDDLEWARE + ['core.middleware.ReplicaMiddleware'],
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class ReplicaMiddlewareTest(TestCase):
+    """Só as gravações do contato fixam o cliente no primário"""
+
+    def test_beacon_de_rum_nao_fixa_no_primario(self):
+        for corpo in ('lixo', '{"rota": "home", "metricas": {"LCP": 1200}}'):
+            resposta = self.client.post('/rum/', corpo, content_type='application/json')
+            self.assertNotIn('rv_primario', resposta.cookies)
+
+    def test_lead_gravado_fixa_no_primario(self):
+        resposta = self.client.post('/contato/', {
+            'nome': 'Maria', 'email': 'maria@example.com', 'telefone': '(11) 99999-0000',
+            'assunto': 'Dúvida', 'mensagem': 'Olá',
+        })
+        self.assertEqual(resposta.status_code, 302)
+        self.assertIn('rv_primario', resposta.cookies)
+
+    def test_formulario_invalido_nao_fixa(self):
+        resposta = self.client.post('/contato/', {'nome': ''})
+        self.assertNotIn('rv_primario', resposta.cookies)
+
+
+class ParseIdsComparacaoTest(SimpleTestCase):
+    def test_ids_fora_da_faixa_sao_invalidos(self):
+        from core.comparacao import parse_ids
+        self.assertEqual(parse_ids(['3,1', '3']), [1, 3])
+        for valor in ('99999999999999999999999', '0', 'abc', '1,2,3,4,5'):
+            with self.assertRaises(ValueError):
+                parse_ids([valor])
+
+
+@override_settings(ALLOWED_HOSTS=['*'], STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ComparacaoTest(TestCase):
+    """Carros vendidos (link antigo ou compartilhado) saem da comparação"""
+
+    def test_so_compara_carros_a_venda(self):
+        from core.comparacao import buscar_carros
+        civic = criar_carro(fabricante='Honda', modelo='Civic')
+        vendido = criar_carro(fabricante='Toyota', modelo='Etios', condicao='vendido')
+        corolla = criar_carro(modelo='Corolla')
+        self.assertEqual(buscar_carros([civic.pk, vendido.pk, corolla.pk, 999]), [civic, corolla])
+
+        resposta = self.client.get('/comparar/', {'ids': f'{civic.pk},{vendido.pk}'})
+        self.assertContains(resposta, 'Civic')
+        self.assertNotContains(resposta, 'Etios')
+
+
+class FiltroEstoqueFormTest(SimpleTestCase):
+    def _form(self, **dados):
+        from core.forms import FiltroEstoqueForm
+        form = FiltroEstoqueForm(dados, opcoes={'fabricante': ['Toyota'], 'combustivel': ['Flex'], 'cambio': ['CVT']})
+        form.is_valid()
+        return form
+
+    def test_valores_enormes_sao_descartados(self):
+        form = self._form(km_max='99999999999999999999999', preco_min='99999999999999999999999', ano_min='2015')
+        self.assertEqual(form.filtros(), {'ano_min': 2015})
+        self.assertIn('km_max', form.errors)
+        self.assertIn('preco_min', form.errors)
+
+
+class OpcoesEstoqueTest(TestCase):
+    """Os selects do estoque só oferecem valores de carros à venda"""
+
+    def test_ignora_carros_vendidos(self):
+        from core.forms import opcoes_estoque
+        criar_carro(fabricante='Toyota', combustivel='Flex', cambio='CVT')
+        criar_carro(fabricante='Ford', combustivel='Diesel', cambio='Manual', condicao='vendido')
+        self.assertEqual(opcoes_estoque(), {'fabricante': ['Toyota'], 'combustivel': ['Flex'], 'cambio': ['CVT']})
+
+
+class FeedAlteracoesTest(TestCase):
+    """O cursor do feed segue a ordem de confirmação, não o id"""
+
+    def _ler(self, cursor=''):
+        return self.client.get('/api/alteracoes/', {'cursor': cursor, 'limit': 100}, HTTP_HOST='localhost').json()
+
+    def test_evento_confirmado_depois_com_id_menor_nao_e_pulado(self):
+        from core.historico import numerar_eventos
+        from core.models import HistoricoCarro
+        HistoricoCarro.objects.bulk_create([
+            HistoricoCarro(id=pk, carro_id=pk, tipo='criado', condicao_nova='seminovo') for pk in (5, 6)
+        ])
+        numerar_eventos()
+        primeira = self._ler()
+        self.assertEqual([evento['id'] for evento in primeira['alteracoes']], [5, 6])
+
+        # Transação mais longa confirmada só agora, com id menor que o cursor já entregue
+        HistoricoCarro.objects.bulk_create([
+            HistoricoCarro(id=3, carro_id=3, tipo='preco', preco_anterior=10, preco_novo=9)
+        ])
+        numerar_eventos()
+        segunda = self._ler(primeira['cursor'])
+        self.assertEqual([evento['id'] for evento in segunda['alteracoes']], [3])
+        self.assertEqual(self._ler(segunda['cursor'])['alteracoes'], [])
+
+    def test_gravacao_numera_e_feed_so_le(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from core.historico import registrar_eventos
+        from core.models import HistoricoCarro
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_eventos([HistoricoCarro(carro_id=1, tipo='criado', condicao_nova='novo')])
+        self.assertFalse(HistoricoCarro.objects.filter(sequencia__isnull=True).exists())
+
+        with CaptureQueriesContext(connection) as consultas:
+            dados = self._ler()
+        self.assertEqual(len(dados['alteracoes']), 1)
+        self.assertTrue(all(c['sql'].lstrip().upper().startswith('SELECT') for c in consultas.captured_queries))
+
+
+class CarrosRelacionadosTest(TestCase):
+    """Índice de similaridade e o debounce do recálculo"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.corolla = criar_carro(ano=2021, preco=120000, quilometragem=30000)
+        self.corolla_antigo = criar_carro(ano=2020, preco=110000, quilometragem=30000)
+        self.hilux = criar_carro(modelo='Hilux', ano=2023, preco=300000, quilometragem=30000)
+        self.onix = criar_carro(modelo='Onix', fabricante='Chevrolet', ano=2015, preco=45000, quilometragem=30000)
+
+    def test_vizinho_mais_proximo_primeiro(self):
+        from core.recomendacoes import get_relacionados, recalcular_relacionados
+        self.assertEqual(recalcular_relacionados(k=2), 8)
+        relacionados = list(get_relacionados(self.corolla, limit=2))
+        self.assertEqual(relacionados[0].id, self.corolla_antigo.id)
+        self.assertEqual(len(relacionados), 2)
+
+    def test_vendido_sai_antes_do_recalculo(self):
+        from core.recomendacoes import get_relacionados, recalcular_relacionados
+        recalcular_relacionados(k=3)
+        self.corolla_antigo.condicao = 'vendido'
+        self.corolla_antigo.save()
+        ids = [carro.id for carro in get_relacionados(self.corolla)]
+        self.assertNotIn(self.corolla_antigo.id, ids)
+
+    def test_alteracao_so_marca_pendente(self):
+        from unittest import mock
+        from core import recomendacoes
+        from core.models import CarroRelacionado
+        with self.captureOnCommitCallbacks(execute=True):
+            criar_carro(modelo='Civic', fabricante='Honda', preco=130000, quilometragem=30000)
+        self.assertFalse(CarroRelacionado.objects.exists())
+
+        # Alteração recente: espera o inventário assentar
+        self.assertIsNone(recomendacoes.recalcular_se_pendente())
+        with mock.patch.object(recomendacoes.time, 'time', return_value=time.time() + recomendacoes.QUIETO):
+            self.assertEqual(recomendacoes.recalcular_se_pendente(), 5 * 4)
+        self.assertIsNone(recomendacoes.recalcular_se_pendente())
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+class SitemapSobDemandaTest(TestCase):
+    """Alterações no inventário não geram sitemaps; o primeiro pedido depois regenera"""
+
+    def _carro(self, modelo):
+        with self.captureOnCommitCallbacks(execute=True):
+            return criar_carro(modelo=modelo)
+
+    def test_regenera_no_pedido_seguinte_a_alteracao(self):
+        from django.core.cache import cache
+        from core.sitemaps import SITEMAP_ARQUIVOS_KEY
+        cache.clear()
+        primeiro = self._carro('Corolla')
+        self.assertIsNone(cache.get(SITEMAP_ARQUIVOS_KEY))
+        self.assertIn(f'/carro/{primeiro.pk}/', self.client.get('/sitemap.xml').content.decode())
+
+        segundo = self._carro('Yaris')
+        self.assertIn(f'/carro/{segundo.pk}/', self.client.get('/sitemap.xml').content.decode())
+
+
+class BufferAmostrasTest(TransactionTestCase):
+    """Amostras de um beacon isolado são gravadas pelo timer, sem esperar outro beacon"""
+
+    def test_timer_grava_amostras_pendentes(self):
+        from unittest import mock
+        from core import rum
+        from core.models import AmostraVital
+        buffer = rum.BufferAmostras()
+        with mock.patch.object(rum, 'FLUSH_INTERVALO', 0.05):
+            buffer.adicionar([AmostraVital(rota='home', metrica='LCP', valor=1200, registrado_em=timezone.now())])
+        self.assertEqual(AmostraVital.objects.count(), 0)
+
+        limite = time.monotonic() + 2
+        while AmostraVital.objects.count() == 0 and time.monotonic() < limite:
+            time.sleep(0.01)
+        self.assertEqual(AmostraVital.objects.count(), 1)
+        self.assertEqual(len(buffer), 0)
+
+
+class BeaconRotasTest(SimpleTestCase):
+    """O beacon só aceita url_names do URLconf: rotas inventadas não viram grupos no resumo"""
+
+    def test_aceita_so_rotas_do_urlconf(self):
+        from core.rum import _parse_beacon
+        amostras = _parse_beacon('{"rota": "detalhe_carro", "amostras": [{"m": "LCP", "v": 1200}]}')
+        self.assertEqual([(a.rota, a.metrica) for a in amostras], [('detalhe_carro', 'LCP')])
+        for rota in ('pagina_qualquer', 'index', 'a' * 20, 'home '):
+            with self.assertRaises(ValueError, msg=rota):
+                _parse_beacon(json.dumps({'rota': rota, 'amostras': [{'m': 'LCP', 'v': 1200}]}))
+
+
+@override_settings(
+    ALLOWED_HOSTS=['*'],
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class CatalogoSemCookieTest(TestCase):
+    """Páginas do catálogo anônimas não criam cookies, então podem ir para cache compartilhado"""
+
+    def test_estoque_sem_set_cookie_nem_vary_cookie(self):
+        for url in ('/estoque/', '/estoque/?fabricante=Toyota&ordem=menor_preco'):
+            resposta = self.client.get(url)
+            self.assertEqual(resposta.status_code, 200)
+            self.assertEqual(len(resposta.cookies), 0, url)
+            self.assertNotIn('cookie', resposta.get('Vary', '').lower(), url)
+
+    def test_formulario_do_alerta_em_pagina_propria(self):
+        resposta = self.client.get('/alertas/', {'fabricante': 'Toyota', 'preco_max': '90000'})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertContains(resposta, 'csrfmiddlewaretoken')
+        self.assertContains(resposta, 'value="Toyota"')
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+class ApiInventarioTest(TestCase):
+    """Seleção de campos, paginação por cursor, ETag e validação dos parâmetros"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.carros = [criar_carro(modelo=modelo) for modelo in ('Corolla', 'Yaris', 'Etios')]
+
+    def test_paginacao_por_cursor(self):
+        primeira = self.client.get('/api/carros/', {'limit': 2, 'fields': 'id,modelo'}).json()
+        self.assertEqual([c['modelo'] for c in primeira['resultados']], ['Etios', 'Yaris'])
+        self.assertEqual(set(primeira['resultados'][0]), {'id', 'modelo'})
+
+        segunda = self.client.get(primeira['proximo']).json()
+        self.assertEqual([c['id'] for c in segunda['resultados']], [self.carros[0].id])
+        self.assertIsNone(segunda['proximo'])
+
+    def test_parametros_invalidos_geram_400(self):
+        import base64
+        enorme = base64.urlsafe_b64encode(b'9' * 25).decode().rstrip('=')
+        zero = base64.urlsafe_b64encode(b'0').decode().rstrip('=')
+        for url in (
+            f'/api/carros/?cursor={enorme}',
+            f'/api/carros/?cursor={zero}',
+            '/api/carros/?cursor=@@@',
+            '/api/carros/?fields=id,senha',
+            '/api/carros/?limit=1000',
+            f'/api/alteracoes/?cursor={enorme}',
+        ):
+            self.assertEqual(self.client.get(url).status_code, 400, url)
+        self.assertEqual(self.client.get(f'/api/alteracoes/?cursor={zero}').status_code, 200)
+
+    def test_etag_responde_304(self):
+        resposta = self.client.get('/api/marcas/')
+        self.assertEqual(resposta.status_code, 200)
+        repetida = self.client.get('/api/marcas/', HTTP_IF_NONE_MATCH=resposta['ETag'])
+        self.assertEqual(repetida.status_code, 304)
+
+
+
+@override_settings(ALLOWED_HOSTS=['*'], STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class AutocompletarTest(TestCase):
+    """Índice de prefixos: acentos, ranking, limite, reconstrução e links das sugestões"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        criar_carro(fabricante='Citroën', modelo='C3', ano=2020)
+        criar_carro(fabricante='Citroën', modelo='C4 Cactus', ano=2021)
+        criar_carro(fabricante='Chevrolet', modelo='Onix', ano=2020)
+
+    def test_ignora_acentos_e_caixa(self):
+        from core.autocompletar import sugerir
+        for termo in ('citroe', 'CITROËN', 'Citroen'):
+            self.assertEqual(sugerir(termo, limite=1), [('Citroën', 'fabricante', 2)], termo)
+        self.assertEqual(sugerir('citroen c3'), [('Citroën C3', 'modelo', 1)])
+
+    def test_ranking_por_total_e_limite(self):
+        from core.autocompletar import sugerir
+        self.assertEqual(
+            sugerir('c'),
+            [('Citroën', 'fabricante', 2), ('Chevrolet', 'fabricante', 1),
+             ('Chevrolet Onix', 'modelo', 1), ('Citroën C3', 'modelo', 1), ('Citroën C4 Cactus', 'modelo', 1)],
+        )
+        self.assertEqual(sugerir('c', limite=2), [('Citroën', 'fabricante', 2), ('Chevrolet', 'fabricante', 1)])
+        self.assertEqual(sugerir('2020'), [('2020', 'ano', 2)])
+
+    def test_reconstroi_quando_versao_muda(self):
+        from core.autocompletar import get_indice, sugerir
+        from core.signals import notificar_alteracao_inventario
+        indice = get_indice()
+        criar_carro(fabricante='Fiat', modelo='Pulse')
+        self.assertIs(get_indice(), indice)
+        self.assertEqual(sugerir('fiat'), [])
+
+        notificar_alteracao_inventario()
+        self.assertIsNot(get_indice(), indice)
+        self.assertEqual(sugerir('fiat', limite=1), [('Fiat', 'fabricante', 1)])
+
+    def test_sugestoes_levam_a_paginas_com_os_carros(self):
+        sugestoes = self.client.get('/api/autocompletar/', {'q': '2021'}).json()['sugestoes']
+        self.assertEqual(sugestoes[0]['url'], '/estoque/?ano_min=2021&ano_max=2021')
+        for termo in ('2021', 'citroen', 'cactus'):
+            sugestao = self.client.get('/api/autocompletar/', {'q': termo}).json()['sugestoes'][0]
+            pagina = self.client.get(sugestao['url'])
+            self.assertContains(pagina, 'C4 Cactus', msg_prefix=sugestao['url'])
+
+
+class BuscaAproximadaTest(TestCase):
+    """Erros de digitação em fabricante e modelo, termo exato na descrição, só carros disponíveis"""
+
+    def setUp(self):
+        self.corolla = criar_carro(fabricante='Toyota', modelo='Corolla')
+        self.hilux = criar_carro(fabricante='Toyota', modelo='Hilux SW4')
+        self.civic = criar_carro(fabricante='Honda', modelo='Civic', descricao='Completo, com teto solar')
+        criar_carro(fabricante='Toyota', modelo='Corolla Cross', condicao='vendido')
+
+    def test_tolera_erros_de_digitacao(self):
+        from core.busca import buscar_aproximado
+        corola = buscar_aproximado('corola')
+        self.assertEqual(corola.ids, [self.corolla.pk])
+        self.assertEqual(corola.sugestao, 'corolla')
+
+        self.assertEqual(sorted(buscar_aproximado('toiota').ids), [self.corolla.pk, self.hilux.pk])
+        hilux = buscar_aproximado('hilux sw4')
+        self.assertEqual(hilux.ids[0], self.hilux.pk)
+        self.assertIsNone(hilux.sugestao)
+
+    def test_termo_exato_na_descricao(self):
+        from core.busca import buscar_aproximado
+        self.assertEqual(buscar_aproximado('teto solar').ids, [self.civic.pk])
+        self.assertNotIn(self.civic.pk, buscar_aproximado('Toyota').ids)
+
+    @override_settings(ALLOWED_HOSTS=['*'], STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_pagina_de_busca(self):
+        resposta = self.client.get('/buscar/', {'q': 'toiota corola'})
+        self.assertContains(resposta, 'Corolla')
+        self.assertNotContains(resposta, 'Corolla Cross')
+        self.assertContains(resposta, 'toyota corolla')
+
+
+@override_settings(ALLOWED_HOSTS=['*'], STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class PopularidadeTest(TestCase):
+    """Contadores no cache, gravação com decaimento e lock, ordenação por populares"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.carro = criar_carro(modelo='Corolla')
+        self.outro = criar_carro(modelo='Yaris')
+
+    def _contador(self, carro):
+        from core.popularidade import PREFIXO, _contadores
+        return _contadores().get(f'{PREFIXO}{carro.pk}')
+
+    def test_visitas_humanas_contam_no_cache(self):
+        for _ in range(3):
+            self.client.get(f'/carro/{self.carro.pk}/')
+        self.client.get(f'/carro/{self.carro.pk}/', HTTP_USER_AGENT='Googlebot/2.1')
+        self.client.head(f'/carro/{self.carro.pk}/')
+        self.assertEqual(self._contador(self.carro), 3)
+        self.carro.refresh_from_db()
+        self.assertEqual(self.carro.visualizacoes, 0)
+
+    def test_gravacao_soma_desconta_e_decai(self):
+        from datetime import timedelta
+        from core.models import Carro
+        from core.popularidade import MEIA_VIDA, ULTIMA_GRAVACAO_KEY, _contadores, gravar_visualizacoes
+        Carro.objects.filter(pk=self.outro.pk).update(popularidade=8)
+        _contadores().set(ULTIMA_GRAVACAO_KEY, timezone.now() - MEIA_VIDA, None)
+        for _ in range(3):
+            self.client.get(f'/carro/{self.carro.pk}/')
+
+        self.assertEqual(gravar_visualizacoes(), 3)
+        self.carro.refresh_from_db()
+        self.outro.refresh_from_db()
+        self.assertEqual((self.carro.visualizacoes, self.carro.popularidade), (3, 3))
+        self.assertAlmostEqual(self.outro.popularidade, 4, places=3)
+        self.assertEqual(self._contador(self.carro), 0)
+        self.assertLess(timezone.now() - _contadores().get(ULTIMA_GRAVACAO_KEY), timedelta(minutes=1))
+
+    def test_chave_despejada_nao_reaplica_decaimento(self):
+        from unittest import mock
+        from core.models import Carro
+        from core.popularidade import MEIA_VIDA, ULTIMA_GRAVACAO_KEY, _contadores, gravar_visualizacoes
+        contadores = _contadores()
+        Carro.objects.filter(pk=self.outro.pk).update(popularidade=8)
+        contadores.set(ULTIMA_GRAVACAO_KEY, timezone.now() - MEIA_VIDA, None)
+        self.client.get(f'/carro/{self.carro.pk}/')
+
+        ler = contadores.get_many
+
+        def ler_e_despejar(chaves):
+            lidos = ler(chaves)
+            contadores.delete_many(chaves)
+            return lidos
+
+        with mock.patch.object(contadores, 'get_many', ler_e_despejar):
+            self.assertEqual(gravar_visualizacoes(), 1)
+        self.assertEqual(gravar_visualizacoes(), 0)
+        self.outro.refresh_from_db()
+        self.assertAlmostEqual(self.outro.popularidade, 4, places=3)
+
+    def test_execucao_concorrente_nao_grava(self):
+        from core.popularidade import GRAVACAO_LOCK_KEY, _contadores, gravar_visualizacoes
+        self.client.get(f'/carro/{self.carro.pk}/')
+        _contadores().add(GRAVACAO_LOCK_KEY, 1, 60)
+        self.assertIsNone(gravar_visualizacoes())
+        self.assertEqual(self._contador(self.carro), 1)
+
+        _contadores().delete(GRAVACAO_LOCK_KEY)
+        self.assertEqual(gravar_visualizacoes(), 1)
+
+    def test_ordem_populares(self):
+        from django.core.cache import cache
+        from core.models import Carro
+        Carro.objects.filter(pk=self.carro.pk).update(popularidade=5)
+        Carro.objects.filter(pk=self.outro.pk).update(popularidade=1)
+        conteudo = self.client.get('/estoque/', {'ordem': 'populares'}).content.decode()
+        self.assertLess(conteudo.index('Corolla'), conteudo.index('Yaris'))
+
+        Carro.objects.filter(pk=self.outro.pk).update(popularidade=9)
+        cache.clear()
+        conteudo = self.client.get('/estoque/', {'ordem': 'populares'}).content.decode()
+        self.assertLess(conteudo.index('Yaris'), conteudo.index('Corolla'))
+
+class RespostaFalsa(io.BytesIO):
+    """Resposta HTTP mínima para o download de imagens"""
+
+    def __init__(self, conteudo):
+        super().__init__(conteudo)
+        self.headers = {'Content-Length': str(len(conteudo))}
+
+
+class ImportacaoEstoqueTest(TestCase):
+    """Preço do feed, validação das URLs de imagem, download e upsert por diferenças"""
+
+    def _linha(self, codigo, **campos):
+        return {
+            'codigo': codigo, 'modelo': 'Corolla', 'fabricante': 'Toyota', 'ano': '2022', 'cor': 'Prata',
+            'quilometragem': '10000', 'combustivel': 'Flex', 'cambio': 'CVT', 'motor': '2.0',
+            'preco': '120000,00', 'condicao': 'seminovo', 'destaque': '', 'descricao': '-', 'imagens': [],
+            **campos,
+        }
+
+    def test_converter_preco(self):
+        from decimal import Decimal
+        from core.importacao import converter_preco
+        for valor in ('45990', '45990.00', '45990,00', '45.990', '45.990,00'):
+            self.assertEqual(converter_preco(valor), Decimal('45990.00'), valor)
+        self.assertEqual(converter_preco('1.245.990,50'), Decimal('1245990.50'))
+
+    def test_urls_de_imagem_fora_da_internet_publica(self):
+        from core.importacao import validar_url_imagem
+        for url in ('file:///etc/passwd', 'ftp://8.8.8.8/a.jpg', 'http://127.0.0.1/a.jpg',
+                    'http://10.0.0.5/a.jpg', 'http://169.254.169.254/latest', 'http://[::1]/a.jpg'):
+            with self.assertRaises(ValueError, msg=url):
+                validar_url_imagem(url)
+        validar_url_imagem('https://8.8.8.8/a.jpg')
+
+    def test_download_exige_imagem_e_usa_extensao_do_conteudo(self):
+        import tempfile
+        from unittest import mock
+        from PIL import Image
+        from core import importacao
+        png = io.BytesIO()
+        Image.new('RGB', (4, 3)).save(png, format='PNG')
+
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            with mock.patch.object(importacao._abridor, 'open', return_value=RespostaFalsa(b'<html>erro</html>')):
+                with self.assertRaises(ValueError):
+                    importacao.baixar_imagem('https://8.8.8.8/foto.jpg')
+            with mock.patch.object(importacao._abridor, 'open', return_value=RespostaFalsa(png.getvalue())):
+                nome, largura, altura = importacao.baixar_imagem('https://8.8.8.8/pagina.html')
+        self.assertTrue(nome.startswith('carros/pagina.') and nome.endswith('.png'), nome)
+        self.assertEqual((largura, altura), (4, 3))
+
+    def test_upsert_grava_so_as_diferencas(self):
+        from core.importacao import importar_estoque
+        from core.models import Carro, HistoricoCarro
+        relatorio = importar_estoque([self._linha('A1'), self._linha('A2')], baixar_imagens=False)
+        self.assertEqual((relatorio.criados, relatorio.atualizados), (2, 0))
+
+        relatorio = importar_estoque(
+            [self._linha('A1', preco='110.000,00'), self._linha('A2')],
+            baixar_imagens=False,
+        )
+        self.assertEqual((relatorio.criados, relatorio.atualizados, relatorio.inalterados), (0, 1, 1))
+        self.assertEqual(Carro.objects.get(codigo_estoque='A1').preco, 110000)
+        self.assertTrue(HistoricoCarro.objects.filter(tipo='preco', preco_novo=110000).exists())
+
+        relatorio = importar_estoque([self._linha('A1', preco='110.000,00')], marcar_vendidos=True, baixar_imagens=False)
+        self.assertEqual(relatorio.vendidos, 1)
+        self.assertEqual(Carro.objects.get(codigo_estoque='A2').condicao, 'vendido')
+
+        relatorio = importar_estoque([self._linha('A1', preco='99.000,00')], dry_run=True, baixar_imagens=False)
+        self.assertEqual(relatorio.atualizados, 1)
+        self.assertEqual(Carro.objects.get(codigo_estoque='A1').preco, 110000)
+
+    def test_resposta_truncada_nao_interrompe_a_importacao(self):
+        import http.client
+        from unittest import mock
+        from core import importacao
+        linhas = [self._linha('B1', imagens=['https://8.8.8.8/a.jpg']), self._linha('B2')]
+        with mock.patch.object(importacao, 'baixar_imagem', side_effect=http.client.IncompleteRead(b'')):
+            relatorio = importacao.importar_estoque(linhas)
+        self.assertEqual(relatorio.criados, 2)
+        self.assertEqual([codigo for codigo, _ in relatorio.erros], ['B1'])
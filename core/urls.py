@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, rum, views
 
 app_name = 'core'
 
@@ -9,4 +9,18 @@ urlpatterns = [
     path('carro/<int:pk>/', views.detalhe_carro, name='detalhe_carro'),
     path('sobre/', views.sobre, name='sobre'),
     path('buscar/', views.buscar, name='buscar'),
+    path('comparar/', views.comparar, name='comparar'),
+
+    # API de inventário (somente leitura)
+    path('api/carros/', api.api_carros, name='api_carros'),
+    path('api/marcas/', api.api_marcas, name='api_marcas'),
+    path('api/alteracoes/', api.api_alteracoes, name='api_alteracoes'),
+    path('api/autocompletar/', api.api_autocompletar, name='api_autocompletar'),
+
+    # Core Web Vitals enviados pelo navegador
+    path('rum/', rum.coletar_vitais, name='rum'),
+
+    # Métricas internas (staff)
+    path('metricas/pool/', views.metricas_pool, name='metricas_pool'),
+    path('metricas/cache/', views.metricas_cache, name='metricas_cache'),
 ]
@@ -1,13 +1,35 @@
+import gzip
+import hashlib
+
+from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render, get_object_or_404
+from django.core.cache import caches
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, urlencode
+from regional_veiculos.db_pool.base import get_metricas_pools
+
+from .assets import get_contexto_service_worker
+from .busca import buscar_aproximado, cards_em_ordem
+from .cache import get_metricas_stampede, obter_ou_recalcular
+from .forms import FiltroEstoqueForm, aplicar_filtros, opcoes_estoque
+from . import comparacao
 from .models import Carro, Marca, ImagemSite
+from .popularidade import limiar_popular, registrar_visualizacao
+from .recomendacoes import get_relacionados
+from .sitemaps import get_sitemap
 
 
 def home(request):
     """View da página inicial"""
-    carros_destaque = Carro.objects.filter(destaque=True, condicao__in=['novo', 'seminovo'])[:6]
-    marcas = Marca.objects.filter(ativa=True).order_by('ordem', 'nome')
+    disponiveis = Carro.objects.filter(condicao__in=['novo', 'seminovo'])
+    carros_destaque = obter_ou_recalcular(
+        'home:cards_destaque', lambda: list(disponiveis.filter(destaque=True).cards()[:6])
+    )
+    marcas = obter_ou_recalcular(
+        'home:marcas', lambda: list(Marca.objects.filter(ativa=True).order_by('ordem', 'nome'))
+    )
     
     # Buscar imagem do carro flutuante
     carro_flutuante = ImagemSite.objects.filter(
@@ -19,7 +41,7 @@ def home(request):
         'carros_destaque': carros_destaque,
         'marcas': marcas,
         'carro_flutuante': carro_flutuante,
-        'total_carros': Carro.objects.filter(condicao__in=['novo', 'seminovo']).count(),
+        'total_carros': obter_ou_recalcular('home:total', disponiveis.count),
         'anos_experiencia': 15,
         'clientes_satisfeitos': 500,
     }
@@ -27,57 +49,51 @@ def home(request):
 
 
 def estoque(request):
-    """View da página de estoque com paginação"""
-    carros_list = Carro.objects.filter(condicao__in=['novo', 'seminovo']).order_by('-criado_em')
-    
-    # Filtros
-    fabricante = request.GET.get('fabricante')
-    condicao = request.GET.get('condicao')
-    preco_min = request.GET.get('preco_min')
-    preco_max = request.GET.get('preco_max')
-    
-    if fabricante:
-        carros_list = carros_list.filter(fabricante__icontains=fabricante)
+    """View da página de estoque com filtros, ordenação e paginação"""
+    carros_list = Carro.objects.filter(condicao__in=['novo', 'seminovo'])
     
-    if condicao:
-        carros_list = carros_list.filter(condicao=condicao)
+    # Filtros validados (fabricante, combustível e câmbio só aceitam valores existentes)
+    opcoes = obter_ou_recalcular('estoque:opcoes', opcoes_estoque)
+    form = FiltroEstoqueForm(request.GET, opcoes=opcoes)
+    form.is_valid()
+    filtros = form.filtros()
+    # A contagem pode usar o índice de qualquer faixa; a página, o da ordenação
+    filtrados = aplicar_filtros(carros_list, filtros)
+    carros_list = aplicar_filtros(carros_list, filtros, form.ordenacao()).order_by(*form.ordenacao())
     
-    if preco_min:
-        carros_list = carros_list.filter(preco__gte=preco_min)
-    
-    if preco_max:
-        carros_list = carros_list.filter(preco__lte=preco_max)
-    
-    # Paginação - 6 carros por página
-    paginator = Paginator(carros_list, 6)
+    # Paginação - 6 carros por página (total de resultados vem do cache)
+    paginator = Paginator(carros_list.cards(), 6)
+    assinatura = hashlib.md5(repr(sorted(filtros.items())).encode('utf-8')).hexdigest()
+    paginator.count = obter_ou_recalcular(f'estoque:total:{assinatura}', filtrados.count)
     page_number = request.GET.get('page')
     carros = paginator.get_page(page_number)
     
-    # Fabricantes únicos para filtro
-    fabricantes = Carro.objects.values_list('fabricante', flat=True).distinct().order_by('fabricante')
+    # Filtros atuais para os links de paginação
+    parametros = request.GET.copy()
+    parametros.pop('page', None)
     
     context = {
         'carros': carros,
-        'fabricantes': fabricantes,
-        'filtros': {
-            'fabricante': fabricante,
-            'condicao': condicao,
-            'preco_min': preco_min,
-            'preco_max': preco_max,
-        }
+        'form': form,
+        'opcoes': opcoes,
+        'fabricantes': opcoes['fabricante'],
+        # Selo "Mais visto": popularidade gravada, não muda a cada visita
+        'limiar_popular': obter_ou_recalcular('estoque:limiar_popular', limiar_popular, timeout=300),
+        'filtros': {**form.data.dict(), 'ordem': form.ordem_escolhida()},
+        # Link do alerta por e-mail: só os filtros válidos, que são os aplicados à lista
+        'parametros_alerta': urlencode(filtros),
+        'parametros': parametros.urlencode(),
     }
     return render(request, 'core/estoque.html', context)
 
 
 def detalhe_carro(request, pk):
     """View dos detalhes do carro"""
-    carro = get_object_or_404(Carro, pk=pk)
+    carro = get_object_or_404(Carro.objects.prefetch_related('imagens'), pk=pk)
+    registrar_visualizacao(request, carro.pk)
     
-    # Carros relacionados (mesmo fabricante, excluindo o atual)
-    carros_relacionados = Carro.objects.filter(
-        fabricante=carro.fabricante,
-        condicao__in=['novo', 'seminovo']
-    ).exclude(pk=carro.pk)[:3]
+    # Carros relacionados (vizinhos pré-calculados por similaridade)
+    carros_relacionados = get_relacionados(carro)
     
     context = {
         'carro': carro,
@@ -110,25 +126,96 @@ def sobre(request):
 
 
 def buscar(request):
-    """View para busca de carros"""
-    query = request.GET.get('q')
+    """View para busca de carros (tolerante a erros de digitação)"""
+    query = request.GET.get('q', '').strip()
     carros = []
+    sugestao = None
     
     if query:
-        carros = Carro.objects.filter(
-            Q(modelo__icontains=query) |
-            Q(fabricante__icontains=query) |
-            Q(descricao__icontains=query),
-            condicao__in=['novo', 'seminovo']
-        ).order_by('-criado_em')
+        resultado = buscar_aproximado(query)
+        sugestao = resultado.sugestao
         
-        # Paginação
-        paginator = Paginator(carros, 6)
+        # Paginação sobre os ids ranqueados; só a página atual vira card
+        paginator = Paginator(resultado.ids, 6)
         page_number = request.GET.get('page')
         carros = paginator.get_page(page_number)
+        carros.object_list = cards_em_ordem(carros.object_list)
     
     context = {
         'carros': carros,
         'query': query,
+        'sugestao': sugestao,
     }
     return render(request, 'core/buscar.html', context)
+
+
+def comparar(request):
+    """Comparação lado a lado de até 4 carros (?ids=1,2,3)"""
+    try:
+        ids = comparacao.parse_ids(request.GET.getlist('ids'))
+    except ValueError as erro:
+        return render(request, 'core/comparar.html', {'erro': erro, 'max_carros': comparacao.MAX_CARROS}, status=400)
+    
+    carros = comparacao.buscar_carros(ids)
+    context = {
+        'carros': carros,
+        'matriz': comparacao.matriz_html(carros) if carros else '',
+        'max_carros': comparacao.MAX_CARROS,
+    }
+    return render(request, 'core/comparar.html', context)
+
+
+def sitemap_xml(request, nome='sitemap.xml'):
+    """Serve o sitemap pré-computado, comprimido e com GET condicional"""
+    sitemap = get_sitemap(nome)
+    if sitemap is None:
+        raise Http404('Sitemap não encontrado')
+
+    last_modified = sitemap['lastmod'].timestamp() if sitemap['lastmod'] else None
+    response = get_conditional_response(
+        request, etag=sitemap['etag'], last_modified=last_modified
+    )
+    if response is None:
+        if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            response = HttpResponse(sitemap['conteudo'], content_type='application/xml')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(gzip.decompress(sitemap['conteudo']), content_type='application/xml')
+        response.headers['Content-Length'] = str(len(response.content))
+
+    response.headers['ETag'] = sitemap['etag']
+    if last_modified:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def service_worker(request):
+    """Service worker gerado a partir do manifesto de arquivos estáticos"""
+    response = render(
+        request, 'sw.js', get_contexto_service_worker(),
+        content_type='application/javascript',
+    )
+    # O navegador precisa revalidar o SW a cada visita para detectar novos deploys
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Service-Worker-Allowed'] = '/'
+    return response
+
+
+@staff_member_required
+def metricas_pool(request):
+    """Utilização e tempo de espera dos pools de conexão deste processo"""
+    return JsonResponse(get_metricas_pools())
+
+
+@staff_member_required
+def metricas_cache(request):
+    """Taxa de acerto por camada dos caches deste processo"""
+    metricas = {
+        alias: caches[alias].estatisticas()
+        for alias in caches
+        if hasattr(caches[alias], 'estatisticas')
+    }
+    metricas['stampede'] = get_metricas_stampede()
+    return JsonResponse(metricas)
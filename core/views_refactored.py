@@ -5,10 +5,16 @@ Implementa as principais páginas do site seguindo princípios SOLID
 
 from django.shortcuts import render, get_object_or_404
 from django.core.paginator import Paginator
-from django.db.models import Q, QuerySet
-from typing import Dict, Any, Optional
+from django.db.models import QuerySet
+from django.utils.http import urlencode
+from typing import Dict, Any, List, Optional
 
-from .models import Carro, Marca, ImagemSite
+from .busca import ResultadoBusca, buscar_aproximado, cards_em_ordem
+from .cache import cache_protegido
+from .forms import FiltroEstoqueForm, aplicar_filtros, opcoes_estoque
+from .models import Carro, CarroCard, Marca, ImagemSite
+from .popularidade import limiar_popular, registrar_visualizacao
+from .recomendacoes import get_relacionados
 
 
 class CarroService:
@@ -20,50 +26,37 @@ class CarroService:
         return Carro.objects.filter(condicao__in=['novo', 'seminovo'])
     
     @staticmethod
-    def get_carros_destaque(limit: int = 6) -> QuerySet:
+    @cache_protegido('carros:cards_destaque')
+    def get_carros_destaque(limit: int = 6) -> List[CarroCard]:
         """Retorna carros em destaque limitados"""
-        return CarroService.get_carros_disponiveis().filter(destaque=True)[:limit]
+        return list(CarroService.get_carros_disponiveis().filter(destaque=True).cards()[:limit])
     
     @staticmethod
-    def get_fabricantes_disponiveis() -> QuerySet:
+    @cache_protegido('carros:total')
+    def contar_disponiveis() -> int:
+        """Retorna o total de carros disponíveis"""
+        return CarroService.get_carros_disponiveis().count()
+    
+    @staticmethod
+    @cache_protegido('carros:fabricantes')
+    def get_fabricantes_disponiveis() -> List[str]:
         """Retorna lista de fabricantes com carros disponíveis"""
-        return Carro.objects.values_list('fabricante', flat=True).distinct().order_by('fabricante')
+        return list(Carro.objects.values_list('fabricante', flat=True).distinct().order_by('fabricante'))
     
     @staticmethod
-    def aplicar_filtros(queryset: QuerySet, filtros: Dict[str, Any]) -> QuerySet:
-        """Aplica filtros ao queryset de carros"""
-        if filtros.get('fabricante'):
-            queryset = queryset.filter(fabricante__icontains=filtros['fabricante'])
-        
-        if filtros.get('condicao'):
-            queryset = queryset.filter(condicao=filtros['condicao'])
-        
-        if filtros.get('preco_min'):
-            queryset = queryset.filter(preco__gte=filtros['preco_min'])
-        
-        if filtros.get('preco_max'):
-            queryset = queryset.filter(preco__lte=filtros['preco_max'])
-        
-        return queryset
+    def aplicar_filtros(queryset: QuerySet, filtros: Dict[str, Any], ordenacao=None) -> QuerySet:
+        """Aplica filtros já validados (FiltroEstoqueForm.filtros()) ao queryset de carros"""
+        return aplicar_filtros(queryset, filtros, ordenacao)
     
     @staticmethod
-    def buscar_carros(query: str) -> QuerySet:
-        """Busca carros por termo de pesquisa"""
-        if not query:
-            return Carro.objects.none()
-        
-        return CarroService.get_carros_disponiveis().filter(
-            Q(modelo__icontains=query) |
-            Q(fabricante__icontains=query) |
-            Q(descricao__icontains=query)
-        ).order_by('-criado_em')
+    def buscar_carros(query: str) -> ResultadoBusca:
+        """Busca carros por termo de pesquisa, tolerando erros de digitação"""
+        return buscar_aproximado(query)
     
     @staticmethod
     def get_carros_relacionados(carro: Carro, limit: int = 3) -> QuerySet:
-        """Retorna carros relacionados (mesmo fabricante)"""
-        return CarroService.get_carros_disponiveis().filter(
-            fabricante=carro.fabricante
-        ).exclude(pk=carro.pk)[:limit]
+        """Retorna carros relacionados (índice de similaridade pré-calculado)"""
+        return get_relacionados(carro, limit)
 
 
 class ImagemService:
@@ -87,7 +80,7 @@ def home(request):
         'carros_destaque': CarroService.get_carros_destaque(),
         'marcas': Marca.objects.filter(ativa=True).order_by('ordem', 'nome'),
         'carro_flutuante': ImagemService.get_imagem_por_tipo('carro_flutuante'),
-        'total_carros': CarroService.get_carros_disponiveis().count(),
+        'total_carros': CarroService.contar_disponiveis(),
         'anos_experiencia': 15,
         'clientes_satisfeitos': 500,
     }
@@ -96,30 +89,36 @@ def home(request):
 
 def estoque(request):
     """
-    Página de estoque com filtros e paginação
-    Permite filtrar carros por fabricante, condição e preço
+    Página de estoque com filtros, ordenação e paginação
+    Filtra por fabricante, condição, combustível, câmbio e faixas de preço, ano e km
     """
-    # Extrair filtros da requisição
-    filtros = {
-        'fabricante': request.GET.get('fabricante'),
-        'condicao': request.GET.get('condicao'),
-        'preco_min': request.GET.get('preco_min'),
-        'preco_max': request.GET.get('preco_max'),
-    }
+    # Validar filtros da requisição
+    opcoes = opcoes_estoque()
+    form = FiltroEstoqueForm(request.GET, opcoes=opcoes)
+    form.is_valid()
     
     # Aplicar filtros
-    carros_queryset = CarroService.get_carros_disponiveis().order_by('-criado_em')
-    carros_filtrados = CarroService.aplicar_filtros(carros_queryset, filtros)
+    carros_queryset = CarroService.get_carros_disponiveis().order_by(*form.ordenacao())
+    carros_filtrados = CarroService.aplicar_filtros(carros_queryset, form.filtros(), form.ordenacao())
     
-    # Configurar paginação
-    paginator = Paginator(carros_filtrados, 6)
+    # Configurar paginação (a contagem sem a ordenação pode usar o índice de qualquer faixa)
+    paginator = Paginator(carros_filtrados.cards(), 6)
+    paginator.count = CarroService.aplicar_filtros(CarroService.get_carros_disponiveis(), form.filtros()).count()
     page_number = request.GET.get('page')
     carros = paginator.get_page(page_number)
     
+    parametros = request.GET.copy()
+    parametros.pop('page', None)
+    
     context = {
         'carros': carros,
-        'fabricantes': CarroService.get_fabricantes_disponiveis(),
-        'filtros': filtros,
+        'form': form,
+        'opcoes': opcoes,
+        'fabricantes': opcoes['fabricante'],
+        'limiar_popular': limiar_popular(),
+        'filtros': {**form.data.dict(), 'ordem': form.ordem_escolhida()},
+        'parametros_alerta': urlencode(form.filtros()),
+        'parametros': parametros.urlencode(),
     }
     return render(request, 'core/estoque.html', context)
 
@@ -127,9 +126,10 @@ def estoque(request):
 def detalhe_carro(request, pk: int):
     """
     Página de detalhes de um carro específico
-    Inclui carros relacionados do mesmo fabricante
+    Inclui carros relacionados por similaridade
     """
-    carro = get_object_or_404(Carro, pk=pk)
+    carro = get_object_or_404(Carro.objects.prefetch_related('imagens'), pk=pk)
+    registrar_visualizacao(request, carro.pk)
     
     context = {
         'carro': carro,
@@ -155,21 +155,25 @@ def sobre(request):
 def buscar(request):
     """
     Página de resultados de busca
-    Permite pesquisar carros por modelo, fabricante ou descrição
+    Pesquisa por fabricante e modelo com busca aproximada (core.busca)
     """
     query = request.GET.get('q', '').strip()
     carros = Carro.objects.none()
+    sugestao = None
     
     if query:
-        carros_resultado = CarroService.buscar_carros(query)
+        resultado = CarroService.buscar_carros(query)
+        sugestao = resultado.sugestao
         
-        # Configurar paginação para resultados
-        paginator = Paginator(carros_resultado, 6)
+        # Configurar paginação sobre os ids ranqueados
+        paginator = Paginator(resultado.ids, 6)
         page_number = request.GET.get('page')
         carros = paginator.get_page(page_number)
+        carros.object_list = cards_em_ordem(carros.object_list)
     
     context = {
         'carros': carros,
         'query': query,
+        'sugestao': sugestao,
     }
     return render(request, 'core/buscar.html', context)
@@ -0,0 +1,273 @@
+"""
+Cache em duas camadas: LRU em memória do processo na frente do RedisCache
+
+Leituras consultam primeiro o LRU local e só vão ao Redis em caso de falta.
+Toda escrita/remoção é publicada num canal pub/sub do Redis para que os
+demais workers descartem sua cópia local. As entradas locais também expiram
+após LOCAL_TIMEOUT segundos, limitando a defasagem se uma mensagem se perder.
+
+OPTIONS (além das opções do RedisCache):
+    LOCAL_MAX_ENTRIES  entradas no LRU local (padrão 1000)
+    LOCAL_TIMEOUT      validade máxima de uma entrada local em segundos (padrão 5)
+    CHANNEL            canal pub/sub de invalidação
+"""
+
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.redis import RedisCache
+
+logger = logging.getLogger('regional_veiculos.cache')
+
+_AUSENTE = object()
+
+
+class LRULocal:
+    """LRU thread-safe com validade por entrada; guarda os valores serializados"""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._dados.get(key)
+            if item is None:
+                return _AUSENTE
+            valor, expira_em = item
+            if expira_em <= time.monotonic():
+                del self._dados[key]
+                return _AUSENTE
+            self._dados.move_to_end(key)
+        return pickle.loads(valor)
+
+    def set(self, key, valor, timeout=None):
+        validade = self.timeout if timeout is None else min(self.timeout, timeout)
+        if validade <= 0:
+            self.delete(key)
+            return
+        dados = pickle.dumps(valor, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._dados[key] = (dados, time.monotonic() + validade)
+            self._dados.move_to_end(key)
+            while len(self._dados) > self.max_entries:
+                self._dados.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._dados.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self):
+        return len(self._dados)
+
+
+class CacheDuasCamadas(RedisCache):
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        opcoes = dict(self._options)
+        self._options = {
+            chave: valor for chave, valor in opcoes.items()
+            if chave not in ('LOCAL_MAX_ENTRIES', 'LOCAL_TIMEOUT', 'CHANNEL')
+        }
+        self.local = LRULocal(
+            opcoes.get('LOCAL_MAX_ENTRIES', 1000),
+            opcoes.get('LOCAL_TIMEOUT', 5),
+        )
+        self.canal = opcoes.get('CHANNEL', f'{self.key_prefix or "cache"}:invalidacao')
+        self._origem = uuid.uuid4().hex
+        self._assinante_pid = None
+        self._assinante_lock = threading.Lock()
+        self._contadores_lock = threading.Lock()
+        self.contadores = {'local_hits': 0, 'local_misses': 0, 'redis_hits': 0, 'redis_misses': 0}
+
+    # Pub/sub ---------------------------------------------------------------
+
+    def _garantir_assinante(self):
+        """Inicia a thread de invalidação (uma por processo, também após fork)"""
+        if self._assinante_pid == os.getpid():
+            return
+        with self._assinante_lock:
+            if self._assinante_pid == os.getpid():
+                return
+            # Após um fork o LRU herdado pode estar desatualizado
+            self.local.clear()
+            self._origem = uuid.uuid4().hex
+            self._assinante_pid = os.getpid()
+            thread = threading.Thread(target=self._escutar, name='cache-invalidacao', daemon=True)
+            thread.start()
+
+    def _escutar(self):
+        espera = 1
+        while True:
+            try:
+                pubsub = self._cache.get_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.canal)
+                espera = 1
+                for mensagem in pubsub.listen():
+                    self._processar_mensagem(mensagem.get('data'))
+            except Exception:
+                logger.warning('Assinatura de invalidação do cache interrompida', exc_info=True)
+            # Mensagens podem ter sido perdidas enquanto desconectado
+            self.local.clear()
+            time.sleep(espera)
+            espera = min(espera * 2, 30)
+
+    def _processar_mensagem(self, dados):
+        try:
+            mensagem = json.loads(dados)
+        except (TypeError, ValueError):
+            return
+        if mensagem.get('origem') == self._origem:
+            return
+        if mensagem.get('limpar'):
+            self.local.clear()
+        for key in mensagem.get('chaves', []):
+            self.local.delete(key)
+
+    def _publicar(self, chaves=(), limpar=False):
+        try:
+            self._cache.get_client(write=True).publish(
+                self.canal,
+                json.dumps({'origem': self._origem, 'chaves': list(chaves), 'limpar': limpar}),
+            )
+        except Exception:
+            logger.warning('Falha ao publicar invalidação do cache', exc_info=True)
+
+    def _invalidar(self, chaves):
+        for key in chaves:
+            self.local.delete(key)
+        self._publicar(chaves)
+
+    def _contar(self, nome, quantidade=1):
+        with self._contadores_lock:
+            self.contadores[nome] += quantidade
+
+    # Leitura ---------------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        self._garantir_assinante()
+        key = self.make_and_validate_key(key, version=version)
+        valor = self.local.get(key)
+        if valor is not _AUSENTE:
+            self._contar('local_hits')
+            return valor
+        self._contar('local_misses')
+        valor = self._cache.get(key, _AUSENTE)
+        if valor is _AUSENTE:
+            self._contar('redis_misses')
+            return default
+        self._contar('redis_hits')
+        self.local.set(key, valor)
+        return valor
+
+    def get_many(self, keys, version=None):
+        self._garantir_assinante()
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        resultado = {}
+        faltando = []
+        for key, original in key_map.items():
+            valor = self.local.get(key)
+            if valor is _AUSENTE:
+                faltando.append(key)
+            else:
+                resultado[original] = valor
+        self._contar('local_hits', len(resultado))
+        self._contar('local_misses', len(faltando))
+        if faltando:
+            encontrados = self._cache.get_many(faltando)
+            self._contar('redis_hits', len(encontrados))
+            self._contar('redis_misses', len(faltando) - len(encontrados))
+            for key, valor in encontrados.items():
+                self.local.set(key, valor)
+                resultado[key_map[key]] = valor
+        return resultado
+
+    def has_key(self, key, version=None):
+        self._garantir_assinante()
+        if self.local.get(self.make_and_validate_key(key, version=version)) is not _AUSENTE:
+            return True
+        return super().has_key(key, version=version)
+
+    # Escrita ---------------------------------------------------------------
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._garantir_assinante()
+        super().set(key, value, timeout, version)
+        key = self.make_and_validate_key(key, version=version)
+        self._publicar([key])
+        self.local.set(key, value, self.get_backend_timeout(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._garantir_assinante()
+        adicionado = super().add(key, value, timeout, version)
+        if adicionado:
+            self._invalidar([self.make_and_validate_key(key, version=version)])
+        return adicionado
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._garantir_assinante()
+        resultado = super().touch(key, timeout, version)
+        self._invalidar([self.make_and_validate_key(key, version=version)])
+        return resultado
+
+    def delete(self, key, version=None):
+        self._garantir_assinante()
+        resultado = super().delete(key, version)
+        self._invalidar([self.make_and_validate_key(key, version=version)])
+        return resultado
+
+    def incr(self, key, delta=1, version=None):
+        self._garantir_assinante()
+        valor = super().incr(key, delta, version)
+        self._invalidar([self.make_and_validate_key(key, version=version)])
+        return valor
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._garantir_assinante()
+        resultado = super().set_many(data, timeout, version)
+        self._invalidar([self.make_and_validate_key(key, version=version) for key in data])
+        return resultado
+
+    def delete_many(self, keys, version=None):
+        self._garantir_assinante()
+        keys = list(keys)
+        super().delete_many(keys, version)
+        self._invalidar([self.make_and_validate_key(key, version=version) for key in keys])
+
+    def clear(self):
+        self._garantir_assinante()
+        resultado = super().clear()
+        self.local.clear()
+        self._publicar(limpar=True)
+        return resultado
+
+    # Métricas --------------------------------------------------------------
+
+    def estatisticas(self):
+        """Contadores e taxa de acerto de cada camada neste processo"""
+        with self._contadores_lock:
+            contadores = dict(self.contadores)
+        local_total = contadores['local_hits'] + contadores['local_misses']
+        redis_total = contadores['redis_hits'] + contadores['redis_misses']
+        return {
+            **contadores,
+            'local_entradas': len(self.local),
+            'local_hit_ratio': contadores['local_hits'] / local_total if local_total else 0.0,
+            'redis_hit_ratio': contadores['redis_hits'] / redis_total if redis_total else 0.0,
+            'hit_ratio_total': (
+                (contadores['local_hits'] + contadores['redis_hits']) / local_total if local_total else 0.0
+            ),
+        }
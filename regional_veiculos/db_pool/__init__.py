@@ -0,0 +1,4 @@
+"""
+Backend PostgreSQL com pool de conexões
+Uso: DATABASES['default']['ENGINE'] = 'regional_veiculos.db_pool'
+"""
@@ -0,0 +1,66 @@
+import threading
+
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from .pool import PoolDeConexoes
+
+# Um pool por alias e parâmetros de conexão, compartilhado pelas threads do processo
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _assinatura(alias, conn_params):
+    return (alias, tuple(sorted((chave, repr(valor)) for chave, valor in conn_params.items())))
+
+
+def get_metricas_pools():
+    """Métricas de todos os pools deste processo"""
+    return {alias: pool.metricas() for (alias, _), pool in list(_pools.items())}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Backend PostgreSQL que retira conexões de um pool em vez de abrir uma por requisição
+    Configuração em DATABASES[alias]['POOL']: MIN_SIZE, MAX_SIZE, TIMEOUT,
+    MAX_LIFETIME e HEALTH_CHECK_INTERVAL (segundos). Use com CONN_MAX_AGE = 0:
+    o fechamento ao fim da requisição devolve a conexão ao pool.
+    """
+
+    def _get_pool(self, conn_params):
+        chave = _assinatura(self.alias, conn_params)
+        pool = _pools.get(chave)
+        if pool is None:
+            with _pools_lock:
+                pool = _pools.get(chave)
+                if pool is None:
+                    # Parâmetros mudaram (override de DATABASES, troca de senha): o pool
+                    # antigo do alias não recebe mais checkouts e fecha o que voltar
+                    for antiga in [c for c in _pools if c[0] == self.alias]:
+                        _pools.pop(antiga).aposentar()
+                    config = self.settings_dict.get('POOL', {})
+                    pool = _pools[chave] = PoolDeConexoes(
+                        lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+                        min_size=config.get('MIN_SIZE', 1),
+                        max_size=config.get('MAX_SIZE', 10),
+                        timeout=config.get('TIMEOUT', 5.0),
+                        max_lifetime=config.get('MAX_LIFETIME', 600),
+                        health_check_interval=config.get('HEALTH_CHECK_INTERVAL', 30),
+                    )
+        return pool
+
+    def get_new_connection(self, conn_params):
+        self._pool = self._get_pool(conn_params)
+        conexao = self._pool.obter()
+        # Conexões reaproveitadas não passam pelo get_new_connection original
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED)
+        )
+        return conexao
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # Devolve ao pool de onde a conexão saiu, mesmo que já aposentado;
+                # o pool desfaz a transação e roda DISCARD ALL antes do próximo checkout
+                return self._pool.devolver(self.connection)
@@ -0,0 +1,213 @@
+"""
+Pool de conexões thread-safe com tamanho mínimo/máximo, tempo de espera
+limitado, verificação de saúde e métricas de utilização
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+import psycopg2
+
+logger = logging.getLogger('regional_veiculos.db_pool')
+
+
+class PoolEsgotado(psycopg2.OperationalError):
+    """Nenhuma conexão livre dentro do tempo de espera configurado"""
+
+
+class PoolDeConexoes:
+    def __init__(self, criar_conexao, min_size=1, max_size=10, timeout=5.0,
+                 max_lifetime=600, health_check_interval=30):
+        if not 0 <= min_size <= max_size:
+            raise ValueError('É preciso 0 <= MIN_SIZE <= MAX_SIZE')
+        self.criar_conexao = criar_conexao
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        self._ociosas = deque()  # (conexao, criada_em, ultimo_uso)
+        self._em_uso = {}  # id(conexao) -> criada_em
+        self._total = 0
+        self._preenchido = False
+        self._aposentado = False
+
+        # Métricas
+        self.checkouts = 0
+        self.esperas = 0
+        self.timeouts = 0
+        self.descartadas = 0
+        self.tempo_espera_total = 0.0
+        self.tempo_espera_max = 0.0
+
+    def _preencher(self):
+        """Abre as MIN_SIZE conexões iniciais no primeiro uso"""
+        # As vagas são reservadas sob o lock, então checkouts concorrentes
+        # (ou outra thread preenchendo) não passam de MAX_SIZE
+        with self._cond:
+            if self._preenchido:
+                return
+            self._preenchido = True
+            reservadas = max(0, self.min_size - self._total)
+            self._total += reservadas
+        agora = time.monotonic()
+        for abertas in range(reservadas):
+            try:
+                conexao = self.criar_conexao()
+            except psycopg2.Error:
+                logger.warning('Falha ao pré-abrir conexão do pool', exc_info=True)
+                with self._cond:
+                    self._total -= reservadas - abertas
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._ociosas.append((conexao, agora, agora))
+                self._cond.notify()
+
+    def _reservar(self, limite):
+        """Retorna uma conexão ociosa ou None (vaga para abrir nova); espera até `limite`"""
+        inicio = time.monotonic()
+        esperou = False
+        with self._cond:
+            while True:
+                if self._ociosas:
+                    item = self._ociosas.pop()
+                    break
+                if self._total < self.max_size:
+                    self._total += 1
+                    item = None
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self.timeouts += 1
+                    raise PoolEsgotado(
+                        f'Pool esgotado: nenhuma das {self.max_size} conexões liberada em {self.timeout}s'
+                    )
+                esperou = True
+                self._cond.wait(restante)
+
+            espera = time.monotonic() - inicio
+            self.checkouts += 1
+            if esperou:
+                self.esperas += 1
+                self.tempo_espera_total += espera
+                self.tempo_espera_max = max(self.tempo_espera_max, espera)
+        return item
+
+    def _saudavel(self, conexao, criada_em, ultimo_uso):
+        agora = time.monotonic()
+        if conexao.closed or agora - criada_em > self.max_lifetime:
+            return False
+        if self.health_check_interval is not None and agora - ultimo_uso > self.health_check_interval:
+            try:
+                with conexao.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                conexao.rollback()
+            except psycopg2.Error:
+                return False
+        return True
+
+    def _descartar(self, conexao):
+        self.descartadas += 1
+        try:
+            conexao.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+    def obter(self):
+        """Retira uma conexão do pool (abre uma nova se houver vaga)"""
+        if not self._preenchido:
+            self._preencher()
+        limite = time.monotonic() + self.timeout
+        while True:
+            item = self._reservar(limite)
+            if item is None:
+                try:
+                    conexao = self.criar_conexao()
+                except BaseException:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+                criada_em = time.monotonic()
+                break
+            conexao, criada_em, ultimo_uso = item
+            if self._saudavel(conexao, criada_em, ultimo_uso):
+                break
+            self._descartar(conexao)
+
+        with self._cond:
+            self._em_uso[id(conexao)] = criada_em
+        return conexao
+
+    def _reiniciar_sessao(self, conexao):
+        """Desfaz a transação pendente e o estado da sessão (SET, temporárias, prepared, LISTEN)"""
+        if conexao.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conexao.rollback()
+        # DISCARD ALL não roda dentro de um bloco de transação
+        autocommit = conexao.autocommit
+        conexao.autocommit = True
+        try:
+            with conexao.cursor() as cursor:
+                cursor.execute('DISCARD ALL')
+        finally:
+            conexao.autocommit = autocommit
+
+    def devolver(self, conexao):
+        """Devolve a conexão ao pool com a sessão limpa, como se fosse nova"""
+        with self._cond:
+            criada_em = self._em_uso.pop(id(conexao), None)
+        if criada_em is None:
+            conexao.close()
+            return
+        if not conexao.closed:
+            try:
+                self._reiniciar_sessao(conexao)
+            except psycopg2.Error:
+                # Sessão em estado desconhecido não volta para o próximo checkout
+                self._descartar(conexao)
+                return
+        if self._aposentado or conexao.closed or time.monotonic() - criada_em > self.max_lifetime:
+            self._descartar(conexao)
+            return
+        with self._cond:
+            self._ociosas.append((conexao, criada_em, time.monotonic()))
+            self._cond.notify()
+
+    def fechar(self):
+        """Fecha as conexões ociosas"""
+        with self._cond:
+            ociosas, self._ociosas = list(self._ociosas), deque()
+            self._total -= len(ociosas)
+        for conexao, _, _ in ociosas:
+            conexao.close()
+
+    def aposentar(self):
+        """Pool substituído: fecha as ociosas e as que ainda estão em uso ao voltarem"""
+        self._aposentado = True
+        self.fechar()
+
+    def metricas(self):
+        with self._cond:
+            em_uso = len(self._em_uso)
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'abertas': self._total,
+                'em_uso': em_uso,
+                'ociosas': len(self._ociosas),
+                'utilizacao': em_uso / self.max_size if self.max_size else 0.0,
+                'checkouts': self.checkouts,
+                'esperas': self.esperas,
+                'timeouts': self.timeouts,
+                'descartadas': self.descartadas,
+                'tempo_espera_medio': self.tempo_espera_total / self.esperas if self.esperas else 0.0,
+                'tempo_espera_max': self.tempo_espera_max,
+            }
@@ -0,0 +1,72 @@
+"""
+Roteamento de banco de dados com réplicas de leitura
+Leituras das views do catálogo vão para as réplicas (escolha ponderada,
+ignorando réplicas indisponíveis); escritas, admin e demais views usam o primário
+"""
+
+import contextvars
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+# Ativado pelo ReplicaMiddleware apenas durante views do catálogo
+usar_replica = contextvars.ContextVar('usar_replica', default=False)
+
+# alias -> instante até o qual a réplica é considerada indisponível
+_indisponivel_ate = {}
+# alias -> instante da última verificação bem-sucedida
+_verificada_em = {}
+
+
+def get_replicas():
+    """{alias: peso} das réplicas configuradas em DATABASE_REPLICAS"""
+    return getattr(settings, 'DATABASE_REPLICAS', {})
+
+
+def _replica_saudavel(alias):
+    agora = time.monotonic()
+    if _indisponivel_ate.get(alias, 0) > agora:
+        return False
+    intervalo = getattr(settings, 'REPLICA_HEALTH_CHECK_INTERVAL', 30)
+    if agora - _verificada_em.get(alias, 0) < intervalo:
+        return True
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        _indisponivel_ate[alias] = agora + getattr(settings, 'REPLICA_RETRY_AFTER', 30)
+        return False
+    _verificada_em[alias] = agora
+    return True
+
+
+def escolher_replica():
+    """Sorteia uma réplica saudável pelo peso; sem nenhuma, usa o primário"""
+    replicas = [(alias, peso) for alias, peso in get_replicas().items() if peso > 0]
+    while replicas:
+        alias = random.choices([a for a, _ in replicas], weights=[p for _, p in replicas])[0]
+        if _replica_saudavel(alias):
+            return alias
+        replicas = [(a, p) for a, p in replicas if a != alias]
+    return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if usar_replica.get():
+            return escolher_replica()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas têm os mesmos dados do primário
+        bancos = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -55,7 +55,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.SessaoAdminMiddleware',  # Sessão apenas para o admin
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -138,6 +138,18 @@ STATICFILES_DIRS = [
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Uploads com hash do conteúdo no nome, servidos com cache imutável
+DEFAULT_FILE_STORAGE = 'core.storage.HashedMediaStorage'
+# Com nginx na frente: prefixo do location `internal` que aponta para MEDIA_ROOT
+MEDIA_ACCEL_REDIRECT_PREFIX = config('MEDIA_ACCEL_REDIRECT_PREFIX', default='')
+# Com Apache (mod_xsendfile) na frente
+MEDIA_X_SENDFILE = config('MEDIA_X_SENDFILE', default=False, cast=bool)
+
+# Domínio público usado em URLs absolutas geradas fora de requisições (sitemap)
+SITE_DOMAIN = config('DOMAIN_NAME', default='regionalveiculos.com.br')
+
+# Mensagens flash em cookie assinado, sem depender de sessão
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
 
 # Crispy Forms
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
@@ -156,7 +168,7 @@ EMAIL_HOST_PASSWORD = 'sua_senha_aqui'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Production Settings
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+STATICFILES_STORAGE = 'core.storage.BundledStaticFilesStorage'
 
 # Media files
 MEDIA_URL = '/media/'
@@ -54,14 +54,19 @@ CSRF_COOKIE_SECURE = True
 
 # Static files para produção
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+STATICFILES_STORAGE = 'core.storage.BundledStaticFilesStorage'
 
 # Configurações de cache
 CACHES = {
     'default': {
+        'BACKEND': 'regional_veiculos.cache_backend.CacheDuasCamadas',
+        'LOCATION': config('REDIS_URL', default='redis://127.0.0.1:6379/1'),
+    },
+    # Contadores de visualização: Redis direto, sem a invalidação por pub/sub a cada incr
+    'contadores': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
         'LOCATION': config('REDIS_URL', default='redis://127.0.0.1:6379/1'),
-    }
+    },
 }
 
 # Compressão e otimização
@@ -77,13 +77,14 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Static files serving
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.SessaoAdminMiddleware',  # Sessão apenas para o admin
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.locale.LocaleMiddleware',
+    'core.middleware.ReplicaMiddleware',  # Leituras do catálogo nas réplicas
 ]
 
 ROOT_URLCONF = 'regional_veiculos.urls'
@@ -113,7 +114,8 @@ WSGI_APPLICATION = 'regional_veiculos.wsgi.application'
 # Database Configuration
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # PostgreSQL com pool de conexões (regional_veiculos/db_pool)
+        'ENGINE': 'regional_veiculos.db_pool',
         'NAME': get_environment_variable('DB_NAME', 'regional_veiculos_prod'),
         'USER': get_environment_variable('DB_USER', 'postgres'),
         'PASSWORD': get_environment_variable('DB_PASSWORD'),
@@ -123,8 +125,15 @@ DATABASES = {
             'connect_timeout': 20,
             'options': '-c default_transaction_isolation=serializable'
         },
-        'CONN_MAX_AGE': 600,
-        'CONN_HEALTH_CHECKS': True,
+        # O pool mantém as conexões abertas; fechar ao fim da requisição devolve ao pool
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MIN_SIZE': int(get_environment_variable('DB_POOL_MIN_SIZE', '2')),
+            'MAX_SIZE': int(get_environment_variable('DB_POOL_MAX_SIZE', '20')),
+            'TIMEOUT': float(get_environment_variable('DB_POOL_TIMEOUT', '5')),  # espera máxima por conexão (s)
+            'MAX_LIFETIME': 1800,  # recicla conexões após 30 min
+            'HEALTH_CHECK_INTERVAL': 30,  # SELECT 1 em conexões ociosas há mais de 30 s
+        },
     }
 }
 
@@ -135,17 +144,46 @@ if DEBUG and get_environment_variable('USE_SQLITE', 'False').lower() == 'true':
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 
+# Read replicas: DB_REPLICA_HOSTS="host1:2,host2:1" (host:peso)
+# Catalog views read from the replicas; writes, admin and everything else use default
+DATABASE_REPLICAS = {}
+replica_hosts = get_environment_variable('DB_REPLICA_HOSTS', '')
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    replica_hosts = ''
+for indice, replica in enumerate(filter(None, replica_hosts.split(','))):
+    host, _, peso = replica.partition(':')
+    alias = f'replica{indice + 1}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS[alias] = int(peso or 1)
+
+DATABASE_ROUTERS = ['regional_veiculos.db_router.ReplicaRouter']
+REPLICA_PIN_SECONDS = 10  # read-your-writes: primary-only window after a POST
+REPLICA_HEALTH_CHECK_INTERVAL = 30
+REPLICA_RETRY_AFTER = 30
+
 # Cache Configuration
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        # Per-process LRU in front of Redis; writes are broadcast over pub/sub
+        'BACKEND': 'regional_veiculos.cache_backend.CacheDuasCamadas',
         'LOCATION': get_environment_variable('REDIS_URL', 'redis://127.0.0.1:6379/1'),
         'KEY_PREFIX': 'regional_veiculos',
         'TIMEOUT': 300,
         'OPTIONS': {
-            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'LOCAL_MAX_ENTRIES': int(get_environment_variable('CACHE_LOCAL_MAX_ENTRIES', '1000')),
+            'LOCAL_TIMEOUT': int(get_environment_variable('CACHE_LOCAL_TIMEOUT', '5')),
         }
-    }
+    },
+    'contadores': {
+        # Plain Redis for per-visit counters: incr would broadcast an invalidation on every hit
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': get_environment_variable('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        'KEY_PREFIX': 'regional_veiculos',
+    },
 }
 
 # Fallback to database cache for development
@@ -154,6 +192,7 @@ if DEBUG and get_environment_variable('USE_DB_CACHE', 'False').lower() == 'true'
         'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
         'LOCATION': 'cache_table',
     }
+    CACHES.pop('contadores')
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -186,11 +225,16 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+STATICFILES_STORAGE = 'core.storage.BundledStaticFilesStorage'
 
 # Media files configuration
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Content-hashed upload names, served with immutable caching
+DEFAULT_FILE_STORAGE = 'core.storage.HashedMediaStorage'
+# Hand media transfers to the front proxy (nginx internal location prefix / Apache mod_xsendfile)
+MEDIA_ACCEL_REDIRECT_PREFIX = get_environment_variable('MEDIA_ACCEL_REDIRECT_PREFIX', '')
+MEDIA_X_SENDFILE = get_environment_variable('MEDIA_X_SENDFILE', 'False').lower() == 'true'
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -319,17 +363,6 @@ FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 1000
 
-# Performance Settings
-if not DEBUG:
-    # Database connection pooling
-    DATABASES['default']['OPTIONS'].update({
-        'MAX_CONNS': 20,
-        'OPTIONS': {
-            'MAX_CONNS': 20,
-            'charset': 'utf8mb4',
-        }
-    })
-
 # Custom Settings for Regional Veículos
 SITE_NAME = 'Regional Veículos'
 SITE_DESCRIPTION = 'Carros seminovos com qualidade e garantia'
@@ -337,6 +370,7 @@ COMPANY_NAME = 'Regional Veículos Ltda'
 COMPANY_EMAIL = 'contato@regionalveiculos.com.br'
 COMPANY_PHONE = '(11) 1234-5678'
 COMPANY_ADDRESS = 'São Paulo, SP'
+SITE_DOMAIN = get_environment_variable('DOMAIN_NAME', 'regionalveiculos.com.br')
 
 # Pagination
 PAGINATE_BY = 12
@@ -385,9 +419,13 @@ MESSAGE_TAGS = {
 }
 
 # Session Configuration
-SESSION_SAVE_EVERY_REQUEST = True
+# Sessões só são gravadas quando modificadas (admin); o catálogo roda sem sessão
+SESSION_SAVE_EVERY_REQUEST = False
 SESSION_COOKIE_NAME = 'regional_veiculos_sessionid'
 
+# Mensagens flash em cookie assinado (criado apenas após POST de formulários)
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
 # CSRF Configuration
 CSRF_COOKIE_NAME = 'regional_veiculos_csrftoken'
 
@@ -14,13 +14,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from django.contrib.sitemaps.views import sitemap
 from django.views.generic import TemplateView
-from core.sitemaps import sitemaps
+from core.media import servir_media
+from core.views import service_worker, sitemap_xml
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -28,14 +30,18 @@ urlpatterns = [
     path('', include('contato.urls')),
     
     # SEO URLs
-    path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
+    path('sitemap.xml', sitemap_xml, name='sitemap'),
+    re_path(r'^(?P<nome>sitemap-[a-z]+-\d+\.xml)$', sitemap_xml, name='sitemap_secao'),
+    path('sw.js', service_worker, name='service_worker'),
     path('robots.txt', TemplateView.as_view(template_name='robots.txt', content_type='text/plain')),
     
     # Google Verification Files
     path('google-site-verification/', TemplateView.as_view(template_name='google-site-verification.html')),
+    
+    # Media (fotos dos carros): delegada ao proxy quando configurado
+    re_path(r'^%s(?P<caminho>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), servir_media, name='media'),
 ]
 
-# Servir arquivos de media em desenvolvimento
+# Servir arquivos estáticos em desenvolvimento
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -107,7 +107,7 @@
     // Cache Service Worker
     function setupServiceWorker() {
         if ('serviceWorker' in navigator) {
-            navigator.serviceWorker.register('/static/js/sw.js')
+            navigator.serviceWorker.register('/sw.js')
                 .then(registration => {
                     console.log('[SW] Registrado com sucesso:', registration);
                 })
@@ -117,12 +117,31 @@
         }
     }
     
+    // Core Web Vitals enviados para /rum/ (consolidados no servidor em p75 por página)
+    const rumAmostras = [];
+    
+    function registrarVital(metrica, valor) {
+        rumAmostras.push({ m: metrica, v: valor });
+    }
+    
+    function enviarVitais() {
+        const rota = document.body.dataset.rota;
+        if (!rota || !rumAmostras.length || !navigator.sendBeacon) {
+            return;
+        }
+        const corpo = JSON.stringify({ rota: rota, amostras: rumAmostras.splice(0, 20) });
+        navigator.sendBeacon('/rum/', corpo);
+    }
+    
     // Métricas Core Web Vitals
     function measureCoreWebVitals() {
+        let lcpValue = 0;
+        
         // Largest Contentful Paint (LCP)
         new PerformanceObserver(entryList => {
             const entries = entryList.getEntries();
             const lastEntry = entries[entries.length - 1];
+            lcpValue = lastEntry.startTime;
             
             // Enviar para Analytics
             gtag('event', 'web_vitals', {
@@ -130,7 +149,7 @@
                 metric_value: Math.round(lastEntry.startTime),
                 metric_rating: lastEntry.startTime < 2500 ? 'good' : lastEntry.startTime < 4000 ? 'needs-improvement' : 'poor'
             });
-        }).observe({ entryTypes: ['largest-contentful-paint'] });
+        }).observe({ type: 'largest-contentful-paint', buffered: true });
         
         // First Input Delay (FID)
         new PerformanceObserver(entryList => {
@@ -141,7 +160,27 @@
                 metric_value: Math.round(firstInput.processingStart - firstInput.startTime),
                 metric_rating: firstInput.processingStart - firstInput.startTime < 100 ? 'good' : firstInput.processingStart - firstInput.startTime < 300 ? 'needs-improvement' : 'poor'
             });
-        }).observe({ entryTypes: ['first-input'] });
+        }).observe({ type: 'first-input', buffered: true });
+        
+        // Interaction to Next Paint (INP): a interação mais lenta da página
+        let inpValue = 0;
+        try {
+            new PerformanceObserver(entryList => {
+                for (const entry of entryList.getEntries()) {
+                    if (entry.interactionId && entry.duration > inpValue) {
+                        inpValue = entry.duration;
+                    }
+                }
+            }).observe({ type: 'event', durationThreshold: 40, buffered: true });
+        } catch (e) {
+            // Navegador sem Event Timing API
+        }
+        
+        // Time to First Byte (TTFB)
+        const navegacao = performance.getEntriesByType('navigation')[0];
+        if (navegacao) {
+            registrarVital('TTFB', Math.round(navegacao.responseStart));
+        }
         
         // Cumulative Layout Shift (CLS)
         let clsValue = 0;
@@ -161,19 +200,40 @@
                         clsEntries.push(entry);
                     }
                     
-                    clsValue = clsEntries.reduce((sum, entry) => sum + entry.value, 0);
+                    clsValue = Math.max(clsValue, clsEntries.reduce((sum, entry) => sum + entry.value, 0));
                 }
             }
-        }).observe({ entryTypes: ['layout-shift'] });
+        }).observe({ type: 'layout-shift', buffered: true });
         
-        // Enviar CLS no final da sessão
-        window.addEventListener('beforeunload', () => {
+        // Enviar os valores finais quando a página sai de foco (pagehide cobre o bfcache)
+        let vitaisEnviados = false;
+        function finalizarVitais() {
+            if (vitaisEnviados) {
+                return;
+            }
+            vitaisEnviados = true;
+            if (lcpValue) {
+                registrarVital('LCP', Math.round(lcpValue));
+            }
+            registrarVital('CLS', Math.round(clsValue * 10000) / 10000);
+            if (inpValue) {
+                registrarVital('INP', Math.round(inpValue));
+            }
+            enviarVitais();
+            
             gtag('event', 'web_vitals', {
                 metric_name: 'CLS',
                 metric_value: Math.round(clsValue * 1000),
                 metric_rating: clsValue < 0.1 ? 'good' : clsValue < 0.25 ? 'needs-improvement' : 'poor'
             });
+        }
+        
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'hidden') {
+                finalizarVitais();
+            }
         });
+        window.addEventListener('pagehide', finalizarVitais);
     }
     
     // Defer de scripts não críticos
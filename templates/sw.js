@@ -1,23 +1,21 @@
 // Service Worker - Cache Strategy
 // Regional Veículos - Cache e Performance
+// Gerado a partir do manifesto de arquivos estáticos (core.views.service_worker)
 
-const CACHE_NAME = 'regional-veiculos-v1.0.0';
-const urlsToCache = [
-    '/',
-    '/estoque/',
-    '/contato/',
-    '/financiamento/',
-    '/sobre/',
-    '/static/css/style.css',
-    '/static/js/main.js',
-    '/static/js/analytics.js',
-    '/static/js/performance.js',
-    '/static/images/imagemcarr.jpg',
-    '/static/images/logo-regional-veiculos.png',
-    'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
-    'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
-    'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css'
-];
+const CACHE_VERSION = '{{ versao }}';
+const CACHE_NAME = `regional-veiculos-${CACHE_VERSION}`;
+const PAGES_CACHE = `regional-veiculos-paginas-${CACHE_VERSION}`;
+const IMAGES_CACHE = `regional-veiculos-imagens-${CACHE_VERSION}`;
+
+// URLs com hash do manifesto (sempre existentes no deploy atual)
+const urlsToCache = {{ precache_urls|safe }};
+
+// Limite de entradas dos caches em tempo de execução
+const MAX_PAGES = {{ max_paginas }};
+const MAX_IMAGES = {{ max_imagens }};
+
+// Páginas servidas com stale-while-revalidate (estoque e detalhe do carro)
+const SWR_PATHS = [/^\/estoque\/$/, /^\/carro\/\d+\/$/];
 
 // Install event
 self.addEventListener('install', event => {
@@ -27,13 +25,49 @@ self.addEventListener('install', event => {
                 console.log('[SW] Cache opened');
                 return cache.addAll(urlsToCache);
             })
+            .then(() => self.skipWaiting())
     );
 });
 
-// Fetch event - Network First for HTML, Cache First for assets
+// Remove as entradas mais antigas (ordem de inserção) acima do limite
+function trimCache(cacheName, maxEntries) {
+    return caches.open(cacheName).then(cache =>
+        cache.keys().then(keys => {
+            const excess = keys.length - maxEntries;
+            if (excess <= 0) return;
+            return Promise.all(keys.slice(0, excess).map(key => cache.delete(key)));
+        })
+    );
+}
+
+// Guarda a resposta e aplica o limite do cache
+function putAndTrim(cacheName, maxEntries, request, response) {
+    return caches.open(cacheName)
+        .then(cache => cache.put(request, response))
+        .then(() => trimCache(cacheName, maxEntries));
+}
+
+// Stale-while-revalidate: responde do cache e atualiza em segundo plano
+function staleWhileRevalidate(event) {
+    const { request } = event;
+    const revalidate = fetch(request).then(response => {
+        if (response && response.status === 200) {
+            event.waitUntil(putAndTrim(PAGES_CACHE, MAX_PAGES, request, response.clone()));
+        }
+        return response;
+    });
+    event.waitUntil(revalidate.catch(() => undefined));
+
+    return caches.open(PAGES_CACHE)
+        .then(cache => cache.match(request))
+        .then(cached => cached || revalidate);
+}
+
+// Fetch event - SWR for catalog pages, Network First for HTML, Cache First for assets
 self.addEventListener('fetch', event => {
     const { request } = event;
     const url = new URL(request.url);
+    const accept = request.headers.get('accept') || '';
     
     // Skip non-GET requests
     if (request.method !== 'GET') return;
@@ -47,26 +81,23 @@ self.addEventListener('fetch', event => {
         return;
     }
     
-    // HTML - Network First strategy
-    if (request.headers.get('accept').includes('text/html')) {
+    if (accept.includes('text/html')) {
+        // Estoque e detalhe - Stale While Revalidate
+        if (url.origin === location.origin && SWR_PATHS.some(path => path.test(url.pathname))) {
+            event.respondWith(staleWhileRevalidate(event));
+            return;
+        }
+
+        // Demais páginas - Network First strategy
         event.respondWith(
             fetch(request)
                 .then(response => {
-                    // Clone the response
-                    const responseClone = response.clone();
-                    
-                    // Cache the new version
-                    caches.open(CACHE_NAME)
-                        .then(cache => {
-                            cache.put(request, responseClone);
-                        });
-                    
+                    if (response && response.status === 200) {
+                        event.waitUntil(putAndTrim(PAGES_CACHE, MAX_PAGES, request, response.clone()));
+                    }
                     return response;
                 })
-                .catch(() => {
-                    // Fallback to cache
-                    return caches.match(request);
-                })
+                .catch(() => caches.match(request))
         );
     }
     // Static assets - Cache First strategy
@@ -84,26 +115,23 @@ self.addEventListener('fetch', event => {
                     // Fetch from network and cache
                     return fetch(request)
                         .then(response => {
-                            // Don't cache if not ok
-                            if (!response || response.status !== 200 || response.type !== 'basic') {
+                            // Don't cache if not ok (opaque CDN responses included)
+                            if (!response || response.status !== 200) {
                                 return response;
                             }
                             
                             const responseClone = response.clone();
-                            
-                            caches.open(CACHE_NAME)
-                                .then(cache => {
-                                    cache.put(request, responseClone);
-                                });
+                            event.waitUntil(
+                                caches.open(CACHE_NAME).then(cache => cache.put(request, responseClone))
+                            );
                             
                             return response;
                         });
                 })
         );
     }
-    // Images - Cache First with fallback
-    else if (request.url.includes('/media/') || 
-             request.headers.get('accept').includes('image/')) {
+    // Images - Cache First with size cap
+    else if (request.url.includes('/media/') || accept.includes('image/')) {
         event.respondWith(
             caches.match(request)
                 .then(response => {
@@ -114,38 +142,29 @@ self.addEventListener('fetch', event => {
                     return fetch(request)
                         .then(response => {
                             if (response && response.status === 200) {
-                                const responseClone = response.clone();
-                                
-                                caches.open(CACHE_NAME)
-                                    .then(cache => {
-                                        cache.put(request, responseClone);
-                                    });
+                                event.waitUntil(putAndTrim(IMAGES_CACHE, MAX_IMAGES, request, response.clone()));
                             }
-                            
                             return response;
-                        })
-                        .catch(() => {
-                            // Return fallback image
-                            return caches.match('/static/images/carro-padrao.jpg');
                         });
                 })
         );
     }
 });
 
-// Activate event - Clean old caches
+// Activate event - Clean old caches (any other version)
 self.addEventListener('activate', event => {
+    const currentCaches = [CACHE_NAME, PAGES_CACHE, IMAGES_CACHE];
     event.waitUntil(
         caches.keys().then(cacheNames => {
             return Promise.all(
                 cacheNames.map(cacheName => {
-                    if (cacheName !== CACHE_NAME) {
+                    if (!currentCaches.includes(cacheName)) {
                         console.log('[SW] Deleting old cache:', cacheName);
                         return caches.delete(cacheName);
                     }
                 })
             );
-        })
+        }).then(() => self.clients.claim())
     );
 });
 